@@ -1,113 +1,210 @@
-from fastapi import APIRouter, HTTPException
-from backend.database.supabase_client import supabase_client
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
+import datetime
+import json
+from backend.database.repository import repository
+from backend.core.config import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, TIMELINE_DEFAULT_BINS, TIMELINE_MAX_BINS,
+    HEATMAP_DEFAULT_GRID_SIZE, HEATMAP_DEFAULT_TIME_BINS
+)
+from backend.core.file_summary import file_summary_service
+from backend.core.temporal_pyramid import timeline_service
+from backend.core.brand_rollups import brand_rollup_service, ROLLUP_GROUPS
+from backend.core.cooccurrence import cooccurrence_service
+from backend.core.heatmap_service import heatmap_service, HEATMAP_BACKGROUNDS
+from backend.core.response_cache import response_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Response fields of a detection -> detections column they come from
+DETECTION_FIELDS = {
+    'id': 'id', 'file_id': 'file_id', 'score': 'score', 'bbox': 'bbox',
+    't_start': 't_start', 't_end': 't_end', 'frame': 'frame', 'model': 'model',
+    'created_at': 'created_at', 'brand_name': None,
+    'frame_capture_url': None, 'frame_capture_path': None, 'frame_number': None,
+    'area_fraction': 'area_fraction', 'center_distance': 'center_distance', 'edge_clipped': 'edge_clipped',
+    'sharpness': 'sharpness', 'visibility': 'visibility'
+}
+FRAME_CAPTURE_FIELDS = [
+    'id', 'file_id', 'frame_number', 'bucket', 'path', 'public_url',
+    't_start', 't_end', 'detections_count', 'created_at'
+]
+
+def _encode_cursor(row: Dict) -> str:
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    if not cursor:
+        return None
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _parse_fields(fields: Optional[str], allowed) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}. Allowed: {list(allowed)}")
+    return requested
+
+def _parse_day(value: Optional[str], name: str) -> Optional[str]:
+    """Validate a YYYY-MM-DD query parameter"""
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date (YYYY-MM-DD)")
+
+def _parse_timestamp(value: Optional[str], name: str) -> Optional[str]:
+    """
+    Validate an ISO 8601 date or timestamp query parameter on created_at,
+    normalized to the stored form (naive UTC, YYYY-MM-DDTHH:MM:SS.fff)
+    """
+    if value is None:
+        return None
+    try:
+        timestamp = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date or timestamp")
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return timestamp.isoformat(timespec='milliseconds')
+
+def _format_detection(detection: Dict, fields: Optional[List[str]] = None) -> Dict:
+    """Flatten embedded brand / frame capture data, keeping only the requested fields"""
+    brand = detection.get('brands')
+    capture = detection.get('frame_captures')
+    detection_data = {
+        'id': detection.get('id'),
+        'file_id': detection.get('file_id'),
+        'brand_name': brand['name'] if brand else None,
+        'score': detection.get('score'),
+        'bbox': detection.get('bbox'),
+        't_start': detection.get('t_start'),
+        't_end': detection.get('t_end'),
+        'frame': detection.get('frame'),
+        'model': detection.get('model'),
+        'created_at': detection.get('created_at'),
+        'frame_capture_url': capture['public_url'] if capture else None,
+        'frame_capture_path': capture['path'] if capture else None,
+        'frame_number': capture['frame_number'] if capture else None,
+        # Stored at ingest (None for detections from before visibility metrics)
+        'area_fraction': detection.get('area_fraction'),
+        'center_distance': detection.get('center_distance'),
+        'edge_clipped': detection.get('edge_clipped'),
+        'sharpness': detection.get('sharpness'),
+        'visibility': detection.get('visibility')
+    }
+    if fields:
+        return {field: detection_data[field] for field in fields}
+    return detection_data
+
 @router.get("/detections")
-async def get_all_detections():
-    """Get all detections with frame capture information"""
-    try:
-        response = supabase_client.client.table('detections')\
-            .select('''
-                *,
-                brands(name),
-                frame_captures(public_url, path, frame_number)
-            ''')\
-            .order('created_at', desc=True)\
-            .execute()
+async def get_all_detections(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    brand: Optional[str] = None,
+    file_id: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    min_score: Optional[float] = None
+):
+    """
+    Get detections with frame capture information, newest first.
+    Keyset-paginated: pass back next_cursor to get the following page.
+    """
+    try:
+        page_cursor = _decode_cursor(cursor)
+        requested = _parse_fields(fields, DETECTION_FIELDS)
+        since, until = _parse_timestamp(since, "since"), _parse_timestamp(until, "until")
         
-        # Transform the response to include brand names and frame URLs
-        detections = []
-        for detection in response.data:
-            detection_data = {
-                'id': detection['id'],
-                'file_id': detection['file_id'],
-                'brand_name': detection['brands']['name'] if detection['brands'] else None,
-                'score': detection['score'],
-                'bbox': detection['bbox'],
-                't_start': detection['t_start'],
-                't_end': detection['t_end'],
-                'frame': detection['frame'],
-                'model': detection['model'],
-                'created_at': detection['created_at'],
-                'frame_capture_url': detection['frame_captures']['public_url'] if detection['frame_captures'] else None,
-                'frame_capture_path': detection['frame_captures']['path'] if detection['frame_captures'] else None,
-                'frame_number': detection['frame_captures']['frame_number'] if detection['frame_captures'] else None
-            }
-            detections.append(detection_data)
+        columns = None
+        with_brand = with_frame_capture = True
+        if requested:
+            # id and created_at are always needed to build the next cursor
+            columns = sorted({DETECTION_FIELDS[f] for f in requested if DETECTION_FIELDS[f]} | {'id', 'created_at'})
+            with_brand = 'brand_name' in requested
+            with_frame_capture = any(f.startswith('frame_capture') or f == 'frame_number' for f in requested)
         
-        return {"detections": detections}
+        rows = await repository.list_detections(
+            limit + 1, page_cursor, columns, with_brand, with_frame_capture,
+            brand=brand, file_id=file_id, since=since, until=until, min_score=min_score
+        )
+        
+        page = rows[:limit]
+        next_cursor = _encode_cursor(page[-1]) if len(rows) > limit else None
+        
+        return {
+            "detections": [_format_detection(detection, requested) for detection in page],
+            "next_cursor": next_cursor,
+            "limit": limit
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting all detections: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/detections/{file_id}")
-async def get_detections(file_id: int):
+async def get_detections(file_id: int, request: Request):
     """Get all detections for a file with frame capture information"""
-    try:
-        response = supabase_client.client.table('detections')\
-            .select('''
-                *,
-                brands(name),
-                frame_captures(public_url, path, frame_number)
-            ''')\
-            .eq('file_id', file_id)\
-            .execute()
+    async def load():
+        rows = await repository.get_detections(file_id)
         
         # Transform the response to include brand names and frame URLs
-        detections = []
-        for detection in response.data:
-            detection_data = {
-                'id': detection['id'],
-                'file_id': detection['file_id'],
-                'brand_name': detection['brands']['name'] if detection['brands'] else None,
-                'score': detection['score'],
-                'bbox': detection['bbox'],
-                't_start': detection['t_start'],
-                't_end': detection['t_end'],
-                'frame': detection['frame'],
-                'model': detection['model'],
-                'created_at': detection['created_at'],
-                'frame_capture_url': detection['frame_captures']['public_url'] if detection['frame_captures'] else None,
-                'frame_capture_path': detection['frame_captures']['path'] if detection['frame_captures'] else None,
-                'frame_number': detection['frame_captures']['frame_number'] if detection['frame_captures'] else None
-            }
-            detections.append(detection_data)
+        detections = [_format_detection(detection) for detection in rows]
         
         return {"detections": detections}
+    
+    try:
+        return await response_cache.respond(request, "detections", file_id, load)
     except Exception as e:
         logger.error(f"Error getting detections: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/predictions/{file_id}")
-async def get_predictions(file_id: int):
+async def get_predictions(file_id: int, request: Request):
     """Get all predictions for a file with file information"""
-    try:
-        # Get predictions
-        predictions_response = supabase_client.client.table('predictions')\
-            .select('*, brands(name)')\
-            .eq('video_id', file_id)\
-            .execute()
+    async def load():
+        # Processed files are answered from their precomputed summary
+        summary = await file_summary_service.get(file_id)
+        if summary:
+            predictions = summary['predictions']
+            file_row = summary['file_info']
+        else:
+            predictions, file_row = await asyncio.gather(
+                repository.get_predictions(file_id),
+                repository.get_file(file_id)
+            )
         
         # Get file information including duration
-        file_response = supabase_client.client.table('files')\
-            .select('id, filename, file_type, duration_seconds, fps')\
-            .eq('id', file_id)\
-            .execute()
-        
-        file_info = file_response.data[0] if file_response.data else None
+        file_info = {
+            key: file_row.get(key) for key in ('id', 'filename', 'file_type', 'duration_seconds', 'fps')
+        } if file_row else None
         
         # Ensure duration_seconds is not None
         if file_info and file_info.get('duration_seconds') is None:
             file_info['duration_seconds'] = 0
         
         return {
-            "predictions": predictions_response.data,
+            "predictions": predictions,
             "file_info": file_info
         }
+    
+    try:
+        return await response_cache.respond(request, "predictions", file_id, load)
     except Exception as e:
         logger.error(f"Error getting predictions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -116,137 +213,279 @@ async def get_predictions(file_id: int):
 async def get_files():
     """Get all processed files"""
     try:
-        response = supabase_client.client.table('files')\
-            .select('*')\
-            .order('created_at', desc=True)\
-            .execute()
+        files = await repository.list_files()
         
-        return {"files": response.data}
+        return {"files": files}
     except Exception as e:
         logger.error(f"Error getting files: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/files/{file_id}/statistics")
-async def get_file_statistics(file_id: int):
-    """Get comprehensive statistics for a specific file"""
-    try:
-        # Get file information
-        file_response = supabase_client.client.table('files')\
-            .select('id, filename, file_type, duration_seconds, fps, created_at')\
-            .eq('id', file_id)\
-            .execute()
-        
-        if not file_response.data:
-            raise HTTPException(status_code=404, detail="File not found")
+async def get_file_statistics(file_id: int, request: Request, include_raw: bool = False):
+    """
+    Get comprehensive statistics for a specific file.
+    Counts, averages and the temporal histogram are aggregated by the
+    database; the raw detections/predictions arrays are only returned
+    with include_raw=true.
+    """
+    async def load():
+        summary = await file_summary_service.get(file_id)
+        if summary:
+            statistics = file_summary_service.statistics_from_summary(summary)
+        else:
+            # Not summarized yet (still processing or not backfilled)
+            statistics = await file_summary_service.compute_statistics(file_id)
+            
+            if statistics is None:
+                raise HTTPException(status_code=404, detail="File not found")
         
-        file_info = file_response.data[0]
-        
-        # Get all detections for this file
-        detections_response = supabase_client.client.table('detections')\
-            .select('*, brands(name)')\
-            .eq('file_id', file_id)\
-            .execute()
-        
-        detections = detections_response.data
-        
-        # Get all predictions for this file
-        predictions_response = supabase_client.client.table('predictions')\
-            .select('*, brands(name)')\
-            .eq('video_id', file_id)\
-            .execute()
-        
-        predictions = predictions_response.data
-        
-        # Calculate video statistics
-        total_detections = len(detections)
-        unique_brands = len(set(detection['brand_id'] for detection in detections if detection['brand_id']))
-        
-        # Calculate average confidence
-        avg_confidence = sum(detection['score'] for detection in detections) / total_detections if total_detections > 0 else 0
-        
-        # Calculate total detection time (sum of all brand durations)
-        total_detection_time = sum(prediction.get('duration_seconds', 0) for prediction in predictions)
-        
-        # Calculate detection density (detections per second)
-        video_duration = file_info.get('duration_seconds', 0)
-        detection_density = total_detections / video_duration if video_duration > 0 else 0
-        
-        # Get brand distribution
-        brand_distribution = {}
-        for prediction in predictions:
-            brand_name = prediction['brands']['name'] if prediction['brands'] else 'Unknown'
-            if brand_name not in brand_distribution:
-                brand_distribution[brand_name] = {
-                    'detections': 0,
-                    'total_time': 0,
-                    'avg_confidence': 0
-                }
-            brand_distribution[brand_name]['detections'] += prediction.get('total_detections', 0)
-            brand_distribution[brand_name]['total_time'] += prediction.get('duration_seconds', 0)
-            brand_distribution[brand_name]['avg_confidence'] = prediction.get('avg_score', 0)
-        
-        # Calculate temporal distribution (detections by time intervals)
-        time_intervals = 10  # 10-second intervals
-        interval_size = video_duration / time_intervals if video_duration > 0 else 1
-        temporal_distribution = {}
-        
-        for i in range(time_intervals):
-            start_time = i * interval_size
-            end_time = (i + 1) * interval_size
-            interval_detections = [
-                d for d in detections 
-                if d.get('t_start', 0) >= start_time and d.get('t_start', 0) < end_time
-            ]
-            temporal_distribution[f"{start_time:.1f}-{end_time:.1f}s"] = len(interval_detections)
-        
-        statistics = {
-            "file_info": file_info,
-            "video_statistics": {
-                "total_duration_seconds": video_duration,
-                "total_detections": total_detections,
-                "unique_brands": unique_brands,
-                "average_confidence": round(avg_confidence, 3),
-                "total_detection_time": round(total_detection_time, 2),
-                "detection_density": round(detection_density, 2),
-                "detection_coverage": round((total_detection_time / video_duration * 100), 2) if video_duration > 0 else 0
-            },
-            "brand_distribution": brand_distribution,
-            "temporal_distribution": temporal_distribution,
-            "detections": detections,
-            "predictions": predictions
-        }
+        if include_raw:
+            statistics["detections"], statistics["predictions"] = await asyncio.gather(
+                repository.get_detections(file_id),
+                repository.get_predictions(file_id)
+            )
         
         return statistics
-        
+    
+    try:
+        return await response_cache.respond(request, "statistics", file_id, load, (include_raw,))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting file statistics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/files/{file_id}/exposure-segments")
+async def get_exposure_segments(file_id: int, request: Request):
+    """
+    On-screen intervals of each brand in a video, for timeline rendering,
+    with each brand's on-screen seconds, segment count and longest segment
+    """
+    async def load():
+        file_row, rows = await asyncio.gather(
+            repository.get_file(file_id),
+            repository.get_exposure_segments(file_id)
+        )
+        if not file_row:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        brands = {}
+        for row in rows:
+            brand_name = row['brands']['name'] if row.get('brands') else None
+            brand = brands.setdefault(brand_name, {
+                'exposure_seconds': 0.0, 'exposure_segments': 0, 'longest_exposure_seconds': 0.0, 'segments': []
+            })
+            brand['exposure_seconds'] += row['duration_seconds']
+            brand['exposure_segments'] += 1
+            brand['longest_exposure_seconds'] = max(brand['longest_exposure_seconds'], row['duration_seconds'])
+            brand['segments'].append({
+                key: row[key] for key in ('t_start', 't_end', 'duration_seconds', 'detections_count')
+            })
+        for brand in brands.values():
+            brand['exposure_seconds'] = round(brand['exposure_seconds'], 2)
+        
+        return {"file_id": file_id, "duration_seconds": file_row.get('duration_seconds'), "brands": brands}
+    
+    try:
+        return await response_cache.respond(request, "exposure_segments", file_id, load)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting exposure segments: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/files/{file_id}/timeline")
+async def get_timeline(
+    file_id: int,
+    request: Request,
+    start: float = Query(0.0, ge=0),
+    end: Optional[float] = Query(None, gt=0),
+    bins: int = Query(TIMELINE_DEFAULT_BINS, ge=1, le=TIMELINE_MAX_BINS),
+    brand: Optional[str] = None
+):
+    """
+    Detections per brand over [start, end) seconds of a video (end defaults
+    to, and is capped at, its duration), in power-of-two-second bins: the
+    widest that still gives at least `bins` bins, down to the finest stored
+    resolution
+    """
+    async def load():
+        file_row = await repository.get_file(file_id)
+        if not file_row:
+            raise HTTPException(status_code=404, detail="File not found")
+        if end is not None and end <= start:
+            raise HTTPException(status_code=400, detail="end must be greater than start")
+        duration_seconds = file_row.get('duration_seconds') or 0
+        if start >= duration_seconds:
+            raise HTTPException(status_code=400, detail=f"start must be less than the duration ({duration_seconds}s)")
+        return await timeline_service.query(file_row, start, end, bins, brand)
+    
+    try:
+        return await response_cache.respond(request, "timeline", file_id, load, (start, end, bins, brand))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting timeline: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/files/{file_id}/cooccurrence")
+async def get_cooccurrence(file_id: int, request: Request):
+    """
+    Brands × brands matrix of frames in which both brands appear, the pairs
+    sorted by shared frames (with seconds and Jaccard index), and each
+    brand's share of voice: its share of all brand frames and of all detections
+    """
+    async def load():
+        if not await repository.get_file(file_id):
+            raise HTTPException(status_code=404, detail="File not found")
+        return await cooccurrence_service.get(file_id)
+    
+    try:
+        return await response_cache.respond(request, "cooccurrence", file_id, load)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting brand co-occurrence: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _heatmap_file(file_id: int) -> Dict:
+    file_row = await repository.get_file(file_id)
+    if not file_row:
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_row
+
+@router.get("/files/{file_id}/heatmap")
+async def get_heatmap(
+    file_id: int,
+    request: Request,
+    brand: Optional[str] = None,
+    grid_size: int = Query(HEATMAP_DEFAULT_GRID_SIZE, ge=5, le=500),
+    background: str = 'transparent',
+    smooth: float = Query(1.0, gt=0, le=5)
+):
+    """
+    Spatial heatmap of where a file's detections (of one brand, or all)
+    appear on screen: a PNG overlay (base64) and the normalized intensity
+    of each grid_size × grid_size pixel cell
+    """
+    async def load():
+        if background not in HEATMAP_BACKGROUNDS:
+            raise HTTPException(status_code=400, detail=f"background must be one of {list(HEATMAP_BACKGROUNDS)}")
+        return await heatmap_service.spatial(await _heatmap_file(file_id), brand, grid_size, background, smooth)
+    
+    try:
+        params = (brand.lower() if brand else None, grid_size, background, smooth)
+        return await response_cache.respond(request, "heatmap", file_id, load, params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating heatmap: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/files/{file_id}/heatmap/temporal")
+async def get_temporal_heatmap(
+    file_id: int,
+    request: Request,
+    time_bins: int = Query(HEATMAP_DEFAULT_TIME_BINS, ge=1, le=TIMELINE_MAX_BINS),
+    brand: Optional[str] = None
+):
+    """Detections of a video (of one brand, or all) in time_bins equal intervals of its duration"""
+    async def load():
+        return await heatmap_service.temporal(await _heatmap_file(file_id), time_bins, brand)
+    
+    try:
+        params = (time_bins, brand.lower() if brand else None)
+        return await response_cache.respond(request, "temporal_heatmap", file_id, load, params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating temporal heatmap: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/files/{file_id}/heatmap/brands")
+async def get_brand_distribution_heatmap(file_id: int, request: Request):
+    """One spatial heatmap per brand, with its detection count and average confidence"""
+    async def load():
+        return await heatmap_service.brands(await _heatmap_file(file_id))
+    
+    try:
+        return await response_cache.respond(request, "brand_heatmap", file_id, load)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating brand distribution heatmap: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/frame-captures/{file_id}")
-async def get_frame_captures(file_id: int):
+async def get_frame_captures(file_id: int, request: Request):
     """Get all frame captures for a file"""
-    try:
-        response = supabase_client.client.table('frame_captures')\
-            .select('*')\
-            .eq('file_id', file_id)\
-            .order('frame_number')\
-            .execute()
+    async def load():
+        frame_captures = await repository.get_frame_captures(file_id)
         
-        return {"frame_captures": response.data}
+        return {"frame_captures": frame_captures}
+    
+    try:
+        return await response_cache.respond(request, "frame_captures", file_id, load)
     except Exception as e:
         logger.error(f"Error getting frame captures: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/frame-captures")
-async def get_all_frame_captures():
-    """Get all frame captures"""
+async def get_all_frame_captures(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    file_id: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """
+    Get frame captures, newest first.
+    Keyset-paginated: pass back next_cursor to get the following page.
+    """
     try:
-        response = supabase_client.client.table('frame_captures')\
-            .select('*')\
-            .order('created_at', desc=True)\
-            .execute()
+        page_cursor = _decode_cursor(cursor)
+        requested = _parse_fields(fields, FRAME_CAPTURE_FIELDS)
+        since, until = _parse_timestamp(since, "since"), _parse_timestamp(until, "until")
+        columns = sorted(set(requested) | {'id', 'created_at'}) if requested else None
+        
+        rows = await repository.list_frame_captures(
+            limit + 1, page_cursor, columns, file_id=file_id, since=since, until=until
+        )
+        
+        page = rows[:limit]
+        next_cursor = _encode_cursor(page[-1]) if len(rows) > limit else None
+        if requested:
+            page = [{field: row.get(field) for field in requested} for row in page]
         
-        return {"frame_captures": response.data}
+        return {"frame_captures": page, "next_cursor": next_cursor, "limit": limit}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting all frame captures: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/brands")
+async def get_brand_analytics(
+    group_by: str = "day",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    brand: Optional[str] = None
+):
+    """
+    Screen time, detections and average score of each brand across all
+    processed files, broken down by processing day (since/until, UTC) or by
+    file type. Answered from the brand rollups, not from the detections.
+    """
+    try:
+        if group_by not in ROLLUP_GROUPS:
+            raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(ROLLUP_GROUPS)}")
+        since, until = _parse_day(since, "since"), _parse_day(until, "until")
+        if group_by != 'day' and (since or until):
+            raise HTTPException(status_code=400, detail="since/until only apply to group_by=day")
+        return await brand_rollup_service.query(group_by, since, until, brand)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting brand analytics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
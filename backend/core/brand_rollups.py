@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from backend.database.repository import repository
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_GROUPS = ('day', 'file_type')
+
+class BrandRollupService:
+    """
+    Cross-video brand totals per day and per file type. Each finished job
+    adds its file's per-brand totals to the rollup tables, so analytics
+    read one row per brand and group instead of every prediction.
+    """
+
+    async def refresh(self, file_id: int):
+        """Add a processed file to the rollups (a file already added is skipped)"""
+        await repository.apply_brand_rollups(file_id)
+        logger.info(f"📈 Brand rollups updated with file {file_id}")
+
+    @staticmethod
+    def _totals(rows: List[Dict]) -> Dict:
+        total_detections = sum(row['total_detections'] for row in rows)
+        score_sum = sum(row['score_sum'] for row in rows)
+        return {
+            'files_count': sum(row['files_count'] for row in rows),
+            'total_detections': total_detections,
+            'exposure_seconds': round(sum(row['exposure_seconds'] for row in rows), 2),
+            'avg_score': round(score_sum / total_detections, 3) if total_detections > 0 else 0.0
+        }
+
+    def summarize(self, rows: List[Dict], group_by: str) -> Dict:
+        """Per-brand totals of rollup rows, with the breakdown by day or file type"""
+        by_brand: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_brand.setdefault(row['brands']['name'], []).append(row)
+        brands = {}
+        for brand_name, brand_rows in by_brand.items():
+            brands[brand_name] = self._totals(brand_rows)
+            brands[brand_name]['breakdown'] = {row[group_by]: self._totals([row]) for row in brand_rows}
+        return {'brands': brands, 'totals': self._totals(rows)}
+
+    async def query(self, group_by: str = 'day', since: Optional[str] = None, until: Optional[str] = None,
+                    brand: Optional[str] = None) -> Dict:
+        rows = await repository.get_brand_rollups(group_by, since, until, brand)
+        result = {'group_by': group_by, 'since': since, 'until': until}
+        result.update(self.summarize(rows, group_by))
+        return result
+
+    async def backfill(self) -> int:
+        """
+        Add existing files to the rollups; returns how many files were
+        processed. Files without a summary are skipped: they are still being
+        processed, or need the file_summary backfill first.
+        """
+        file_ids = await repository.list_file_ids()
+        applied = 0
+        for file_id in file_ids:
+            try:
+                if await repository.get_file_summary(file_id) is None:
+                    continue
+                await self.refresh(file_id)
+                applied += 1
+            except Exception as e:
+                logger.error(f"Could not roll up file {file_id}: {e}")
+        logger.info(f"Rolled up {applied}/{len(file_ids)} files")
+        return applied
+
+# Global instance
+brand_rollup_service = BrandRollupService()
+
+if __name__ == "__main__":
+    # Backfill command: python -m backend.core.brand_rollups
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(brand_rollup_service.backfill())
+    print(f"✅ {count} files rolled up")
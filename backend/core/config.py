@@ -16,13 +16,92 @@ CONFIDENCE_THRESHOLD = 0.5
 UPLOAD_DIR = "uploads"
 FRAMES_DIR = "frames"
 CROPS_DIR = "crops"
-MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+# Uploads above RESUMABLE_UPLOAD_THRESHOLD are spooled to disk and stored through TUS chunks, so multi-GB videos are accepted
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024 * 1024))  # 10GB
+
+# API pagination
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STATISTICS_TIME_INTERVALS = 10  # Buckets in the /files/{file_id}/statistics temporal histogram
+TIMELINE_DEFAULT_BINS = 100  # Bins requested from /files/{file_id}/timeline when none are given
+TIMELINE_MAX_BINS = 2000
+HEATMAP_DEFAULT_GRID_SIZE = 50  # Cell size in pixels of /files/{file_id}/heatmap when none is given
+HEATMAP_DEFAULT_TIME_BINS = 20
+# Frame size assumed for files without stored width/height (processed before dimensions were recorded)
+HEATMAP_DEFAULT_WIDTH = 1920
+HEATMAP_DEFAULT_HEIGHT = 1080
+
+# In-process response cache for file-scoped read endpoints
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 256))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # 64MB
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 300))  # seconds
 
 # Video Processing Configuration
 TARGET_FPS = 1  # Extract 1 frame per second
+# A brand missing from the screen for at most this many seconds stays in the same exposure segment
+EXPOSURE_GAP_TOLERANCE = float(os.getenv("EXPOSURE_GAP_TOLERANCE", 1.0))
+# Finest bin of the temporal pyramids, in seconds; level L bins are 2**L times wider
+TIMELINE_BASE_SECONDS = float(os.getenv("TIMELINE_BASE_SECONDS", 1.0))
+
+# Visibility of each detection, which weights the brands' exposure score
+VISIBILITY_FULL_AREA = float(os.getenv("VISIBILITY_FULL_AREA", 0.05))  # frame fraction at which a logo counts as fully visible
+VISIBILITY_EDGE_MARGIN = float(os.getenv("VISIBILITY_EDGE_MARGIN", 2))  # pixels from the border that count as clipped
+VISIBILITY_CLIP_PENALTY = float(os.getenv("VISIBILITY_CLIP_PENALTY", 0.5))  # visibility lost by a logo cut by the frame edge
+VISIBILITY_SHARPNESS = os.getenv("VISIBILITY_SHARPNESS", "false").lower() == "true"  # also weight by crop sharpness
+VISIBILITY_SHARPNESS_REFERENCE = float(os.getenv("VISIBILITY_SHARPNESS_REFERENCE", 100.0))  # Laplacian variance of a fully sharp crop
 SUPPORTED_VIDEO_FORMATS = [".mp4", ".avi", ".mov", ".mkv"]
 SUPPORTED_IMAGE_FORMATS = [".jpg", ".jpeg", ".png", ".bmp"]
 
+# Processing job scheduler
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", 2))
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", 20))  # queued jobs beyond this get HTTP 429
+# Shortest estimated job first; cost is in analyzed frames (a video's duration x TARGET_FPS)
+JOB_AGING_RATE = float(os.getenv("JOB_AGING_RATE", 2.0))  # cost units forgiven per second waited
+JOB_PRIORITY_WEIGHT = float(os.getenv("JOB_PRIORITY_WEIGHT", 600))  # cost units per priority level
+
+# Shared spool where uploads wait for whichever worker process starts them
+SPOOL_DIR = os.getenv("SPOOL_DIR", UPLOAD_DIR)
+
+# Job state store (shared by every worker process on the host)
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "data/jobs.db")
+JOB_STORE_TTL = float(os.getenv("JOB_STORE_TTL", 24 * 3600))  # seconds a finished or idle session is kept
+JOB_STORE_MAX_JOBS = int(os.getenv("JOB_STORE_MAX_JOBS", 1000))  # oldest finished sessions are evicted beyond this
+
+# Video processing mode: "local" (in the API process) or "distributed" (segment workers, see worker.py)
+PROCESSING_MODE = os.getenv("PROCESSING_MODE", "local").lower()
+SEGMENT_QUEUE_BACKEND = os.getenv("SEGMENT_QUEUE_BACKEND", "sqlite").lower()
+SEGMENT_QUEUE_PATH = os.getenv("SEGMENT_QUEUE_PATH", "data/segments.db")
+SEGMENT_FRAMES = int(os.getenv("SEGMENT_FRAMES", 60))  # sampled frames per segment
+SEGMENT_LEASE_SECONDS = float(os.getenv("SEGMENT_LEASE_SECONDS", 120))  # a silent worker's segment is retried after this
+SEGMENT_HEARTBEAT_INTERVAL = float(os.getenv("SEGMENT_HEARTBEAT_INTERVAL", 30))  # seconds between lease renewals
+SEGMENT_MAX_ATTEMPTS = int(os.getenv("SEGMENT_MAX_ATTEMPTS", 3))
+SEGMENT_POLL_INTERVAL = float(os.getenv("SEGMENT_POLL_INTERVAL", 1.0))  # seconds
+
+# Server-Sent Events progress streams
+PROGRESS_EVENTS_TTL = float(os.getenv("PROGRESS_EVENTS_TTL", 3600))  # seconds a finished session stays replayable
+PROGRESS_EVENTS_IDLE_TTL = float(os.getenv("PROGRESS_EVENTS_IDLE_TTL", 6 * 3600))  # seconds a session without events is kept
+PROGRESS_EVENTS_HEARTBEAT = float(os.getenv("PROGRESS_EVENTS_HEARTBEAT", 15))  # seconds between keep-alives
+
+# Write-behind buffer for detection/frame capture/prediction rows
+WRITE_BUFFER_MAX_ROWS = int(os.getenv("WRITE_BUFFER_MAX_ROWS", 500))
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.getenv("WRITE_BUFFER_FLUSH_INTERVAL", 2.0))  # seconds
+WRITE_BUFFER_MAX_RETRIES = int(os.getenv("WRITE_BUFFER_MAX_RETRIES", 3))
+
+# Rows per request when a Supabase read returns every row (at most the project's PostgREST max-rows, 1000 by default)
+SUPABASE_PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", 1000))
+
 # Supabase Storage
 SUPABASE_IMAGES_BUCKET = "images"
 SUPABASE_VIDEOS_BUCKET = "videos"
+
+# Resumable (TUS) uploads for large files
+RESUMABLE_UPLOAD_THRESHOLD = int(os.getenv("RESUMABLE_UPLOAD_THRESHOLD", 50 * 1024 * 1024))  # 50MB
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024  # Supabase requires 6MB TUS chunks
+RESUMABLE_MAX_RETRIES = int(os.getenv("RESUMABLE_MAX_RETRIES", 5))
+RESUMABLE_STATE_DIR = os.getenv("RESUMABLE_STATE_DIR", os.path.join(UPLOAD_DIR, ".resumable"))
+
+# Storage/database backend: "supabase" or "local" (embedded SQLite + filesystem)
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "supabase").lower()
+LOCAL_DATABASE_PATH = os.getenv("LOCAL_DATABASE_PATH", "data/logo_vision.db")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "data/storage")
+LOCAL_STORAGE_PUBLIC_URL = os.getenv("LOCAL_STORAGE_PUBLIC_URL", "http://localhost:8001/storage")
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+import numpy as np
+from scipy import sparse
+
+from backend.core.config import TARGET_FPS
+from backend.core.stats_calculator import stats_calculator, StatisticsCalculator
+from backend.database.repository import repository
+
+logger = logging.getLogger(__name__)
+
+class CooccurrenceService:
+    """
+    Which brands share the screen, and each brand's share of voice, from a
+    sparse frame × brand incidence matrix: incidence.T @ incidence counts,
+    for every pair of brands, the analyzed frames in which both appear (its
+    diagonal holds each brand's own frames).
+    """
+
+    def compute(self, brand_names: List[str], brand_index: np.ndarray, frames: np.ndarray,
+                sample_seconds: float) -> Dict:
+        """Co-occurrence matrix, pairs and share of voice of columnar detections (see detection_columns)"""
+        brand_count = len(brand_names)
+        if len(brand_index) == 0:
+            return {'brands': [], 'matrix': [], 'pairs': [], 'share_of_voice': {}, 'frames_analyzed': 0}
+
+        # Rows are the distinct frames with detections; duplicates add up to detections per frame and brand
+        frame_ids, frame_index = np.unique(frames, return_inverse=True)
+        counts = sparse.csr_matrix(
+            (np.ones(len(brand_index), dtype=np.int64), (frame_index.ravel(), brand_index)),
+            shape=(len(frame_ids), brand_count)
+        )
+        incidence = (counts > 0).astype(np.int64)
+        cooccurrence = (incidence.T @ incidence).toarray()
+
+        detections = np.asarray(counts.sum(axis=0)).ravel()
+        brand_frames = np.diag(cooccurrence)
+        total_brand_frames = brand_frames.sum()
+
+        # Jaccard index of each pair: frames together over frames with either brand
+        union = brand_frames[:, None] + brand_frames[None, :] - cooccurrence
+        upper_i, upper_j = np.nonzero(np.triu(cooccurrence, k=1))
+        pairs = [
+            {
+                'brands': [brand_names[i], brand_names[j]],
+                'frames': int(cooccurrence[i, j]),
+                'seconds': round(float(cooccurrence[i, j]) * sample_seconds, 2),
+                'jaccard': round(float(cooccurrence[i, j] / union[i, j]), 3)
+            }
+            for i, j in zip(upper_i, upper_j)
+        ]
+        pairs.sort(key=lambda pair: pair['frames'], reverse=True)
+
+        share_of_voice = {
+            brand_names[b]: {
+                'detections': int(detections[b]),
+                'frames': int(brand_frames[b]),
+                'seconds': round(float(brand_frames[b]) * sample_seconds, 2),
+                # Share of all brand exposure (frames on screen), and of all detections
+                'share_of_voice': round(float(brand_frames[b] / total_brand_frames), 4),
+                'detection_share': round(float(detections[b] / len(brand_index)), 4)
+            }
+            for b in range(brand_count)
+        }
+
+        return {
+            'brands': brand_names,
+            'matrix': cooccurrence.tolist(),
+            'pairs': pairs,
+            'share_of_voice': share_of_voice,
+            'frames_analyzed': len(frame_ids)
+        }
+
+    async def get(self, file_id: int) -> Dict:
+        """Co-occurrence and share of voice of a file's stored detections"""
+        rows = await repository.get_detection_frames(file_id)
+        brand_names, brand_index, _, frames = stats_calculator.detection_columns(rows)
+        # The matrix products are CPU work; keep them off the event loop
+        result = await asyncio.to_thread(
+            self.compute, brand_names, brand_index, frames, StatisticsCalculator.sample_duration(TARGET_FPS)
+        )
+        result['file_id'] = file_id
+        return result
+
+# Global instance
+cooccurrence_service = CooccurrenceService()
@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from backend.core.config import STATISTICS_TIME_INTERVALS
+from backend.core.response_cache import response_cache
+from backend.database.repository import repository
+
+logger = logging.getLogger(__name__)
+
+FILE_INFO_FIELDS = ('id', 'filename', 'file_type', 'duration_seconds', 'fps', 'created_at')
+
+class FileSummaryService:
+    """
+    Maintains the file_summaries table: one precomputed row per processed
+    file with counts, brands, coverage, per-brand totals and the prediction
+    rows, so read endpoints answer from a single lookup.
+    """
+
+    def format_statistics(self, file_row: Dict, aggregate: Dict, time_intervals: int = STATISTICS_TIME_INTERVALS) -> Dict:
+        """Statistics payload of /files/{file_id}/statistics (without raw arrays)"""
+        file_info = {key: file_row.get(key) for key in FILE_INFO_FIELDS}
+
+        total_detections = aggregate['total_detections']
+        total_detection_time = aggregate['total_detection_time']
+
+        # Calculate detection density (detections per second)
+        video_duration = file_info.get('duration_seconds') or 0
+        detection_density = total_detections / video_duration if video_duration > 0 else 0
+
+        # Get brand distribution
+        brand_distribution = {
+            brand['brand_name']: {
+                'detections': brand['detections'],
+                'total_time': brand['total_time'],
+                'avg_confidence': brand['avg_confidence']
+            }
+            for brand in aggregate['brand_distribution']
+        }
+
+        # Label the histogram buckets (detections by time intervals)
+        interval_size = video_duration / time_intervals if video_duration > 0 else 1
+        histogram = {bucket['bucket']: bucket['detections'] for bucket in aggregate['temporal_histogram']}
+        temporal_distribution = {}
+        for i in range(time_intervals):
+            start_time = i * interval_size
+            end_time = (i + 1) * interval_size
+            temporal_distribution[f"{start_time:.1f}-{end_time:.1f}s"] = histogram.get(i, 0)
+
+        return {
+            "file_info": file_info,
+            "video_statistics": {
+                "total_duration_seconds": video_duration,
+                "total_detections": total_detections,
+                "unique_brands": aggregate['unique_brands'],
+                "average_confidence": round(aggregate['average_confidence'], 3),
+                "total_detection_time": round(total_detection_time, 2),
+                "detection_density": round(detection_density, 2),
+                "detection_coverage": round((total_detection_time / video_duration * 100), 2) if video_duration > 0 else 0
+            },
+            "brand_distribution": brand_distribution,
+            "temporal_distribution": temporal_distribution
+        }
+
+    async def compute_statistics(self, file_id: int, time_intervals: int = STATISTICS_TIME_INTERVALS) -> Optional[Dict]:
+        """Live statistics of a file, or None if it does not exist"""
+        # The file row and the server-side aggregate are independent queries
+        file_row, aggregate = await asyncio.gather(
+            repository.get_file(file_id),
+            repository.get_file_statistics(file_id, time_intervals)
+        )
+        if not file_row:
+            return None
+        return self.format_statistics(file_row, aggregate, time_intervals)
+
+    async def build(self, file_id: int) -> Optional[Dict]:
+        """Compute the summary row of a file from its stored rows"""
+        file_row, aggregate, predictions, frame_captures_count, brands = await asyncio.gather(
+            repository.get_file(file_id),
+            repository.get_file_statistics(file_id, STATISTICS_TIME_INTERVALS),
+            repository.get_predictions(file_id),
+            repository.count_frame_captures(file_id),
+            repository.get_file_brand_names(file_id)
+        )
+        if not file_row:
+            return None
+
+        statistics = self.format_statistics(file_row, aggregate)
+
+        return {
+            'file_id': file_id,
+            'file_info': file_row,
+            'detections_count': statistics['video_statistics']['total_detections'],
+            'frame_captures_count': frame_captures_count,
+            'brands_detected': sorted(brands),
+            'detection_coverage': statistics['video_statistics']['detection_coverage'],
+            'brand_totals': statistics['brand_distribution'],
+            'video_statistics': statistics['video_statistics'],
+            'temporal_distribution': statistics['temporal_distribution'],
+            'predictions': predictions
+        }
+
+    async def refresh(self, file_id: int) -> Optional[Dict]:
+        """Rebuild and store the summary of a file"""
+        summary = await self.build(file_id)
+        if summary is not None:
+            await repository.upsert_file_summary(summary)
+            response_cache.invalidate_file(file_id)
+            logger.info(f"📋 File summary stored for file {file_id}")
+        return summary
+
+    async def get(self, file_id: int) -> Optional[Dict]:
+        """Stored summary, or None for files still processing or not backfilled"""
+        return await repository.get_file_summary(file_id)
+
+    def statistics_from_summary(self, summary: Dict) -> Dict:
+        return {
+            "file_info": {key: summary['file_info'].get(key) for key in FILE_INFO_FIELDS},
+            "video_statistics": summary['video_statistics'],
+            "brand_distribution": summary['brand_totals'],
+            "temporal_distribution": summary['temporal_distribution']
+        }
+
+    async def backfill(self, only_missing: bool = True) -> int:
+        """Build summaries for existing files; returns how many were written"""
+        file_ids = await repository.list_file_ids(without_summary=only_missing)
+        written = 0
+        for file_id in file_ids:
+            try:
+                if await self.refresh(file_id) is not None:
+                    written += 1
+            except Exception as e:
+                logger.error(f"Could not build summary for file {file_id}: {e}")
+        logger.info(f"Backfilled {written}/{len(file_ids)} file summaries")
+        return written
+
+# Global instance
+file_summary_service = FileSummaryService()
+
+if __name__ == "__main__":
+    # Backfill command: python -m backend.core.file_summary [--all]
+    parser = argparse.ArgumentParser(description="Backfill the file_summaries table")
+    parser.add_argument("--all", action="store_true", help="Rebuild every summary, not only missing ones")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(file_summary_service.backfill(only_missing=not args.all))
+    print(f"✅ {count} file summaries written")
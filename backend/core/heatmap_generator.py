@@ -18,6 +18,10 @@ class HeatmapGenerator:
             (140, 80, 255),  # Средне-фиолетовый - средняя интенсивность (34-66%)
             (80, 0, 200)     # Темно-фиолетовый - высокая интенсивность (67-100%)
         ]
+        # Таблица из 256 цветов по интенсивности (индекс = round(intensity * 255))
+        self._color_lut = np.array([self._get_heatmap_color(i / 255) for i in range(256)], dtype=np.uint8)
+        # Маски затухания по размеру ячейки
+        self._falloff_masks: Dict[Tuple[int, float], np.ndarray] = {}
     
     def generate_heatmap_data(self, detections: List[Dict], video_width: int, video_height: int, 
                             grid_size: int = 50, brand_filter: Optional[str] = None, 
@@ -132,72 +136,38 @@ class HeatmapGenerator:
             heatmap_image = np.zeros((image_height, image_width, 4), dtype=np.uint8)
             
             # Устанавливаем фон в зависимости от типа
-            if background_type == 'transparent':
-                # Прозрачный фон
-                heatmap_image[:, :, 3] = 0  # Альфа = 0 (полностью прозрачный)
-            elif background_type == 'white':
+            rows = np.arange(image_height) / max(image_height, 1)
+            if background_type == 'white':
                 # Белый фон
                 heatmap_image[:, :, :3] = [255, 255, 255]  # Белый цвет
                 heatmap_image[:, :, 3] = 255  # Непрозрачный
             elif background_type == 'gradient':
-                # Градиентный фон от светло-серого к белому
-                for y in range(image_height):
-                    intensity = y / image_height
-                    gray_value = int(240 + intensity * 15)  # От 240 до 255
-                    heatmap_image[y, :, :3] = [gray_value, gray_value, gray_value]
+                # Градиентный фон от светло-серого к белому (от 240 до 255)
+                gray = (240 + rows * 15).astype(np.uint8)
+                heatmap_image[:, :, :3] = gray[:, None, None]
                 heatmap_image[:, :, 3] = 255
             elif background_type == 'dark':
                 # Темно-серый фон
                 heatmap_image[:, :, :3] = [45, 45, 45]  # Темно-серый
                 heatmap_image[:, :, 3] = 255
             elif background_type == 'purple':
-                # Фиолетовый градиентный фон
-                for y in range(image_height):
-                    intensity = y / image_height
-                    # Градиент от светло-фиолетового к темно-фиолетовому
-                    r = int(240 - intensity * 40)  # От 240 до 200
-                    g = int(240 - intensity * 80)  # От 240 до 160
-                    b = int(255 - intensity * 20)  # От 255 до 235
-                    heatmap_image[y, :, :3] = [r, g, b]
+                # Градиент от светло-фиолетового к темно-фиолетовому
+                gradient = np.stack([
+                    240 - rows * 40,  # От 240 до 200
+                    240 - rows * 80,  # От 240 до 160
+                    255 - rows * 20   # От 255 до 235
+                ], axis=1).astype(np.uint8)
+                heatmap_image[:, :, :3] = gradient[:, None, :]
                 heatmap_image[:, :, 3] = 255
-            else:
-                # По умолчанию - прозрачный
-                heatmap_image[:, :, 3] = 0
+            # Иначе (в том числе 'transparent') - прозрачный фон, альфа = 0
             
             # Создаем плавную тепловую карту
             if np.max(intensity_matrix) > 0:
-                # Увеличиваем разрешение для плавности
+                # Увеличиваем разрешение для плавности: каждая ячейка - блок
+                # scale_factor x scale_factor с затуханием 30% от центра
                 scale_factor = 4
-                smooth_height = height * scale_factor
-                smooth_width = width * scale_factor
-                
-                # Создаем увеличенную матрицу
-                smooth_matrix = np.zeros((smooth_height, smooth_width))
-                
-                # Заполняем увеличенную матрицу
-                for y in range(height):
-                    for x in range(width):
-                        intensity = intensity_matrix[y, x]
-                        if intensity > 0:
-                            # Создаем плавный переход в увеличенной области
-                            start_y = y * scale_factor
-                            end_y = start_y + scale_factor
-                            start_x = x * scale_factor
-                            end_x = start_x + scale_factor
-                            
-                            # Создаем градиент внутри ячейки
-                            for sy in range(start_y, end_y):
-                                for sx in range(start_x, end_x):
-                                    # Расстояние от центра ячейки
-                                    center_y = start_y + scale_factor // 2
-                                    center_x = start_x + scale_factor // 2
-                                    distance = np.sqrt((sy - center_y)**2 + (sx - center_x)**2)
-                                    max_distance = scale_factor // 2
-                                    
-                                    # Плавное затухание от центра
-                                    if distance <= max_distance:
-                                        falloff = 1.0 - (distance / max_distance) * 0.3  # 30% затухание
-                                        smooth_matrix[sy, sx] = intensity * falloff
+                smooth_matrix = np.kron(intensity_matrix.astype(np.float64), self._falloff_mask(scale_factor, 0.3))
+                smooth_height, smooth_width = smooth_matrix.shape
                 
                 # Применяем гауссово размытие для еще большей плавности
                 if smooth_height > 10 and smooth_width > 10:
@@ -207,48 +177,21 @@ class HeatmapGenerator:
                     sigma = 1.0 * smooth_factor
                     smooth_matrix = cv2.GaussianBlur(smooth_matrix, (blur_size, blur_size), sigma)
                 
-                # Масштабируем обратно к размеру изображения
-                cell_height = image_height // height
-                cell_width = image_width // width
+                # Среднее значение увеличенной области каждой ячейки
+                avg_intensity = smooth_matrix.reshape(height, scale_factor, width, scale_factor).mean(axis=(1, 3))
+                active = avg_intensity > 0.01  # Порог для отображения
                 
-                for y in range(height):
-                    for x in range(width):
-                        # Получаем среднее значение из увеличенной области
-                        start_y = y * scale_factor
-                        end_y = start_y + scale_factor
-                        start_x = x * scale_factor
-                        end_x = start_x + scale_factor
-                        
-                        avg_intensity = np.mean(smooth_matrix[start_y:end_y, start_x:end_x])
-                        
-                        if avg_intensity > 0.01:  # Порог для отображения
-                            # Определяем цвет на основе интенсивности
-                            color = self._get_heatmap_color(avg_intensity)
-                            
-                            # Заполняем ячейку сетки
-                            start_y_img = y * cell_height
-                            end_y_img = start_y_img + cell_height
-                            start_x_img = x * cell_width
-                            end_x_img = start_x_img + cell_width
-                            
-                            # Создаем плавный градиент внутри ячейки
-                            for sy in range(start_y_img, end_y_img):
-                                for sx in range(start_x_img, end_x_img):
-                                    # Расстояние от центра ячейки
-                                    center_y = start_y_img + cell_height // 2
-                                    center_x = start_x_img + cell_width // 2
-                                    distance = np.sqrt((sy - center_y)**2 + (sx - center_x)**2)
-                                    max_distance = min(cell_height, cell_width) // 2
-                                    
-                                    if distance <= max_distance:
-                                        # Плавное затухание от центра
-                                        falloff = 1.0 - (distance / max_distance) * 0.4  # 40% затухание
-                                        
-                                        # Применяем цвет с учетом затухания
-                                        alpha = int((180 + avg_intensity * 75) * falloff)
-                                        if alpha > 0:
-                                            heatmap_image[sy, sx, :3] = color
-                                            heatmap_image[sy, sx, 3] = alpha
+                # Цвет ячеек по таблице, альфа - с затуханием 40% от центра ячейки
+                lut_index = np.rint(np.clip(avg_intensity, 0.0, 1.0) * 255).astype(np.intp)
+                colors = self._color_lut[lut_index]
+                falloff = self._falloff_mask(grid_size, 0.4)
+                alpha = ((180 + avg_intensity * 75)[:, None, :, None] * falloff[None, :, None, :]).astype(np.int64)
+                
+                # Пиксели ячеек выше порога внутри круга (alpha > 0), в форме (height, grid_size, width, grid_size)
+                drawn = active[:, None, :, None] & (alpha > 0)
+                image = heatmap_image.reshape(height, grid_size, width, grid_size, 4)
+                np.copyto(image[..., :3], colors[:, None, :, None, :], where=drawn[..., None])
+                np.copyto(image[..., 3], alpha, where=drawn, casting='unsafe')
             
             return heatmap_image
             
@@ -256,6 +199,19 @@ class HeatmapGenerator:
             logger.error(f"Error creating heatmap image: {e}")
             return np.zeros((100, 100, 4), dtype=np.uint8)
     
+    def _falloff_mask(self, size: int, decay: float) -> np.ndarray:
+        """
+        Маска затухания ячейки size x size: 1 в центре, 1 - decay на
+        расстоянии size // 2 и 0 за его пределами. Кэшируется по размеру.
+        """
+        key = (size, decay)
+        if key not in self._falloff_masks:
+            offsets = np.arange(size) - size // 2
+            distance = np.sqrt(offsets[:, None] ** 2 + offsets[None, :] ** 2)
+            max_distance = max(size // 2, 1)
+            self._falloff_masks[key] = np.where(distance <= max_distance, 1.0 - (distance / max_distance) * decay, 0.0)
+        return self._falloff_masks[key]
+    
     def _get_heatmap_color(self, intensity: float) -> Tuple[int, int, int]:
         """
         Возвращает плавно интерполированный цвет для заданной интенсивности
@@ -375,24 +331,30 @@ class HeatmapGenerator:
             
             # Создаем временные интервалы
             time_interval = video_duration / time_bins
-            temporal_data = []
+            bounds = [i * time_interval for i in range(time_bins + 1)]
+            bin_detections = [[] for _ in range(time_bins)]
             
-            for i in range(time_bins):
-                start_time = i * time_interval
-                end_time = (i + 1) * time_interval
-                
-                # Фильтруем детекции по времени
-                time_detections = [
-                    d for d in detections
-                    if start_time <= d.get('t_start', 0) < end_time
-                ]
-                
-                temporal_data.append({
-                    'time_start': start_time,
-                    'time_end': end_time,
-                    'detection_count': len(time_detections),
-                    'detections': time_detections
-                })
+            # Раскладываем детекции по интервалам за один проход
+            for d in detections:
+                t = d.get('t_start', 0)
+                index = min(max(int(t // time_interval), 0), time_bins - 1)
+                # Поправка на округление: интервал i — это [i * time_interval, (i + 1) * time_interval)
+                if t < bounds[index]:
+                    index -= 1
+                elif t >= bounds[index + 1]:
+                    index += 1
+                if 0 <= index < time_bins and bounds[index] <= t < bounds[index + 1]:
+                    bin_detections[index].append(d)
+            
+            temporal_data = [
+                {
+                    'time_start': bounds[i],
+                    'time_end': bounds[i + 1],
+                    'detection_count': len(bin_detections[i]),
+                    'detections': bin_detections[i]
+                }
+                for i in range(time_bins)
+            ]
             
             # Вычисляем статистики
             max_detections = max([data['detection_count'] for data in temporal_data])
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.config import HEATMAP_DEFAULT_WIDTH, HEATMAP_DEFAULT_HEIGHT
+from backend.core.heatmap_generator import heatmap_generator
+from backend.database.repository import repository
+
+logger = logging.getLogger(__name__)
+
+HEATMAP_BACKGROUNDS = ('transparent', 'white', 'gradient', 'dark', 'purple')
+
+class HeatmapService:
+    """
+    Spatial, temporal and per-brand heatmaps of a file's stored detections.
+    Rendering is CPU work, so it runs off the event loop; the endpoints
+    cache the results per parameter tuple.
+    """
+
+    @staticmethod
+    def dimensions(file_row: Dict) -> Tuple[int, int]:
+        """Frame width and height of a file, or the default size when they were not recorded"""
+        return file_row.get('width') or HEATMAP_DEFAULT_WIDTH, file_row.get('height') or HEATMAP_DEFAULT_HEIGHT
+
+    @staticmethod
+    def file_info(file_row: Dict) -> Dict:
+        return {key: file_row.get(key) for key in ('id', 'filename', 'file_type', 'duration_seconds', 'fps')}
+
+    async def _detections(self, file_id: int) -> List[Dict]:
+        """Stored detections with a flat brand_name, as the generator expects them"""
+        return [
+            {
+                'id': detection.get('id'),
+                'brand_name': detection['brands']['name'] if detection.get('brands') else 'Unknown',
+                'score': detection.get('score'),
+                'bbox': detection.get('bbox') or [],
+                't_start': detection.get('t_start') or 0.0,
+                't_end': detection.get('t_end'),
+                'frame': detection.get('frame')
+            }
+            for detection in await repository.get_detections(file_id)
+        ]
+
+    async def spatial(self, file_row: Dict, brand: Optional[str], grid_size: int,
+                      background: str = 'transparent', smooth: float = 1.0) -> Dict:
+        """Where on screen the file's detections (of one brand, or all) appear"""
+        detections = await self._detections(file_row['id'])
+        width, height = self.dimensions(file_row)
+        result = await asyncio.to_thread(
+            heatmap_generator.generate_heatmap_data, detections, width, height, grid_size, brand, background, smooth
+        )
+        result['file_info'] = self.file_info(file_row)
+        return result
+
+    async def temporal(self, file_row: Dict, time_bins: int, brand: Optional[str] = None) -> Dict:
+        """Detections per time bin over the whole video"""
+        detections = await self._detections(file_row['id'])
+        if brand:
+            detections = [d for d in detections if d['brand_name'].lower() == brand.lower()]
+        width, height = self.dimensions(file_row)
+        result = await asyncio.to_thread(
+            heatmap_generator.generate_temporal_heatmap, detections, width, height,
+            file_row.get('duration_seconds') or 0, time_bins
+        )
+        result['file_info'] = self.file_info(file_row)
+        return result
+
+    async def brands(self, file_row: Dict) -> Dict:
+        """One spatial heatmap per brand"""
+        detections = await self._detections(file_row['id'])
+        width, height = self.dimensions(file_row)
+        result = await asyncio.to_thread(heatmap_generator.generate_brand_distribution_heatmap, detections, width, height)
+        result['file_info'] = self.file_info(file_row)
+        return result
+
+# Global instance
+heatmap_service = HeatmapService()
@@ -0,0 +1,203 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.core.config import MAX_CONCURRENT_JOBS, MAX_PENDING_JOBS, JOB_AGING_RATE, JOB_PRIORITY_WEIGHT
+from backend.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """A processing job waiting for or holding a scheduler slot"""
+
+    def __init__(self, session_id: str, run: Callable[[], Awaitable], cost: float = 1.0, priority: int = 0,
+                 kind: Optional[str] = None):
+        self.session_id = session_id
+        self.run = run
+        # Estimated work (analyzed frames), explicit priority (higher runs sooner) and a metrics label
+        self.cost = cost
+        self.priority = priority
+        self.kind = kind
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        # Resolved with run()'s result or exception once the job finishes
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+
+class JobQueueFull(Exception):
+    """The pending queue is at MAX_PENDING_JOBS"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Processing queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class JobCancelled(Exception):
+    """A job was cancelled before or while it ran"""
+
+    def __init__(self, session_id: str):
+        super().__init__(f"Processing of session {session_id} was cancelled")
+        self.session_id = session_id
+
+class JobScheduler:
+    """
+    Runs processing jobs with at most max_concurrent at a time, shortest
+    estimated job first. A job's rank is its cost, minus priority_weight
+    per priority level, minus aging_rate per second it has waited, so a
+    long video is not starved by a stream of images. At most max_pending
+    jobs may wait; submit() raises JobQueueFull beyond that, with a
+    Retry-After estimate based on the average job duration.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_JOBS, max_pending: int = MAX_PENDING_JOBS,
+                 aging_rate: float = JOB_AGING_RATE, priority_weight: float = JOB_PRIORITY_WEIGHT):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.aging_rate = aging_rate
+        self.priority_weight = priority_weight
+        # Heap of (rank key, submission sequence, job)
+        self._pending: List[Tuple[float, int, Job]] = []
+        self._sequence = itertools.count()
+        self._running: Dict[str, Job] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._workers = []
+        # Exponential moving average of job duration, for Retry-After
+        self._avg_duration = 60.0
+        # Called with {session_id: queue_position} whenever positions change
+        self.on_queue_change: Optional[Callable[[Dict[str, int]], None]] = None
+
+    def start(self):
+        """Start the worker tasks; call once the event loop is running"""
+        if self._workers:
+            return
+        self._wake = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_concurrent)]
+        logger.info(f"🧵 Job scheduler started: {self.max_concurrent} workers, {self.max_pending} pending max")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def retry_after(self) -> int:
+        """Seconds until a pending slot is likely to free up (the next running job finishing)"""
+        now = time.monotonic()
+        remaining = [self._avg_duration - (now - job.started_at) for job in self._running.values()]
+        return max(1, math.ceil(min(remaining, default=1)))
+
+    def _rank_key(self, job: Job) -> float:
+        """
+        Heap key of a job. Its rank at time t is cost - priority_weight * priority
+        - aging_rate * (t - submitted_at); the t term is the same for every job,
+        so ordering by this time-independent key is ordering by current rank.
+        """
+        return job.cost - self.priority_weight * job.priority + self.aging_rate * job.submitted_at
+
+    def submit(self, session_id: str, run: Callable[[], Awaitable], cost: float = 1.0, priority: int = 0,
+               kind: Optional[str] = None) -> Job:
+        """Queue a job; run is called with no arguments when a slot frees up"""
+        if self.is_scheduled(session_id):
+            raise ValueError(f"Session {session_id} is already scheduled")
+        if len(self._pending) >= self.max_pending:
+            metrics.increment('job_scheduler.rejected')
+            raise JobQueueFull(self.retry_after())
+
+        job = Job(session_id, run, cost=cost, priority=priority, kind=kind)
+        # Callers that do not await the result must not trigger "exception never retrieved"
+        job.result.add_done_callback(lambda f: f.cancelled() or f.exception())
+        heapq.heappush(self._pending, (self._rank_key(job), next(self._sequence), job))
+        metrics.increment('job_scheduler.submitted')
+        # A short job may overtake others, so every pending position can change
+        self._notify_positions(self._pending_positions())
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    def cancel_pending(self, session_id: str) -> bool:
+        """
+        Remove a job that has not started; its result fails with JobCancelled.
+        Running jobs stop cooperatively and are not affected.
+        """
+        for index, (_, _, job) in enumerate(self._pending):
+            if job.session_id == session_id:
+                self._pending.pop(index)
+                heapq.heapify(self._pending)
+                job.result.set_exception(JobCancelled(session_id))
+                metrics.increment('job_scheduler.cancelled')
+                self._notify_positions(self._pending_positions())
+                return True
+        return False
+
+    def is_scheduled(self, session_id: str) -> bool:
+        return session_id in self._running or any(job.session_id == session_id for _, _, job in self._pending)
+
+    def _pending_positions(self) -> Dict[str, int]:
+        """1-based run order of the pending jobs"""
+        return {job.session_id: position for position, (_, _, job) in enumerate(sorted(self._pending), start=1)}
+
+    def queue_position(self, session_id: str) -> Optional[int]:
+        """1-based position among pending jobs, 0 if running, None if unknown"""
+        if session_id in self._running:
+            return 0
+        return self._pending_positions().get(session_id)
+
+    def job_state(self, session_id: str) -> Optional[Dict]:
+        position = self.queue_position(session_id)
+        if position is None:
+            return None
+        return {"state": "running" if position == 0 else "queued", "queue_position": position}
+
+    def _notify_positions(self, positions: Dict[str, int]):
+        if self.on_queue_change is None:
+            return
+        try:
+            self.on_queue_change(positions)
+        except Exception as e:
+            logger.error(f"Queue position listener failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            'running': len(self._running),
+            'pending': len(self._pending),
+            'max_concurrent': self.max_concurrent,
+            'max_pending': self.max_pending
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            while not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+            _, _, job = heapq.heappop(self._pending)
+            job.started_at = time.monotonic()
+            self._running[job.session_id] = job
+            # Everyone behind it moves up one place
+            positions = self._pending_positions()
+            positions[job.session_id] = 0
+            self._notify_positions(positions)
+            delay = job.started_at - job.submitted_at
+            metrics.observe('job_scheduler.scheduling_delay_seconds', delay)
+            if job.kind:
+                metrics.observe(f'job_scheduler.scheduling_delay_seconds.{job.kind}', delay)
+            try:
+                result = await job.run()
+                if not job.result.done():
+                    job.result.set_result(result)
+            except asyncio.CancelledError:
+                job.result.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.session_id} failed in worker {index}: {e}")
+                if not job.result.done():
+                    job.result.set_exception(e)
+            finally:
+                duration = time.monotonic() - job.started_at
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                metrics.observe('job_scheduler.run_seconds', duration)
+                self._running.pop(job.session_id, None)
+
+# Global instance
+job_scheduler = JobScheduler()
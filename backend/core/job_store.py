@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from backend.core.config import JOB_STORE_PATH, JOB_STORE_TTL, JOB_STORE_MAX_JOBS
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle: uploaded -> queued -> running -> completed | error | cancelled
+FINISHED_STATUSES = ('completed', 'error', 'cancelled')
+
+# Unfinished sessions, resumed on startup if their worker died
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Columns stored as JSON
+JSON_COLUMNS = ('result', 'checkpoint')
+
+# Result fields kept for a finished job; detections are read from the database by file_id
+RESULT_FIELDS = ('file_id', 'session_id', 'detections_count', 'brands_detected', 'statistics',
+                 'video_url', 'image_url')
+
+class JobStore(ABC):
+    """
+    Status, progress and result pointer of each upload/processing session.
+    Finished and idle sessions expire after a TTL and the number of
+    finished sessions is capped, so the store does not grow without bound.
+    """
+
+    @abstractmethod
+    def create(self, session_id: str, filename: str, file_path: str, file_type: str,
+               stage: str = "File uploaded, ready for processing") -> Dict:
+        """Register an uploaded file waiting to be processed"""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Get a session, or None if unknown or expired"""
+
+    @abstractmethod
+    def update(self, session_id: str, **fields) -> None:
+        """Set status, progress, stage or other columns of a session"""
+
+    @abstractmethod
+    def set_queue_positions(self, positions: Dict[str, int]) -> None:
+        """Set the queue position of several sessions in one write"""
+
+    @abstractmethod
+    def list_by_status(self, *statuses: str) -> List[Dict]:
+        """Unexpired sessions in any of the given statuses, oldest first"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Remove a session, returning whether it existed"""
+
+    @abstractmethod
+    def evict(self) -> int:
+        """Drop expired sessions and finished ones beyond the size cap"""
+
+    @abstractmethod
+    def file_version(self, file_id: int) -> int:
+        """Version of a file's stored rows, shared by every worker process (0 until first bumped)"""
+
+    @abstractmethod
+    def bump_file_version(self, file_id: int) -> int:
+        """Record that a file's rows changed, returning the new version"""
+
+    def set_progress(self, session_id: str, progress: float, stage: str):
+        self.update(session_id, progress=progress, stage=stage)
+
+    def complete(self, session_id: str, result: Dict):
+        """Mark a session completed, keeping only the result pointer"""
+        pointer = {key: result.get(key) for key in RESULT_FIELDS if key in result}
+        self.update(session_id, status='completed', progress=100, stage='Completed',
+                    file_id=result.get('file_id'), result=pointer, checkpoint=None)
+
+    def fail(self, session_id: str, error: str):
+        self.update(session_id, status='error', error=error)
+
+    def save_checkpoint(self, session_id: str, checkpoint: Dict):
+        """Persist how far a job got, so a restarted worker resumes from there"""
+        self.update(session_id, checkpoint=checkpoint)
+
+    def request_cancel(self, session_id: str):
+        """Ask whichever worker runs the session to stop at the next frame"""
+        self.update(session_id, cancel_requested=1)
+
+    def cancel_requested(self, session_id: str) -> bool:
+        job = self.get(session_id)
+        return bool(job and job['cancel_requested'])
+
+    def cancelled(self, session_id: str):
+        self.update(session_id, status='cancelled', stage='Cancelled', queue_position=None)
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store in an embedded SQLite database. WAL mode lets every uvicorn
+    worker process on the host read and write the same file.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        session_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        progress REAL DEFAULT 0,
+        stage TEXT,
+        filename TEXT,
+        file_path TEXT,
+        file_type TEXT,
+        file_id INTEGER,
+        result TEXT,
+        error TEXT,
+        queue_position INTEGER,
+        worker_id TEXT,
+        cancel_requested INTEGER DEFAULT 0,
+        checkpoint TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS file_versions (
+        file_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs(expires_at);
+    CREATE INDEX IF NOT EXISTS idx_jobs_status_updated_at ON jobs(status, updated_at);
+    """
+    # Columns added after the table was first released: name -> type
+    ADDED_COLUMNS = {'queue_position': 'INTEGER', 'worker_id': 'TEXT', 'cancel_requested': 'INTEGER DEFAULT 0',
+                     'checkpoint': 'TEXT'}
+
+    def __init__(self, db_path: str = JOB_STORE_PATH, ttl: float = JOB_STORE_TTL, max_jobs: int = JOB_STORE_MAX_JOBS):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._add_missing_columns(conn)
+            self._local.conn = conn
+        return conn
+
+    def _add_missing_columns(self, conn: sqlite3.Connection):
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in self.ADDED_COLUMNS.items():
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError:
+                    # Another worker process added it first
+                    pass
+
+    def create(self, session_id: str, filename: str, file_path: str, file_type: str,
+               stage: str = "File uploaded, ready for processing") -> Dict:
+        now = time.time()
+        self.evict()
+        self.conn.execute("""
+            INSERT OR REPLACE INTO jobs
+                (session_id, status, progress, stage, filename, file_path, file_type, created_at, updated_at, expires_at)
+            VALUES (?, 'uploaded', 0, ?, ?, ?, ?, ?, ?, ?)
+        """, (session_id, stage, filename, file_path, file_type, now, now, now + self.ttl))
+        return self.get(session_id)
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        for column in JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job[column] else None
+        return job
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            "SELECT * FROM jobs WHERE session_id = ? AND expires_at >= ?", (session_id, time.time())
+        ).fetchone()
+        return self._job(row) if row else None
+
+    def list_by_status(self, *statuses: str) -> List[Dict]:
+        placeholders = ', '.join('?' for _ in statuses)
+        rows = self.conn.execute(
+            f"SELECT * FROM jobs WHERE status IN ({placeholders}) AND expires_at >= ? ORDER BY created_at",
+            statuses + (time.time(),)
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def update(self, session_id: str, **fields) -> None:
+        for column in JSON_COLUMNS:
+            if fields.get(column) is not None:
+                fields[column] = json.dumps(fields[column], default=str)
+        now = time.time()
+        # Every write extends the session's lifetime
+        fields.update(updated_at=now, expires_at=now + self.ttl)
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        self.conn.execute(
+            f"UPDATE jobs SET {assignments} WHERE session_id = ?", list(fields.values()) + [session_id]
+        )
+
+    def set_queue_positions(self, positions: Dict[str, int]) -> None:
+        if not positions:
+            return
+        now = time.time()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "UPDATE jobs SET queue_position = ?, updated_at = ?, expires_at = ? WHERE session_id = ?",
+                [(position, now, now + self.ttl, session_id) for session_id, position in positions.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def file_version(self, file_id: int) -> int:
+        row = self.conn.execute("SELECT version FROM file_versions WHERE file_id = ?", (file_id,)).fetchone()
+        return row['version'] if row else 0
+
+    def bump_file_version(self, file_id: int) -> int:
+        return self.conn.execute("""
+            INSERT INTO file_versions (file_id, version) VALUES (?, 1)
+            ON CONFLICT(file_id) DO UPDATE SET version = version + 1
+            RETURNING version
+        """, (file_id,)).fetchone()['version']
+
+    def delete(self, session_id: str) -> bool:
+        cursor = self.conn.execute("DELETE FROM jobs WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def evict(self) -> int:
+        conn = self.conn
+        expired = conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),)).rowcount
+        placeholders = ', '.join('?' for _ in FINISHED_STATUSES)
+        finished = conn.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})", FINISHED_STATUSES
+        ).fetchone()[0]
+        overflow = 0
+        if finished > self.max_jobs:
+            overflow = conn.execute(f"""
+                DELETE FROM jobs WHERE session_id IN (
+                    SELECT session_id FROM jobs WHERE status IN ({placeholders})
+                    ORDER BY updated_at ASC LIMIT ?
+                )
+            """, FINISHED_STATUSES + (finished - self.max_jobs,)).rowcount
+        if expired or overflow:
+            logger.info(f"🧹 Evicted {expired} expired and {overflow} overflow job sessions")
+        return expired + overflow
+
+# Global instance
+job_store = SQLiteJobStore()
@@ -0,0 +1,40 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics: monotonically increasing counters and
+    summaries (count/sum/min/max/last) for observed values such as latencies.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._summaries = {}
+
+    def increment(self, name: str, value: float = 1.0):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {'count': 1, 'sum': value, 'min': value, 'max': value, 'last': value}
+            else:
+                summary['count'] += 1
+                summary['sum'] += value
+                summary['min'] = min(summary['min'], value)
+                summary['max'] = max(summary['max'], value)
+                summary['last'] = value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            summaries = {}
+            for name, summary in self._summaries.items():
+                summaries[name] = dict(summary, avg=summary['sum'] / summary['count'])
+            return {'counters': dict(self._counters), 'summaries': summaries}
+
+# Global instance
+metrics = MetricsRegistry()
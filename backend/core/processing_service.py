@@ -1,157 +1,400 @@
+import asyncio
+import itertools
 import os
 import shutil
+import time
 import uuid
+from collections import deque
 from pathlib import Path
 import cv2
 import logging
-from typing import Dict
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
 
-from backend.database.supabase_client import supabase_client
+from backend.database.repository import repository
 from backend.models.yolo_processor import yolo_processor
 from backend.core.video_processor import video_processor
-from backend.core.stats_calculator import stats_calculator
+from backend.core.stats_calculator import stats_calculator, BrandStatisticsAccumulator
+from backend.core.write_buffer import WriteBehindBuffer
+from backend.core.file_summary import file_summary_service
+from backend.core.brand_rollups import brand_rollup_service
+from backend.core.progress_events import progress_broker, FrameProgress
+from backend.core.job_scheduler import JobCancelled
+from backend.core.response_cache import response_cache
+from backend.core.segment_queue import segment_queue, unpack_detections
 from backend.core.config import (
     FRAMES_DIR, CROPS_DIR, SUPPORTED_VIDEO_FORMATS, SUPPORTED_IMAGE_FORMATS,
-    TARGET_FPS, SUPABASE_IMAGES_BUCKET, SUPABASE_VIDEOS_BUCKET
+    TARGET_FPS, SUPABASE_IMAGES_BUCKET, SUPABASE_VIDEOS_BUCKET,
+    SEGMENT_FRAMES, SEGMENT_POLL_INTERVAL, VISIBILITY_SHARPNESS
 )
 
 logger = logging.getLogger(__name__)
 
+# Pixels of the frame size an analyzed video frame is assumed to have (1080p)
+REFERENCE_FRAME_PIXELS = 1920 * 1080
+
 class ProcessingService:
     def __init__(self):
-        pass
+        # Brand ids never change, so look each name up only once
+        self._brand_ids: Dict[str, int] = {}
+    
+    async def _get_brand_id(self, brand_name: str) -> int:
+        if brand_name not in self._brand_ids:
+            self._brand_ids[brand_name] = await repository.get_or_create_brand(brand_name)
+        return self._brand_ids[brand_name]
+
+    async def _store_summary(self, file_id: int):
+        """Write the file_summaries row; reads fall back to live queries if this fails"""
+        try:
+            await file_summary_service.refresh(file_id)
+        except Exception as e:
+            logger.error(f"Could not store summary for file {file_id}: {e}")
     
-    async def process_video(self, video_path: str, original_filename: str, session_id: str) -> Dict:
-        """Process video file"""
+    async def _store_rollups(self, file_id: int):
+        """Add the file to the brand rollups; a failed file can be added later with the backfill"""
+        try:
+            await brand_rollup_service.refresh(file_id)
+        except Exception as e:
+            logger.error(f"Could not update brand rollups with file {file_id}: {e}")
+
+    def estimate_cost(self, file_path: str, file_type: str) -> float:
+        """
+        Estimated work of a job in analyzed frames, for shortest-job-first
+        scheduling: a video's frame count at TARGET_FPS, an image's size
+        relative to a 1080p frame. Unreadable files count as one frame.
+        """
+        try:
+            if file_type == 'video':
+                video_info = video_processor.get_video_info(file_path)
+                return max(1.0, video_info['duration_seconds'] * TARGET_FPS)
+            # Only the header is read (Pillow is needed for nothing else here)
+            from PIL import Image
+            with Image.open(file_path) as image:
+                width, height = image.size
+            return max(1.0, width * height / REFERENCE_FRAME_PIXELS)
+        except Exception as e:
+            logger.warning(f"Could not estimate cost of {file_path}: {e}")
+            return 1.0
+
+    def cleanup_session(self, session_id: str):
+        """Remove the session's extracted frames and crops"""
+        shutil.rmtree(os.path.join(FRAMES_DIR, session_id), ignore_errors=True)
+        shutil.rmtree(os.path.join(CROPS_DIR, session_id), ignore_errors=True)
+
+    def _publish_detections(self, session_id: str, frame_capture: Dict, detections: list):
+        """Stream one frame's detections to progress subscribers"""
+        progress_broker.publish(session_id, 'detections', {
+            'frame_number': frame_capture['frame_number'],
+            't_start': frame_capture['t_start'],
+            'frame_capture_url': frame_capture['public_url'],
+            'detections': [
+                {'brand_name': d['class_name'], 'score': d['confidence'], 'bbox': d['bbox']}
+                for d in detections
+            ]
+        })
+
+    @staticmethod
+    def _accumulate(statistics: BrandStatisticsAccumulator, detections: List[Dict]):
+        """Fold detections tagged with frame_number, in frame order, one frame at a time"""
+        for frame_number, frame_detections in itertools.groupby(detections, key=lambda d: d['frame_number']):
+            statistics.update(frame_number, list(frame_detections))
+
+    def _checkpoint_statistics(self, checkpoint: Dict) -> BrandStatisticsAccumulator:
+        """Statistics saved in a checkpoint (older checkpoints carry the detections instead)"""
+        if 'statistics' in checkpoint:
+            return BrandStatisticsAccumulator.from_dict(checkpoint['statistics'])
+        statistics = BrandStatisticsAccumulator(TARGET_FPS)
+        self._accumulate(statistics, checkpoint['detections'])
+        return statistics
+
+    async def _exposure_segment_rows(self, statistics: BrandStatisticsAccumulator, file_id: int) -> List[Dict]:
+        """exposure_segments rows of a finished video"""
+        rows = []
+        for brand_name, segments in statistics.exposure_segments().items():
+            brand_id = await self._get_brand_id(brand_name)
+            rows.extend({
+                'file_id': file_id,
+                'brand_id': brand_id,
+                't_start': round(start, 3),
+                't_end': round(end, 3),
+                'duration_seconds': round(end - start, 3),
+                'detections_count': detections_count
+            } for start, end, detections_count in segments)
+        return rows
+
+    async def _temporal_pyramid_rows(self, statistics: BrandStatisticsAccumulator, file_id: int,
+                                     duration_seconds: float) -> List[Dict]:
+        """temporal_pyramids rows of a finished video"""
+        timeline = statistics.timeline
+        brand_ids = {brand_name: await self._get_brand_id(brand_name) for brand_name in timeline.brand_names()}
+        return timeline.rows(file_id, brand_ids, duration_seconds)
+
+    def _visibility_columns(self, image, detections: List[Dict], crops: List) -> List[Dict]:
+        """Visibility columns of each detection of one frame (see StatisticsCalculator.visibility_metrics)"""
+        if not detections:
+            return []
+        height, width = image.shape[:2]
+        sharpness = np.array([video_processor.crop_sharpness(crop) for crop in crops]) if VISIBILITY_SHARPNESS else None
+        metrics = stats_calculator.visibility_metrics([d['bbox'] for d in detections], width, height, sharpness)
+        return [{
+            'area_fraction': round(area_fraction, 5),
+            'center_distance': round(center_distance, 4),
+            'edge_clipped': edge_clipped,
+            'sharpness': round(float(sharpness[index]), 2) if sharpness is not None else None,
+            'visibility': round(visibility, 4)
+        } for index, (area_fraction, center_distance, edge_clipped, visibility) in enumerate(zip(
+            metrics['area_fraction'].tolist(), metrics['center_distance'].tolist(),
+            metrics['edge_clipped'].tolist(), metrics['visibility'].tolist()
+        ))]
+
+    @staticmethod
+    def _finished_result(task: Optional[asyncio.Future]):
+        """Result of a finished, successful task, else None"""
+        if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        return task.result()
+
+    def _detect_frame(self, frame, frames_dir: str, frame_filename: str, crops_dir: str,
+                      crop_filename: Callable[[int], str]):
+        """
+        CPU-bound part of analysing a frame, run in a worker thread: detect logos,
+        save the frame and the crops of its detections, and measure their
+        visibility. Returns (detections, frame capture path or None, crop paths,
+        visibility columns).
+        """
+        detections = yolo_processor.detect_objects(frame)
+        if not detections:
+            return detections, None, [], []
+        frame_capture_path = video_processor.save_full_frame(frame, frames_dir, frame_filename)
+        crops = [yolo_processor.crop_detection(frame, detection['bbox']) for detection in detections]
+        visibility = self._visibility_columns(frame, detections, crops)
+        crop_paths = [video_processor.save_frame_crop(crop, crops_dir, crop_filename(index))
+                      for index, crop in enumerate(crops)]
+        return detections, frame_capture_path, crop_paths, visibility
+
+    async def analyze_frame(self, frame, frame_idx: int, session_id: str, file_id: int, frames_dir: str,
+                             crops_dir: str, crop_offset: int = 0, upsert: bool = False):
+        """
+        Detect logos in one sampled video frame, store its capture and crops,
+        and build its rows. Returns (frame capture row or None, detection rows,
+        detections tagged with frame_number).
+        """
+        # Get frame timestamp - делаем детекции более точными по времени
+        t_start, t_end = video_processor.get_frame_timestamp(frame_idx, TARGET_FPS)
+
+        # Уменьшаем длительность показа детекции для более точной синхронизации
+        detection_duration = 0.5  # Показываем детекцию 0.5 секунды
+        t_end = t_start + detection_duration
+
+        # Detect logos, save the frame and its crops and measure visibility off the event loop
+        frame_filename = f"frame_{frame_idx:06d}.jpg"
+        detections, frame_capture_path, crop_paths, visibility = await asyncio.to_thread(
+            self._detect_frame, frame, frames_dir, frame_filename, crops_dir,
+            lambda crop_index: f"frame_{frame_idx:06d}_detection_{crop_offset + crop_index:04d}.jpg"
+        )
+
+        # If there are detections in this frame, upload the full frame
+        frame_capture_data = None
+        detection_rows = []
+        if detections:
+            # Upload frame to storage
+            frame_storage_path = f"frames/{session_id}/{frame_filename}"
+            frame_url = await repository.upload_file_to_storage(
+                frame_capture_path, SUPABASE_IMAGES_BUCKET, frame_storage_path, upsert=upsert
+            )
+
+            # Insert frame capture record (using actual frame_captures structure)
+            frame_capture_data = {
+                'file_id': file_id,
+                'frame_number': frame_idx,
+                'bucket': SUPABASE_IMAGES_BUCKET,
+                'path': frame_storage_path,
+                'public_url': frame_url,
+                't_start': t_start,
+                't_end': t_end,
+                'detections_count': len(detections)
+            }
+
+        for crop_index, (detection, crop_path) in enumerate(zip(detections, crop_paths)):
+            # Upload crop to storage
+            crop_storage_path = f"crops/{session_id}/{os.path.basename(crop_path)}"
+            crop_url = await repository.upload_file_to_storage(
+                crop_path, SUPABASE_IMAGES_BUCKET, crop_storage_path, upsert=upsert
+            )
+
+            # Get or create brand
+            brand_id = await self._get_brand_id(detection['class_name'])
+
+            # Prepare detection data (frame_capture_id is linked when the buffer flushes)
+            detection_rows.append({
+                'file_id': file_id,
+                'brand_id': brand_id,
+                'score': detection['confidence'],
+                'bbox': detection['bbox'],
+                't_start': t_start,
+                't_end': t_end,
+                'frame': frame_idx,
+                'detection_index': crop_index,
+                'model': 'yolov8',
+                **visibility[crop_index]
+            })
+
+            # Tag for statistics
+            detection['frame_number'] = frame_idx
+            detection['visibility'] = visibility[crop_index]['visibility']
+
+        return frame_capture_data, detection_rows, detections
+
+    async def process_video(self, video_path: str, original_filename: str, session_id: str,
+                            should_cancel: Optional[Callable[[], bool]] = None, checkpoint: Optional[Dict] = None,
+                            on_checkpoint: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Process video file. should_cancel is checked between frames; when it
+        returns True the job stops with JobCancelled and its rows are removed.
+        Each time the rows of all frames up to some frame are written,
+        on_checkpoint receives a checkpoint; passing it back as checkpoint
+        resumes after that frame without duplicating rows or uploads.
+        """
+        upload_task = None
+        write_buffer = None
+        file_id = None
+        resuming = checkpoint is not None
         try:
             # Get video information
-            video_info = video_processor.get_video_info(video_path)
+            video_info = await asyncio.to_thread(video_processor.get_video_info, video_path)
             logger.info(f"Video info: {video_info}")
             
-            # Upload video to Supabase storage
             storage_path = f"videos/{session_id}/{original_filename}"
-            public_url = await supabase_client.upload_file_to_storage(
-                video_path, SUPABASE_VIDEOS_BUCKET, storage_path
-            )
+            if resuming and checkpoint.get('video_url'):
+                # Stored before the restart
+                upload_task = asyncio.get_running_loop().create_future()
+                upload_task.set_result(checkpoint['video_url'])
+            else:
+                # Upload video to storage in the background so frame analysis
+                # does not wait for it (large files go through resumable chunks)
+                upload_task = asyncio.create_task(repository.upload_file_to_storage(
+                    video_path, SUPABASE_VIDEOS_BUCKET, storage_path, upsert=resuming
+                ))
+                # Yield once so the upload thread starts before the blocking frame work
+                await asyncio.sleep(0)
             
-            # Insert file record
-            file_data = {
-                'bucket': SUPABASE_VIDEOS_BUCKET,
-                'path': storage_path,
-                'filename': original_filename,
-                'file_type': 'video',
-                'duration_seconds': int(video_info['duration_seconds']),
-                'fps': video_info['fps']
-            }
-            file_id = await supabase_client.insert_file_record(file_data)
+            if resuming:
+                file_id = checkpoint['file_id']
+                # Rows past the checkpoint may be partly written: drop them and redo those frames
+                await repository.delete_rows_after_frame(file_id, checkpoint['frame'])
+                logger.info(f"♻️ Resuming session {session_id} (file {file_id}) after frame {checkpoint['frame']}")
+            else:
+                # Insert file record
+                file_data = {
+                    'bucket': SUPABASE_VIDEOS_BUCKET,
+                    'path': storage_path,
+                    'filename': original_filename,
+                    'file_type': 'video',
+                    'duration_seconds': int(video_info['duration_seconds']),
+                    'fps': video_info['fps'],
+                    'width': video_info.get('width'),
+                    'height': video_info.get('height')
+                }
+                file_id = await repository.insert_file_record(file_data)
             
             # Extract frames
+            progress_broker.publish(session_id, 'stage', {'stage': 'Extracting frames', 'progress': 20})
             frames_dir = os.path.join(FRAMES_DIR, session_id)
-            frame_paths = video_processor.extract_frames(video_path, frames_dir, TARGET_FPS)
+            frame_paths = await asyncio.to_thread(video_processor.extract_frames, video_path, frames_dir, TARGET_FPS)
             
-            # Process each frame
-            all_detections = []
+            # Process each frame (after the checkpoint when resuming)
+            first_frame = checkpoint['frame'] + 1 if resuming else 0
             crops_dir = os.path.join(CROPS_DIR, session_id)
             
+            # Statistics of the frames whose rows are written, and detections of the frames still in the buffer
+            # Frame numbers count sampled frames, so they tick at TARGET_FPS
+            statistics = self._checkpoint_statistics(checkpoint) if resuming \
+                else BrandStatisticsAccumulator(TARGET_FPS)
+            uncommitted = deque()
+            detections_count = statistics.total_detections
+            
+            def commit_frames(frame_number: int):
+                while uncommitted and uncommitted[0][0] <= frame_number:
+                    statistics.update(*uncommitted.popleft())
+                progress_broker.publish(session_id, 'statistics', {
+                    'frame_number': frame_number, 'statistics': statistics.snapshot()
+                })
+                if on_checkpoint is None:
+                    return
+                on_checkpoint({
+                    'file_id': file_id,
+                    'frame': frame_number,
+                    'statistics': statistics.to_dict(),
+                    'video_url': self._finished_result(upload_task)
+                })
+            
+            write_buffer = WriteBehindBuffer(repository, session_id, on_commit=commit_frames,
+                                             committed_frame=first_frame - 1)
+            write_buffer.start()
+            
+            progress_broker.publish(session_id, 'stage', {'stage': 'Detecting logos', 'progress': 20})
+            frame_progress = FrameProgress(session_id, len(frame_paths), initial_frames=first_frame)
+            
             for frame_idx, frame_path in enumerate(frame_paths):
+                if frame_idx < first_frame:
+                    continue
+                if should_cancel is not None and should_cancel():
+                    raise JobCancelled(session_id)
+                
                 # Read frame
-                frame = cv2.imread(frame_path)
+                frame = await asyncio.to_thread(cv2.imread, frame_path)
                 if frame is None:
+                    write_buffer.mark_processed(frame_idx)
                     continue
                 
-                # Get frame timestamp - делаем детекции более точными по времени
-                t_start, t_end = video_processor.get_frame_timestamp(frame_idx, TARGET_FPS)
-                
-                # Уменьшаем длительность показа детекции для более точной синхронизации
-                detection_duration = 0.5  # Показываем детекцию 0.5 секунды
-                t_end = t_start + detection_duration
-                
-                # Detect objects in frame
-                detections = yolo_processor.detect_objects(frame)
-                
-                # If there are detections in this frame, save the full frame
-                frame_capture_id = None
+                frame_capture_data, detection_rows, detections = await self.analyze_frame(
+                    frame, frame_idx, session_id, file_id, frames_dir, crops_dir,
+                    crop_offset=detections_count, upsert=resuming
+                )
+                detections_count += len(detections)
                 if detections:
-                    # Save full frame with detections
-                    frame_filename = f"frame_{frame_idx:06d}.jpg"
-                    frame_capture_path = video_processor.save_full_frame(frame, frames_dir, frame_filename)
-                    
-                    # Upload frame to storage
-                    frame_storage_path = f"frames/{session_id}/{frame_filename}"
-                    frame_url = await supabase_client.upload_file_to_storage(
-                        frame_capture_path, SUPABASE_IMAGES_BUCKET, frame_storage_path
-                    )
-                    
-                    # Insert frame capture record (using actual frame_captures structure)
-                    frame_capture_data = {
-                        'file_id': file_id,
-                        'frame_number': frame_idx,
-                        'bucket': SUPABASE_IMAGES_BUCKET,
-                        'path': frame_storage_path,
-                        'public_url': frame_url,
-                        't_start': t_start,
-                        't_end': t_end,
-                        'detections_count': len(detections)
-                    }
-                    frame_capture_id = await supabase_client.insert_frame_capture(frame_capture_data)
+                    uncommitted.append((frame_idx, detections))
                 
-                for detection in detections:
-                    # Crop detection area
-                    crop = yolo_processor.crop_detection(frame, detection['bbox'])
-                    
-                    # Save crop
-                    crop_filename = f"frame_{frame_idx:06d}_detection_{len(all_detections):04d}.jpg"
-                    crop_path = video_processor.save_frame_crop(crop, crops_dir, crop_filename)
-                    
-                    # Upload crop to storage
-                    crop_storage_path = f"crops/{session_id}/{crop_filename}"
-                    crop_url = await supabase_client.upload_file_to_storage(
-                        crop_path, SUPABASE_IMAGES_BUCKET, crop_storage_path
-                    )
-                    
-                    # Get or create brand
-                    brand_id = await supabase_client.get_or_create_brand(detection['class_name'])
-                    
-                    # Prepare detection data
-                    detection_data = {
-                        'file_id': file_id,
-                        'brand_id': brand_id,
-                        'score': detection['confidence'],
-                        'bbox': detection['bbox'],
-                        't_start': t_start,
-                        't_end': t_end,
-                        'frame': frame_idx,
-                        'model': 'yolov8'
-                    }
-                    
-                    # Only add frame_capture_id if it's not None
-                    if frame_capture_id is not None:
-                        detection_data['frame_capture_id'] = frame_capture_id
-                    
-                    # Insert detection
-                    detection_id = await supabase_client.insert_detection(detection_data)
-                    
-                    # Add to all detections for statistics
-                    detection['frame_number'] = frame_idx
-                    all_detections.append(detection)
-            
-            # Calculate statistics
-            brand_stats = stats_calculator.calculate_brand_statistics(
-                all_detections, video_info['duration_seconds'], video_info['fps']
-            )
+                # Queue rows; the buffer writes them in the background
+                if detection_rows:
+                    write_buffer.add_frame(frame_capture_data, detection_rows)
+                    self._publish_detections(session_id, frame_capture_data, detections)
+                write_buffer.mark_processed(frame_idx)
+                frame_progress.update(frame_idx + 1)
+                
+                # Give background flushes and uploads a chance to run between frames
+                await asyncio.sleep(0)
+            
+            # Write the remaining frame rows; their commit folds the last frames into the statistics
+            await write_buffer.flush()
+            brand_stats = statistics.snapshot()
             
             # Insert predictions
-            prediction_ids = []
+            prediction_rows = []
             for brand_name, stats in brand_stats.items():
                 logger.info(f"🔄 Processing brand: {brand_name}, stats: {stats}")
-                brand_id = await supabase_client.get_or_create_brand(brand_name)
+                brand_id = await self._get_brand_id(brand_name)
 
-                prediction_data = stats_calculator.prepare_prediction_data(
+                prediction_rows.append(stats_calculator.prepare_prediction_data(
                     stats, brand_id, file_id, video_info['duration_seconds']
-                )
-
-                prediction_id = await supabase_client.insert_prediction(prediction_data)
-                prediction_ids.append(prediction_id)
+                ))
+            write_buffer.add_predictions(prediction_rows)
+            write_buffer.add_exposure_segments(await self._exposure_segment_rows(statistics, file_id))
+            write_buffer.add_temporal_pyramids(
+                await self._temporal_pyramid_rows(statistics, file_id, video_info['duration_seconds'])
+            )
+            
+            # Every buffered row must be confirmed before the job counts as complete
+            progress_broker.publish(session_id, 'stage', {'stage': 'Saving results', 'progress': 95})
+            await write_buffer.drain()
+            
+            # The source video must be fully stored before it can be removed
+            if not upload_task.done():
+                progress_broker.publish(session_id, 'stage', {'stage': 'Uploading video', 'progress': 97})
+            public_url = await upload_task
+            
+            await self._store_summary(file_id)
+            await self._store_rollups(file_id)
             
             # Cleanup temporary files
             shutil.rmtree(frames_dir, ignore_errors=True)
@@ -161,55 +404,240 @@ class ProcessingService:
             return {
                 'file_id': file_id,
                 'session_id': session_id,
-                'detections_count': len(all_detections),
+                'detections_count': statistics.total_detections,
                 'brands_detected': list(brand_stats.keys()),
                 'statistics': brand_stats,
                 'video_url': public_url
             }
             
+        except asyncio.CancelledError:
+            # Worker shutting down: write nothing more, the job resumes from its checkpoint
+            if write_buffer is not None:
+                write_buffer.abort()
+            raise
+        except JobCancelled:
+            logger.info(f"🛑 Video processing cancelled for session {session_id}")
+            if write_buffer is not None:
+                await write_buffer.discard()
+            # Let the source upload finish before its file is removed
+            if upload_task is not None:
+                await asyncio.gather(upload_task, return_exceptions=True)
+            if file_id is not None:
+                await repository.delete_file(file_id)
+                response_cache.invalidate_file(file_id)
+            self.cleanup_session(session_id)
+            raise
         except Exception as e:
             logger.error(f"Error processing video: {e}")
+            if upload_task is not None and not upload_task.done():
+                upload_task.cancel()
+            if write_buffer is not None:
+                try:
+                    await write_buffer.drain()
+                except Exception as drain_error:
+                    logger.error(f"Could not drain write buffer after failure: {drain_error}")
+            raise
+
+    def segment_ranges(self, video_info: Dict, segment_frames: int = SEGMENT_FRAMES) -> List[Tuple[int, Optional[int]]]:
+        """Split a video's sampled frames into [start, end) ranges; the last one runs to the end"""
+        total_frames = video_processor.sampled_frame_count(video_info, TARGET_FPS)
+        starts = list(range(0, max(total_frames, 1), segment_frames))
+        return [(start, next_start) for start, next_start in zip(starts, starts[1:])] + [(starts[-1], None)]
+
+    async def _wait_for_segments(self, session_id: str, frame_progress: FrameProgress,
+                                 should_cancel: Optional[Callable[[], bool]]) -> List[Dict]:
+        """Poll the segment queue until every segment of the job has finished"""
+        while True:
+            segments = await asyncio.to_thread(segment_queue.segments, session_id)
+            if should_cancel is not None and should_cancel():
+                raise JobCancelled(session_id)
+            failed = [segment for segment in segments if segment['status'] in ('failed', 'cancelled')]
+            if failed:
+                raise Exception(f"Segment {failed[0]['start_frame']} of {session_id} {failed[0]['status']}: "
+                                f"{failed[0]['error']}")
+            done = [segment for segment in segments if segment['status'] == 'done']
+            frame_progress.update(sum(segment['result']['frames_processed'] for segment in done))
+            if len(done) == len(segments):
+                return segments
+            await asyncio.sleep(SEGMENT_POLL_INTERVAL)
+
+    async def _stop_segments(self, session_id: str):
+        """Cancel a job's segments and wait until no worker is still writing its rows"""
+        await asyncio.to_thread(segment_queue.cancel, session_id)
+        while True:
+            segments = await asyncio.to_thread(segment_queue.segments, session_id)
+            # A cancelling segment whose lease ran out belongs to a dead worker
+            if not any(segment['status'] in ('running', 'cancelling') and segment['lease_expires'] > time.time()
+                       for segment in segments):
+                return
+            await asyncio.sleep(SEGMENT_POLL_INTERVAL)
+
+    async def process_video_distributed(self, video_path: str, original_filename: str, session_id: str,
+                                        should_cancel: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        Process a video on segment workers (worker.py): the video is split
+        into SEGMENT_FRAMES-frame segments on the segment queue, workers
+        write their frames' rows, and the coordinator merges the segments'
+        detections in frame order into the same statistics and predictions
+        as process_video. Called again for a job that already has segments
+        (after a restart), it waits for them instead of starting over.
+        """
+        upload_task = None
+        file_id = None
+        try:
+            video_info = await asyncio.to_thread(video_processor.get_video_info, video_path)
+            logger.info(f"Video info: {video_info}")
+            
+            storage_path = f"videos/{session_id}/{original_filename}"
+            segments = await asyncio.to_thread(segment_queue.segments, session_id)
+            resuming = bool(segments)
+            upload_task = asyncio.create_task(repository.upload_file_to_storage(
+                video_path, SUPABASE_VIDEOS_BUCKET, storage_path, upsert=resuming
+            ))
+            await asyncio.sleep(0)
+            
+            if resuming:
+                file_id = segments[0]['file_id']
+                logger.info(f"♻️ Resuming distributed session {session_id} (file {file_id})")
+            else:
+                file_data = {
+                    'bucket': SUPABASE_VIDEOS_BUCKET,
+                    'path': storage_path,
+                    'filename': original_filename,
+                    'file_type': 'video',
+                    'duration_seconds': int(video_info['duration_seconds']),
+                    'fps': video_info['fps'],
+                    'width': video_info.get('width'),
+                    'height': video_info.get('height')
+                }
+                file_id = await repository.insert_file_record(file_data)
+                ranges = self.segment_ranges(video_info)
+                await asyncio.to_thread(segment_queue.enqueue, session_id, file_id, os.path.abspath(video_path), ranges)
+                logger.info(f"📤 Session {session_id} split into {len(ranges)} segments")
+            
+            progress_broker.publish(session_id, 'stage', {'stage': 'Detecting logos', 'progress': 20})
+            frame_progress = FrameProgress(session_id, video_processor.sampled_frame_count(video_info, TARGET_FPS))
+            segments = await self._wait_for_segments(session_id, frame_progress, should_cancel)
+            
+            # Segments come back in frame order, so this folds the detections as a single node would
+            statistics = BrandStatisticsAccumulator(TARGET_FPS)
+            for segment in segments:
+                self._accumulate(statistics, unpack_detections(segment['result']['detections']))
+            brand_stats = statistics.snapshot()
+            
+            if resuming:
+                # An earlier run may have stored predictions already; no rows lie past the last frame
+                frames_total = sum(segment['result']['frames_processed'] for segment in segments)
+                await repository.delete_rows_after_frame(file_id, frames_total - 1)
+            write_buffer = WriteBehindBuffer(repository, session_id)
+            prediction_rows = []
+            for brand_name, stats in brand_stats.items():
+                brand_id = await self._get_brand_id(brand_name)
+                prediction_rows.append(stats_calculator.prepare_prediction_data(
+                    stats, brand_id, file_id, video_info['duration_seconds']
+                ))
+            write_buffer.add_predictions(prediction_rows)
+            write_buffer.add_exposure_segments(await self._exposure_segment_rows(statistics, file_id))
+            write_buffer.add_temporal_pyramids(
+                await self._temporal_pyramid_rows(statistics, file_id, video_info['duration_seconds'])
+            )
+            progress_broker.publish(session_id, 'stage', {'stage': 'Saving results', 'progress': 95})
+            await write_buffer.drain()
+            
+            if not upload_task.done():
+                progress_broker.publish(session_id, 'stage', {'stage': 'Uploading video', 'progress': 97})
+            public_url = await upload_task
+            
+            await self._store_summary(file_id)
+            await self._store_rollups(file_id)
+            await asyncio.to_thread(segment_queue.purge, session_id)
+            self.cleanup_session(session_id)
+            os.remove(video_path)
+            
+            return {
+                'file_id': file_id,
+                'session_id': session_id,
+                'detections_count': statistics.total_detections,
+                'brands_detected': list(brand_stats.keys()),
+                'statistics': brand_stats,
+                'video_url': public_url
+            }
+            
+        except asyncio.CancelledError:
+            # API worker shutting down: segments keep running and the job resumes from the queue
+            raise
+        except JobCancelled:
+            logger.info(f"🛑 Distributed processing cancelled for session {session_id}")
+            await self._stop_segments(session_id)
+            if upload_task is not None:
+                await asyncio.gather(upload_task, return_exceptions=True)
+            if file_id is not None:
+                await repository.delete_file(file_id)
+                response_cache.invalidate_file(file_id)
+            await asyncio.to_thread(segment_queue.purge, session_id)
+            self.cleanup_session(session_id)
+            raise
+        except Exception as e:
+            logger.error(f"Error processing video on segment workers: {e}")
+            if upload_task is not None and not upload_task.done():
+                upload_task.cancel()
+            await self._stop_segments(session_id)
+            await asyncio.to_thread(segment_queue.purge, session_id)
             raise
 
-    async def process_image(self, image_path: str, original_filename: str, session_id: str) -> Dict:
-        """Process image file"""
+    async def process_image(self, image_path: str, original_filename: str, session_id: str,
+                            should_cancel: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        Process image file. should_cancel is checked before the upload, after
+        detection and before the rows are written; a cancelled image leaves
+        no rows, frames or crops behind.
+        """
+        file_id = None
+        
+        def check_cancelled():
+            if should_cancel is not None and should_cancel():
+                raise JobCancelled(session_id)
+        
         try:
+            check_cancelled()
+            
             # Upload image to Supabase storage
             storage_path = f"images/{session_id}/{original_filename}"
-            public_url = await supabase_client.upload_file_to_storage(
+            public_url = await repository.upload_file_to_storage(
                 image_path, SUPABASE_IMAGES_BUCKET, storage_path
             )
             
+            # Read image (its size goes into the file record)
+            image = await asyncio.to_thread(cv2.imread, image_path)
+            
             # Insert file record
             file_data = {
                 'bucket': SUPABASE_IMAGES_BUCKET,
                 'path': storage_path,
                 'filename': original_filename,
-                'file_type': 'image'
+                'file_type': 'image',
+                'width': image.shape[1],
+                'height': image.shape[0]
             }
-            file_id = await supabase_client.insert_file_record(file_data)
-            
-            # Read and process image
-            image = cv2.imread(image_path)
-            detections = yolo_processor.detect_objects(image)
+            file_id = await repository.insert_file_record(file_data)
             
-            # Process detections
+            # Process image off the event loop: detect, save the image and its crops, measure visibility
             crops_dir = os.path.join(CROPS_DIR, session_id)
-            detection_ids = []
+            frames_dir = os.path.join(FRAMES_DIR, session_id)
+            frame_filename = f"image_frame.jpg"
+            detections, frame_capture_path, crop_paths, visibility = await asyncio.to_thread(
+                self._detect_frame, image, frames_dir, frame_filename, crops_dir,
+                lambda idx: f"image_detection_{idx:04d}.jpg"
+            )
+            check_cancelled()
             
-            # If there are detections, save the full image as frame capture
-            frame_capture_id = None
+            # If there are detections, upload the full image as frame capture
+            frame_capture_data = None
+            detection_rows = []
             if detections:
-                # Create frames directory for this session
-                frames_dir = os.path.join(FRAMES_DIR, session_id)
-                
-                # Save full image with detections
-                frame_filename = f"image_frame.jpg"
-                frame_capture_path = video_processor.save_full_frame(image, frames_dir, frame_filename)
-                
                 # Upload frame to storage
                 frame_storage_path = f"frames/{session_id}/{frame_filename}"
-                frame_url = await supabase_client.upload_file_to_storage(
+                frame_url = await repository.upload_file_to_storage(
                     frame_capture_path, SUPABASE_IMAGES_BUCKET, frame_storage_path
                 )
                 
@@ -224,45 +652,42 @@ class ProcessingService:
                     't_end': 0.0,
                     'detections_count': len(detections)
                 }
-                frame_capture_id = await supabase_client.insert_frame_capture(frame_capture_data)
                 
                 # Cleanup frames directory after upload
                 shutil.rmtree(frames_dir, ignore_errors=True)
             
-            for idx, detection in enumerate(detections):
-                # Crop detection area
-                crop = yolo_processor.crop_detection(image, detection['bbox'])
-                
-                # Save crop
-                crop_filename = f"image_detection_{idx:04d}.jpg"
-                crop_path = video_processor.save_frame_crop(crop, crops_dir, crop_filename)
-                
+            for idx, (detection, crop_path) in enumerate(zip(detections, crop_paths)):
                 # Upload crop to storage
-                crop_storage_path = f"crops/{session_id}/{crop_filename}"
-                crop_url = await supabase_client.upload_file_to_storage(
+                crop_storage_path = f"crops/{session_id}/{os.path.basename(crop_path)}"
+                crop_url = await repository.upload_file_to_storage(
                     crop_path, SUPABASE_IMAGES_BUCKET, crop_storage_path
                 )
                 
                 # Get or create brand
-                brand_id = await supabase_client.get_or_create_brand(detection['class_name'])
+                brand_id = await self._get_brand_id(detection['class_name'])
                 
                 # Prepare detection data
-                detection_data = {
+                detection_rows.append({
                     'file_id': file_id,
                     'brand_id': brand_id,
                     'score': detection['confidence'],
                     'bbox': detection['bbox'],
                     'frame': 0,
-                    'model': 'yolov8'
-                }
-                
-                # Only add frame_capture_id if it's not None
-                if frame_capture_id is not None:
-                    detection_data['frame_capture_id'] = frame_capture_id
-                
-                # Insert detection
-                detection_id = await supabase_client.insert_detection(detection_data)
-                detection_ids.append(detection_id)
+                    'detection_index': idx,
+                    'model': 'yolov8',
+                    **visibility[idx]
+                })
+            
+            # Write the frame capture and its detections in bulk
+            check_cancelled()
+            write_buffer = WriteBehindBuffer(repository, session_id)
+            if detection_rows:
+                write_buffer.add_frame(frame_capture_data, detection_rows)
+                self._publish_detections(session_id, frame_capture_data, detections)
+            await write_buffer.drain()
+            
+            await self._store_summary(file_id)
+            await self._store_rollups(file_id)
             
             # Cleanup
             shutil.rmtree(crops_dir, ignore_errors=True)
@@ -277,6 +702,13 @@ class ProcessingService:
                 'image_url': public_url
             }
             
+        except JobCancelled:
+            logger.info(f"🛑 Image processing cancelled for session {session_id}")
+            if file_id is not None:
+                await repository.delete_file(file_id)
+                response_cache.invalidate_file(file_id)
+            self.cleanup_session(session_id)
+            raise
         except Exception as e:
             logger.error(f"Error processing image: {e}")
             raise
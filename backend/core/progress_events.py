@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Optional, Set
+
+from backend.core.config import PROGRESS_EVENTS_TTL, PROGRESS_EVENTS_IDLE_TTL, PROGRESS_EVENTS_HEARTBEAT
+
+logger = logging.getLogger(__name__)
+
+# Events after which a session's stream is closed
+TERMINAL_EVENTS = ('completed', 'error', 'cancelled')
+# Events whose latest payload is replayed to new subscribers, in this order
+REPLAYED_EVENTS = ('stage', 'progress') + TERMINAL_EVENTS
+# Per-subscriber backlog; a client that falls this far behind misses events
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+class ProgressBroker:
+    """
+    Fans out processing events of each session to Server-Sent Events
+    subscribers. Events are stage transitions, frame progress (throughput
+    and ETA), detection batches and a final completed/error/cancelled event. The
+    latest stage/progress/terminal payloads are kept so a subscriber that
+    connects late starts from the current state. That state is dropped ttl
+    seconds after the terminal event, or after idle_ttl seconds without any
+    event (a job that died or raised before publishing one).
+    """
+
+    def __init__(self, ttl: float = PROGRESS_EVENTS_TTL, heartbeat: float = PROGRESS_EVENTS_HEARTBEAT,
+                 idle_ttl: float = PROGRESS_EVENTS_IDLE_TTL):
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.idle_ttl = idle_ttl
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._state: Dict[str, Dict] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._updated_at: Dict[str, float] = {}
+        self._last_prune = time.monotonic()
+
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self._state
+
+    def latest(self, session_id: str) -> Dict:
+        """Latest payload of each replayed event type for a session"""
+        return dict(self._state.get(session_id, {}))
+
+    def publish(self, session_id: str, event: str, data: Dict):
+        """Send an event to every subscriber of the session"""
+        now = time.monotonic()
+        if event in REPLAYED_EVENTS:
+            self._state.setdefault(session_id, {})[event] = data
+            self._updated_at[session_id] = now
+        message = {'event': event, 'data': data}
+        for queue in self._subscribers.get(session_id, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping {event} event for slow subscriber of session {session_id}")
+
+        if event in TERMINAL_EVENTS:
+            self._finished_at[session_id] = now
+        # Terminal events prune at once; otherwise at most once per heartbeat interval
+        if event in TERMINAL_EVENTS or now - self._last_prune >= self.heartbeat:
+            self._prune()
+
+    def forget(self, session_id: str):
+        self._state.pop(session_id, None)
+        self._finished_at.pop(session_id, None)
+        self._updated_at.pop(session_id, None)
+
+    def _prune(self):
+        """Drop the state of sessions finished more than ttl seconds ago or idle for idle_ttl seconds"""
+        now = time.monotonic()
+        self._last_prune = now
+        expired = [s for s, finished in self._finished_at.items() if finished < now - self.ttl]
+        expired += [s for s, updated in self._updated_at.items()
+                    if updated < now - self.idle_ttl and s not in self._finished_at]
+        for session_id in expired:
+            if not self._subscribers.get(session_id):
+                self.forget(session_id)
+
+    @staticmethod
+    def format_event(event: str, data: Dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    async def stream(self, session_id: str) -> AsyncIterator[str]:
+        """SSE stream of a session; ends after its completed or error event"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[session_id].add(queue)
+        try:
+            # Replay the current state first
+            state = self.latest(session_id)
+            for event in REPLAYED_EVENTS:
+                if event in state:
+                    yield self.format_event(event, state[event])
+            if any(event in state for event in TERMINAL_EVENTS):
+                return
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield self.format_event(message['event'], message['data'])
+                if message['event'] in TERMINAL_EVENTS:
+                    return
+        finally:
+            subscribers = self._subscribers.get(session_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[session_id]
+
+class FrameProgress:
+    """Frames processed, throughput and ETA of one video job"""
+
+    def __init__(self, session_id: str, total_frames: int, start_progress: float = 20, end_progress: float = 95,
+                 min_interval: float = 0.5, broker: Optional[ProgressBroker] = None, initial_frames: int = 0):
+        self.session_id = session_id
+        self.total_frames = total_frames
+        # Frames done before this run (a resumed job); excluded from throughput
+        self.initial_frames = initial_frames
+        self.start_progress = start_progress
+        self.end_progress = end_progress
+        self.min_interval = min_interval
+        self.broker = broker or progress_broker
+        self.started = time.monotonic()
+        self._last_published = 0.0
+
+    def update(self, frames_processed: int):
+        """Publish a progress event, at most once per min_interval (always for the last frame)"""
+        now = time.monotonic()
+        if frames_processed < self.total_frames and now - self._last_published < self.min_interval:
+            return
+        self._last_published = now
+
+        elapsed = now - self.started
+        throughput = (frames_processed - self.initial_frames) / elapsed if elapsed > 0 else 0
+        remaining = self.total_frames - frames_processed
+        fraction = frames_processed / self.total_frames if self.total_frames else 1
+        self.broker.publish(self.session_id, 'progress', {
+            'progress': round(self.start_progress + (self.end_progress - self.start_progress) * fraction, 1),
+            'frames_processed': frames_processed,
+            'total_frames': self.total_frames,
+            'frames_per_second': round(throughput, 2),
+            'eta_seconds': round(remaining / throughput, 1) if throughput > 0 else None
+        })
+
+# Global instance
+progress_broker = ProgressBroker()
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from backend.core.config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL
+from backend.core.metrics import metrics
+from backend.core.job_store import job_store, JobStore
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Read-through LRU/TTL cache of serialized JSON responses for file-scoped
+    endpoints. Entries are keyed by (endpoint, file_id, file version,
+    params) and bounded by entry count and total bytes. Each uvicorn worker
+    has its own entries, but the file version lives in the shared job store:
+    a write in any process bumps it, so every worker misses its stale
+    entries on the next request instead of serving them until the TTL.
+    Every response carries an ETag so clients revalidate with If-None-Match.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttl: float = RESPONSE_CACHE_TTL,
+                 versions: JobStore = job_store):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.versions = versions
+        self._lock = threading.Lock()
+        # key -> (body, etag, expires_at)
+        self._entries: "OrderedDict[Tuple, Tuple[bytes, str, float]]" = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _serialize(content) -> bytes:
+        # Same encoding as JSONResponse
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    def get(self, key: Tuple) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, etag, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return body, etag
+
+    def set(self, key: Tuple, body: bytes, etag: str):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, etag, time.monotonic() + self.ttl)
+            self._bytes += len(body)
+            # Evict least recently used entries until within both limits
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                metrics.increment('response_cache.evictions')
+
+    def _remove(self, key: Tuple):
+        body, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def invalidate_file(self, file_id: int):
+        """Drop every cached response of a file, in this process and (through its version) in all others"""
+        try:
+            self.versions.bump_file_version(file_id)
+        except Exception as e:
+            logger.error(f"Could not bump cache version of file {file_id}: {e}")
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == file_id]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+    @staticmethod
+    def _matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    async def respond(self, request: Request, endpoint: str, file_id: int,
+                      load: Callable[[], Awaitable], params: Tuple[Hashable, ...] = ()) -> Response:
+        """
+        Serve a cached response or build it with load(). Returns 304 when
+        the client's If-None-Match matches the current ETag.
+        """
+        # Read before load(): a write while loading bumps the version, so the entry is never served.
+        # The version lives in the shared SQLite job store, so it is read off the event loop
+        version = await asyncio.to_thread(self.versions.file_version, file_id)
+        key = (endpoint, file_id, version) + tuple(params)
+        cached = self.get(key)
+        if cached is not None:
+            metrics.increment('response_cache.hits')
+            body, etag = cached
+        else:
+            metrics.increment('response_cache.misses')
+            body = self._serialize(await load())
+            etag = self._etag(body)
+            self.set(key, body, etag)
+
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if self._matches(request.headers.get('if-none-match'), etag):
+            metrics.increment('response_cache.not_modified')
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+# Global instance
+response_cache = ResponseCache()
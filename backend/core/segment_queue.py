@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.config import (
+    SEGMENT_QUEUE_BACKEND, SEGMENT_QUEUE_PATH, SEGMENT_LEASE_SECONDS, SEGMENT_MAX_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Segment lifecycle: pending -> running -> done | failed, back to pending on retry;
+# cancel() moves pending to cancelled and running to cancelling until its worker stops
+FINISHED_SEGMENT_STATUSES = ('done', 'failed', 'cancelled')
+
+# Columns a segment result keeps of each detection: only what the coordinator's
+# statistics need (the full rows are already in the repository)
+SEGMENT_DETECTION_COLUMNS = ('frame_number', 'class_name', 'confidence', 'visibility')
+
+def pack_detections(detections: List[Dict]) -> List[List]:
+    """Detections as compact rows of SEGMENT_DETECTION_COLUMNS, for a segment result"""
+    return [[detection.get(column) for column in SEGMENT_DETECTION_COLUMNS] for detection in detections]
+
+def unpack_detections(rows: List) -> List[Dict]:
+    """Detections of a segment result (results stored before packing hold full dicts)"""
+    return [row if isinstance(row, dict) else dict(zip(SEGMENT_DETECTION_COLUMNS, row)) for row in rows]
+
+class SegmentQueue(ABC):
+    """
+    Queue of video segments (ranges of sampled frame indices) shared by the
+    API coordinator and any number of segment workers. A worker claims a
+    segment under a lease; a segment whose lease runs out (its worker died)
+    is handed to another worker, up to max_attempts times.
+    """
+
+    @abstractmethod
+    def enqueue(self, job_id: str, file_id: int, video_path: str,
+                ranges: List[Tuple[int, Optional[int]]]) -> int:
+        """Add a job's segments [start, end) (end None = to the last frame); no-op if it already has them"""
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Lease the oldest available segment to a worker, or None"""
+
+    @abstractmethod
+    def heartbeat(self, segment: Dict) -> bool:
+        """Extend the lease of a claimed segment; False if the worker must stop (cancelled or lease lost)"""
+
+    @abstractmethod
+    def complete(self, segment: Dict, result: Dict) -> None:
+        """Store a claimed segment's result (frames_processed and its detections packed by pack_detections)"""
+
+    @abstractmethod
+    def fail(self, segment: Dict, error: str) -> None:
+        """Give a claimed segment back for retry, or fail it after max_attempts"""
+
+    @abstractmethod
+    def segments(self, job_id: str) -> List[Dict]:
+        """A job's segments in frame order, with their results"""
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> None:
+        """Cancel a job's pending segments and ask workers to stop its running ones"""
+
+    @abstractmethod
+    def purge(self, job_id: str) -> None:
+        """Drop a job's segments once merged"""
+
+    def job_status(self, job_id: str) -> Dict:
+        """Segment counts per status plus frames processed so far"""
+        segments = self.segments(job_id)
+        status = {'total': len(segments), 'frames_done': 0}
+        for segment in segments:
+            status[segment['status']] = status.get(segment['status'], 0) + 1
+            if segment['status'] == 'done':
+                status['frames_done'] += segment['result']['frames_processed']
+        return status
+
+class SQLiteSegmentQueue(SegmentQueue):
+    """
+    Segment queue in an SQLite file, so distributed processing runs without
+    external services. Workers on other hosts need the file (and the spooled
+    videos) on a shared volume.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS segments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        file_id INTEGER NOT NULL,
+        video_path TEXT NOT NULL,
+        start_frame INTEGER NOT NULL,
+        end_frame INTEGER,
+        status TEXT NOT NULL DEFAULT 'pending',
+        worker_id TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_expires REAL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        UNIQUE (job_id, start_frame)
+    );
+    CREATE INDEX IF NOT EXISTS idx_segments_status_id ON segments(status, id);
+    CREATE INDEX IF NOT EXISTS idx_segments_job_id ON segments(job_id, start_frame);
+    """
+
+    def __init__(self, db_path: str = SEGMENT_QUEUE_PATH, lease_seconds: float = SEGMENT_LEASE_SECONDS,
+                 max_attempts: int = SEGMENT_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _segment(row: sqlite3.Row) -> Dict:
+        segment = dict(row)
+        segment['result'] = json.loads(segment['result']) if segment['result'] else None
+        return segment
+
+    def enqueue(self, job_id: str, file_id: int, video_path: str,
+                ranges: List[Tuple[int, Optional[int]]]) -> int:
+        now = time.time()
+        cursor = self.conn.executemany("""
+            INSERT OR IGNORE INTO segments (job_id, file_id, video_path, start_frame, end_frame, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(job_id, file_id, video_path, start, end, now) for start, end in ranges])
+        return cursor.rowcount
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        conn = self.conn
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so two workers never lease the same segment
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Segments of dead workers: out of attempts, or cancelled while they ran
+            conn.execute("""
+                UPDATE segments SET status = 'failed', error = 'Lease expired on every attempt'
+                WHERE status = 'running' AND lease_expires < ? AND attempts >= ?
+            """, (now, self.max_attempts))
+            conn.execute(
+                "UPDATE segments SET status = 'cancelled' WHERE status = 'cancelling' AND lease_expires < ?", (now,)
+            )
+            row = conn.execute("""
+                SELECT id FROM segments
+                WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?)
+                ORDER BY id LIMIT 1
+            """, (now,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("""
+                UPDATE segments SET status = 'running', worker_id = ?, attempts = attempts + 1, lease_expires = ?
+                WHERE id = ?
+            """, (worker_id, now + self.lease_seconds, row['id']))
+            segment = conn.execute("SELECT * FROM segments WHERE id = ?", (row['id'],)).fetchone()
+            conn.execute("COMMIT")
+            return self._segment(segment)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # Updates from a worker only apply while it still holds the lease: same worker and attempt
+    OWNED = "id = ? AND worker_id = ? AND attempts = ? AND status IN ('running', 'cancelling')"
+
+    @staticmethod
+    def _owner(segment: Dict) -> Tuple:
+        return segment['id'], segment['worker_id'], segment['attempts']
+
+    def heartbeat(self, segment: Dict) -> bool:
+        cursor = self.conn.execute(
+            f"UPDATE segments SET lease_expires = ? WHERE {self.OWNED} AND status = 'running'",
+            (time.time() + self.lease_seconds,) + self._owner(segment)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, segment: Dict, result: Dict) -> None:
+        self.conn.execute(f"""
+            UPDATE segments
+            SET status = CASE WHEN status = 'cancelling' THEN 'cancelled' ELSE 'done' END, result = ?, error = NULL
+            WHERE {self.OWNED}
+        """, (json.dumps(result, default=str),) + self._owner(segment))
+
+    def fail(self, segment: Dict, error: str) -> None:
+        self.conn.execute(f"""
+            UPDATE segments
+            SET status = CASE WHEN status = 'cancelling' THEN 'cancelled'
+                              WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                error = ?, lease_expires = NULL
+            WHERE {self.OWNED}
+        """, (self.max_attempts, error) + self._owner(segment))
+
+    def segments(self, job_id: str) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT * FROM segments WHERE job_id = ? ORDER BY start_frame", (job_id,)
+        ).fetchall()
+        return [self._segment(row) for row in rows]
+
+    def cancel(self, job_id: str) -> None:
+        self.conn.execute("""
+            UPDATE segments SET status = CASE WHEN status = 'running' THEN 'cancelling' ELSE 'cancelled' END
+            WHERE job_id = ? AND status IN ('pending', 'running')
+        """, (job_id,))
+
+    def purge(self, job_id: str) -> None:
+        self.conn.execute("DELETE FROM segments WHERE job_id = ?", (job_id,))
+
+def create_segment_queue(backend: str = SEGMENT_QUEUE_BACKEND) -> SegmentQueue:
+    """Build the segment queue selected by SEGMENT_QUEUE_BACKEND ("sqlite")"""
+    if backend == "sqlite":
+        return SQLiteSegmentQueue()
+    raise ValueError(f"Unknown SEGMENT_QUEUE_BACKEND: {backend}")
+
+# Global instance
+segment_queue = create_segment_queue()
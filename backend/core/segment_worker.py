@@ -0,0 +1,144 @@
+import asyncio
+import os
+import shutil
+import threading
+import cv2
+import logging
+from typing import Dict
+
+from backend.database.repository import repository
+from backend.core.processing_service import processing_service
+from backend.core.video_processor import video_processor
+from backend.core.write_buffer import WriteBehindBuffer
+from backend.core.segment_queue import SegmentQueue, segment_queue, pack_detections
+from backend.core.session_spool import WORKER_ID
+from backend.core.config import FRAMES_DIR, CROPS_DIR, TARGET_FPS, SEGMENT_POLL_INTERVAL, SEGMENT_HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class SegmentStopped(Exception):
+    """The segment was cancelled or its lease passed to another worker"""
+
+class SegmentWorker:
+    """
+    Pulls video segments from the segment queue and analyzes them: frames
+    are detected, stored and written exactly as in a single-node run, and
+    the segment's detections are returned through the queue for the
+    coordinator to merge.
+
+    While a segment runs, its lease is renewed every heartbeat_interval
+    (frame extraction included), and it is checked again before each write
+    batch so a worker that lost the segment never writes over the rows of
+    the worker that took it over.
+    """
+
+    def __init__(self, queue: SegmentQueue = segment_queue, worker_id: str = WORKER_ID,
+                 poll_interval: float = SEGMENT_POLL_INTERVAL, heartbeat_interval: float = SEGMENT_HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+
+    async def run(self, once: bool = False):
+        """Process segments until cancelled; with once, stop when the queue is empty"""
+        logger.info(f"🛠️ Segment worker {self.worker_id} started")
+        while True:
+            segment = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            if segment is None:
+                if once:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.process_segment(segment)
+
+    async def _keep_lease(self, segment: Dict, stopped: threading.Event):
+        """Renew the segment's lease until cancelled; sets stopped once it is cancelled or lost"""
+        while not stopped.is_set():
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                if not await asyncio.to_thread(self.queue.heartbeat, segment):
+                    stopped.set()
+            except Exception as e:
+                logger.warning(f"Heartbeat of segment {segment['id']} failed: {e}")
+
+    async def process_segment(self, segment: Dict) -> bool:
+        """Analyze one claimed segment; True if its result was stored"""
+        job_id = segment['job_id']
+        file_id = segment['file_id']
+        start_frame, end_frame = segment['start_frame'], segment['end_frame']
+        # Per-segment local directories: several workers may share a host
+        frames_dir = os.path.join(FRAMES_DIR, job_id, f"segment_{start_frame:06d}")
+        crops_dir = os.path.join(CROPS_DIR, job_id, f"segment_{start_frame:06d}")
+        write_buffer = None
+        stopped = threading.Event()
+        heartbeat = asyncio.create_task(self._keep_lease(segment, stopped))
+
+        async def check_lease():
+            # Between frames and before every write batch: the rows are only ours while we hold the lease
+            if stopped.is_set() or not await asyncio.to_thread(self.queue.heartbeat, segment):
+                stopped.set()
+                raise SegmentStopped()
+
+        logger.info(f"🎞️ Segment {segment['id']} of {job_id}: frames [{start_frame}, {end_frame}), "
+                    f"attempt {segment['attempts']}")
+        try:
+            # An earlier attempt may have written part of this segment's rows
+            await repository.delete_frame_range(file_id, start_frame, end_frame)
+            frame_paths = await asyncio.to_thread(
+                video_processor.extract_frames, segment['video_path'], frames_dir, TARGET_FPS, start_frame, end_frame,
+                stopped.is_set
+            )
+
+            write_buffer = WriteBehindBuffer(repository, job_id, before_flush=check_lease)
+            write_buffer.start()
+            detections = []
+            for offset, frame_path in enumerate(frame_paths):
+                # Renews the lease and notices cancellation between frames
+                await check_lease()
+
+                frame = await asyncio.to_thread(cv2.imread, frame_path)
+                if frame is None:
+                    continue
+                frame_capture_data, detection_rows, frame_detections = await processing_service.analyze_frame(
+                    frame, start_frame + offset, job_id, file_id, frames_dir, crops_dir,
+                    crop_offset=len(detections), upsert=True
+                )
+                detections.extend(frame_detections)
+                if detection_rows:
+                    write_buffer.add_frame(frame_capture_data, detection_rows)
+                await asyncio.sleep(0)
+
+            if stopped.is_set():
+                raise SegmentStopped()
+            await write_buffer.drain()
+            await asyncio.to_thread(self.queue.complete, segment, {
+                'frames_processed': len(frame_paths),
+                'detections': pack_detections(detections)
+            })
+            logger.info(f"✅ Segment {segment['id']} of {job_id}: {len(detections)} detections")
+            return True
+
+        except SegmentStopped:
+            logger.info(f"🛑 Segment {segment['id']} of {job_id} stopped (cancelled or lease lost)")
+            if write_buffer is not None:
+                await write_buffer.discard()
+            await asyncio.to_thread(self.queue.fail, segment, 'Stopped')
+            return False
+        except asyncio.CancelledError:
+            # Worker shutting down: the lease expires and another worker redoes the segment
+            if write_buffer is not None:
+                write_buffer.abort()
+            raise
+        except Exception as e:
+            logger.error(f"Error processing segment {segment['id']} of {job_id}: {e}")
+            if write_buffer is not None:
+                await write_buffer.discard()
+            await asyncio.to_thread(self.queue.fail, segment, str(e))
+            return False
+        finally:
+            heartbeat.cancel()
+            shutil.rmtree(frames_dir, ignore_errors=True)
+            shutil.rmtree(crops_dir, ignore_errors=True)
+
+# Global instance
+segment_worker = SegmentWorker()
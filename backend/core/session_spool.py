@@ -0,0 +1,114 @@
+import os
+import shutil
+import socket
+import threading
+import logging
+from typing import BinaryIO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: claims only hold within this process
+    fcntl = None
+
+from backend.core.config import SPOOL_DIR
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker process in the job store
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class SessionClaim:
+    """
+    Exclusive claim on a session, held by the worker that queued or runs
+    it. Backed by an flock on a lock file in the spool, so it is released
+    by the OS if the worker process dies.
+    """
+
+    def __init__(self, spool: "SessionSpool", session_id: str, lock_file):
+        self.spool = spool
+        self.session_id = session_id
+        self._lock_file = lock_file
+
+    def release(self):
+        if self._lock_file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
+        with self.spool._local_lock:
+            self.spool._local_claims.discard(self.session_id)
+
+class SessionSpool:
+    """
+    Directory shared by every worker process where uploaded files wait
+    until some worker starts processing them. Files are written under a
+    temporary name and renamed, so readers never see a partial upload.
+    """
+
+    def __init__(self, root: str = SPOOL_DIR):
+        self.root = root
+        self.locks_dir = os.path.join(root, ".locks")
+        os.makedirs(self.locks_dir, exist_ok=True)
+        # Claims held by this process (also the only guard where flock is unavailable)
+        self._local_claims = set()
+        self._local_lock = threading.Lock()
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id)
+
+    def save(self, session_id: str, filename: str, source: BinaryIO) -> str:
+        """Store an uploaded file for a session and return its path"""
+        session_dir = self.session_dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        path = os.path.join(session_dir, filename)
+        partial_path = os.path.join(session_dir, f".{filename}.partial")
+        with open(partial_path, "wb") as buffer:
+            shutil.copyfileobj(source, buffer)
+        os.replace(partial_path, path)
+        return path
+
+    def find_file(self, session_id: str) -> Optional[str]:
+        """Path of the session's uploaded file, or None"""
+        session_dir = self.session_dir(session_id)
+        if not os.path.isdir(session_dir):
+            return None
+        files = sorted(name for name in os.listdir(session_dir) if not name.startswith('.'))
+        return os.path.join(session_dir, files[0]) if files else None
+
+    def claim(self, session_id: str) -> Optional[SessionClaim]:
+        """Claim a session for this worker, or None if another worker holds it"""
+        with self._local_lock:
+            if session_id in self._local_claims:
+                return None
+            lock_file = open(os.path.join(self.locks_dir, f"{session_id}.lock"), "a+")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    return None
+            self._local_claims.add(session_id)
+        return SessionClaim(self, session_id, lock_file)
+
+    def is_claimed(self, session_id: str) -> bool:
+        """Whether some live worker currently holds the session"""
+        claim = self.claim(session_id)
+        if claim is None:
+            return True
+        claim.release()
+        return False
+
+    def remove(self, session_id: str):
+        """
+        Delete the session's spooled files and lock file. Only for finished
+        sessions: a worker claiming it concurrently could lock the unlinked file.
+        """
+        shutil.rmtree(self.session_dir(session_id), ignore_errors=True)
+        try:
+            os.remove(os.path.join(self.locks_dir, f"{session_id}.lock"))
+        except FileNotFoundError:
+            pass
+
+# Global instance
+session_spool = SessionSpool()
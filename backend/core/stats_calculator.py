@@ -1,6 +1,12 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import logging
-from collections import defaultdict
+import numpy as np
+
+from backend.core.config import (
+    EXPOSURE_GAP_TOLERANCE, VISIBILITY_FULL_AREA, VISIBILITY_EDGE_MARGIN, VISIBILITY_CLIP_PENALTY,
+    VISIBILITY_SHARPNESS_REFERENCE
+)
+from backend.core.temporal_pyramid import TemporalPyramid
 
 logger = logging.getLogger(__name__)
 
@@ -8,93 +14,202 @@ class StatisticsCalculator:
     def __init__(self):
         pass
     
-    def calculate_brand_statistics(self, detections: List[Dict], video_duration: float, video_fps: float) -> Dict[str, Dict]:
+    def calculate_brand_statistics(self, detections: List[Dict], video_duration: float, video_fps: float,
+                                   gap_tolerance: float = EXPOSURE_GAP_TOLERANCE) -> Dict[str, Dict]:
         """
         Calculate statistics for each brand detected in the video
         Returns dict with brand statistics matching the database schema
+        
+        video_fps is the rate of the detections' frame numbers (TARGET_FPS for
+        sampled video frames). Exposure fields come from the brand's exposure
+        segments: detections gap_tolerance seconds apart or less are merged.
         """
         try:
-            brand_stats = defaultdict(lambda: {
-                'total_detections': 0,
-                'frames_with_detection': set(),
-                'total_score': 0.0,
-                'max_score': 0.0,
-                'min_score': 1.0,
-                'first_detection_time': None,
-                'last_detection_time': None,
-                'detection_times': []
-            })
-            
-            # Process each detection
-            for detection in detections:
-                brand_name = detection.get('class_name', detection.get('brand_name', 'Unknown'))
-                score = detection.get('confidence', detection.get('score', 0.0))  # Handle both confidence and score
-                frame_number = detection.get('frame_number', detection.get('frame', 0))
-                
-                # Calculate time based on frame number
-                time_seconds = (frame_number / video_fps) if video_fps > 0 else 0.0
-                
-                stats = brand_stats[brand_name]
-                stats['total_detections'] += 1
-                stats['frames_with_detection'].add(frame_number)
-                stats['total_score'] += score
-                stats['max_score'] = max(stats['max_score'], score)
-                stats['min_score'] = min(stats['min_score'], score)
-                stats['detection_times'].append(time_seconds)
-                
-                # Track first and last detection times
-                if stats['first_detection_time'] is None or time_seconds < stats['first_detection_time']:
-                    stats['first_detection_time'] = time_seconds
-                if stats['last_detection_time'] is None or time_seconds > stats['last_detection_time']:
-                    stats['last_detection_time'] = time_seconds
-            
-            # Calculate final statistics
-            final_stats = {}
-            
-            for brand_name, stats in brand_stats.items():
-                frames_count = len(stats['frames_with_detection'])
-                
-                # Calculate duration as time between first and last detection
-                if stats['first_detection_time'] is not None and stats['last_detection_time'] is not None:
-                    duration_seconds = stats['last_detection_time'] - stats['first_detection_time']
-                    # If only one detection, consider it as having some minimal duration
-                    if duration_seconds == 0.0 and stats['total_detections'] > 0:
-                        duration_seconds = 1.0 / video_fps if video_fps > 0 else 1.0
-                else:
-                    duration_seconds = 0.0
-                
-                avg_score = stats['total_score'] / stats['total_detections'] if stats['total_detections'] > 0 else 0.0
-                
-                # Ensure duration_seconds is never None or negative
-                if duration_seconds is None or duration_seconds < 0:
-                    duration_seconds = 0
-                
-                final_stats[brand_name] = {
-                    'total_detections': stats['total_detections'],
-                    'avg_score': round(avg_score, 3),
-                    'max_score': round(stats['max_score'], 3),
-                    'min_score': round(stats['min_score'], 3) if stats['total_detections'] > 0 else None,
-                    'duration_seconds': round(duration_seconds, 2),
-                    'first_detection_time': round(stats['first_detection_time'], 2) if stats['first_detection_time'] is not None else None,
-                    'last_detection_time': round(stats['last_detection_time'], 2) if stats['last_detection_time'] is not None else None,
-                    'frames_with_detection': frames_count
-
-                }
-            
-            return final_stats
-            
+            brand_names, brand_index, scores, frames = self.detection_columns(detections)
+            visibility = np.array([d.get('visibility', 1.0) for d in detections], dtype=np.float64)
+            return self.calculate_brand_statistics_columnar(
+                brand_names, brand_index, scores, frames, video_duration, video_fps, gap_tolerance, visibility
+            )
         except Exception as e:
             logger.error(f"Error calculating statistics: {e}")
             return {}
     
+    def detection_columns(self, detections: List[Dict]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Columnar form of detection dicts: brand names in order of first
+        appearance, and per-detection brand index, score and frame arrays
+        """
+        brand_positions: Dict[str, int] = {}
+        brand_index = np.fromiter(
+            (brand_positions.setdefault(d.get('class_name', d.get('brand_name', 'Unknown')), len(brand_positions))
+             for d in detections),
+            dtype=np.int64, count=len(detections)
+        )
+        # Handle both confidence and score
+        scores = np.array([d.get('confidence', d.get('score', 0.0)) for d in detections], dtype=np.float64)
+        frames = np.array([d.get('frame_number', d.get('frame', 0)) for d in detections])
+        return list(brand_positions), brand_index, scores, frames
+    
+    def calculate_brand_statistics_columnar(self, brand_names: List[str], brand_index: np.ndarray, scores: np.ndarray,
+                                            frames: np.ndarray, video_duration: float, video_fps: float,
+                                            gap_tolerance: float = EXPOSURE_GAP_TOLERANCE,
+                                            visibility: Optional[np.ndarray] = None) -> Dict[str, Dict]:
+        """
+        calculate_brand_statistics over columnar detections (see detection_columns):
+        every per-brand metric is a grouped reduction over the arrays. Brands
+        without detections are left out; the rest keep the order of brand_names.
+        visibility holds each detection's visibility (see visibility_metrics),
+        1.0 for all when not given.
+        """
+        brand_count = len(brand_names)
+        if len(brand_index) == 0:
+            return {}
+        
+        # Calculate time based on frame number
+        times = frames / video_fps if video_fps > 0 else np.zeros(len(frames))
+        
+        counts = np.bincount(brand_index, minlength=brand_count)
+        # bincount adds each brand's scores in input order, like a running sum
+        total_scores = np.bincount(brand_index, weights=scores, minlength=brand_count)
+        if visibility is None:
+            visibility = np.ones(len(brand_index))
+        visibility_sums = np.bincount(brand_index, weights=visibility, minlength=brand_count)
+        max_scores = np.zeros(brand_count)
+        np.maximum.at(max_scores, brand_index, scores)
+        min_scores = np.ones(brand_count)
+        np.minimum.at(min_scores, brand_index, scores)
+        first_times = np.full(brand_count, np.inf)
+        np.minimum.at(first_times, brand_index, times)
+        last_times = np.full(brand_count, -np.inf)
+        np.maximum.at(last_times, brand_index, times)
+        
+        # Distinct (brand, frame) pairs: sort by brand then frame and count where either changes
+        order = np.lexsort((frames, brand_index))
+        sorted_brands, sorted_frames = brand_index[order], frames[order]
+        distinct = np.ones(len(order), dtype=bool)
+        distinct[1:] = (sorted_brands[1:] != sorted_brands[:-1]) | (sorted_frames[1:] != sorted_frames[:-1])
+        frames_counts = np.bincount(sorted_brands[distinct], minlength=brand_count)
+        
+        segments = self._exposure_segments(sorted_brands, sorted_frames, brand_count, video_fps, gap_tolerance)
+        
+        # Python floats from here on, so rounding matches the builtin round()
+        columns = zip(brand_names, counts.tolist(), total_scores.tolist(), max_scores.tolist(), min_scores.tolist(),
+                      first_times.tolist(), last_times.tolist(), frames_counts.tolist(), segments,
+                      visibility_sums.tolist())
+        return {
+            brand_name: self.brand_result(count, total_score, max_score, min_score, first_time, last_time,
+                                          frames_count, brand_segments, video_fps, visibility_sum)
+            for brand_name, count, total_score, max_score, min_score, first_time, last_time, frames_count,
+                brand_segments, visibility_sum in columns
+            if count > 0
+        }
+    
+    def visibility_metrics(self, bboxes: np.ndarray, frame_width: int, frame_height: int,
+                           sharpness: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Visibility of a frame's detections from their [x1, y1, x2, y2] boxes,
+        in one pass over the arrays: area_fraction of the frame,
+        center_distance (0 at the center, 1 in a corner) and edge_clipped.
+        visibility in [0, 1] combines them: full at VISIBILITY_FULL_AREA or
+        more, halved in a corner, reduced by VISIBILITY_CLIP_PENALTY when
+        clipped, and scaled by crop sharpness when it is given.
+        """
+        boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        x1, x2 = np.clip(boxes[:, 0], 0, frame_width), np.clip(boxes[:, 2], 0, frame_width)
+        y1, y2 = np.clip(boxes[:, 1], 0, frame_height), np.clip(boxes[:, 3], 0, frame_height)
+        
+        area_fraction = (x2 - x1) * (y2 - y1) / float(frame_width * frame_height)
+        # Box center relative to the frame center, per axis in [-1, 1]
+        offset_x = ((x1 + x2) / 2 - frame_width / 2) / (frame_width / 2)
+        offset_y = ((y1 + y2) / 2 - frame_height / 2) / (frame_height / 2)
+        center_distance = np.hypot(offset_x, offset_y) / np.sqrt(2)
+        edge_clipped = ((boxes[:, 0] <= VISIBILITY_EDGE_MARGIN) | (boxes[:, 1] <= VISIBILITY_EDGE_MARGIN)
+                        | (boxes[:, 2] >= frame_width - VISIBILITY_EDGE_MARGIN)
+                        | (boxes[:, 3] >= frame_height - VISIBILITY_EDGE_MARGIN))
+        
+        visibility = (np.minimum(1.0, area_fraction / VISIBILITY_FULL_AREA)
+                      * (1.0 - 0.5 * center_distance)
+                      * np.where(edge_clipped, 1.0 - VISIBILITY_CLIP_PENALTY, 1.0))
+        if sharpness is not None:
+            visibility = visibility * np.minimum(1.0, np.asarray(sharpness) / VISIBILITY_SHARPNESS_REFERENCE)
+        
+        return {
+            'area_fraction': area_fraction,
+            'center_distance': center_distance,
+            'edge_clipped': edge_clipped,
+            'visibility': visibility
+        }
+    
+    @staticmethod
+    def sample_duration(video_fps: float) -> float:
+        """Seconds one frame stays on screen"""
+        return 1.0 / video_fps if video_fps > 0 else 1.0
+    
+    def _exposure_segments(self, sorted_brands: np.ndarray, sorted_frames: np.ndarray, brand_count: int,
+                           video_fps: float, gap_tolerance: float) -> List[List[List]]:
+        """
+        Sweep over detections sorted by brand and frame: each covers
+        [t, t + sample_duration], and a new segment starts at a brand change
+        or when the gap since the previous detection's end exceeds
+        gap_tolerance. Returns each brand's [start, end, detections] segments.
+        """
+        times = sorted_frames / video_fps if video_fps > 0 else np.zeros(len(sorted_frames))
+        ends = times + self.sample_duration(video_fps)
+        starts_segment = np.ones(len(times), dtype=bool)
+        starts_segment[1:] = (sorted_brands[1:] != sorted_brands[:-1]) | (times[1:] - ends[:-1] > gap_tolerance)
+        
+        first = np.flatnonzero(starts_segment)
+        last = np.append(first[1:], len(times)) - 1
+        segments = [[] for _ in range(brand_count)]
+        for brand, start, end, detections in zip(sorted_brands[first].tolist(), times[first].tolist(),
+                                                  ends[last].tolist(), (last - first + 1).tolist()):
+            segments[brand].append([start, end, detections])
+        return segments
+    
+    @staticmethod
+    def brand_result(count: int, total_score: float, max_score: float, min_score: float, first_time: float,
+                     last_time: float, frames_count: int, segments: List[List], video_fps: float,
+                     visibility_sum: Optional[float] = None) -> Dict:
+        """
+        Final statistics of one brand from its aggregates and exposure
+        segments. exposure_score is its on-screen seconds weighted by each
+        detection's visibility (unweighted when visibility_sum is None).
+        """
+        # Calculate duration as time between first and last detection
+        duration_seconds = last_time - first_time
+        # If only one detection, consider it as having some minimal duration
+        if duration_seconds == 0.0:
+            duration_seconds = 1.0 / video_fps if video_fps > 0 else 1.0
+        
+        # Seconds actually on screen, unlike the first-to-last span above
+        exposures = [end - start for start, end, _ in segments]
+        if visibility_sum is None:
+            visibility_sum = float(count)
+        
+        return {
+            'total_detections': count,
+            'avg_score': round(total_score / count, 3),
+            'max_score': round(max_score, 3),
+            'min_score': round(min_score, 3),
+            'duration_seconds': round(duration_seconds, 2),
+            'first_detection_time': round(first_time, 2),
+            'last_detection_time': round(last_time, 2),
+            'frames_with_detection': frames_count,
+            'exposure_seconds': round(sum(exposures), 2),
+            'exposure_segments': len(segments),
+            'longest_exposure_seconds': round(max(exposures), 2),
+            'exposure_score': round(visibility_sum * StatisticsCalculator.sample_duration(video_fps), 2),
+            'avg_visibility': round(visibility_sum / count, 3)
+        }
+    
     def prepare_prediction_data(self, brand_stats: Dict, brand_id: int, video_id: int, video_duration: float = None) -> Dict:
         """
         Prepare prediction data for database insertion matching the enhanced predictions table schema
         """
         try:
 
-            # Calculate percentage based on duration_seconds and video duration
-            total_seconds = brand_stats.get('duration_seconds', 0.0)
+            # Calculate percentage based on on-screen seconds and video duration
+            total_seconds = brand_stats.get('exposure_seconds', brand_stats.get('duration_seconds', 0.0))
             percentage = 0.0
             if video_duration and video_duration > 0:
                 percentage = (total_seconds / video_duration) * 100
@@ -113,8 +228,13 @@ class StatisticsCalculator:
                 'min_score': brand_stats['min_score'],
                 'duration_seconds': brand_stats['duration_seconds'],
                 'first_detection_time': brand_stats['first_detection_time'],
-                'last_detection_time': brand_stats['last_detection_time']
-
+                'last_detection_time': brand_stats['last_detection_time'],
+                # On-screen exposure (total_seconds above holds its seconds)
+                'exposure_segments': brand_stats.get('exposure_segments'),
+                'longest_exposure_seconds': brand_stats.get('longest_exposure_seconds'),
+                # Visibility-weighted exposure
+                'exposure_score': brand_stats.get('exposure_score'),
+                'avg_visibility': brand_stats.get('avg_visibility')
             }
             
             logger.info(f"📊 Prepared prediction data: {prediction_data}")
@@ -149,5 +269,88 @@ class StatisticsCalculator:
             logger.error(f"Error preparing detection data: {e}")
             return {}
 
+class BrandStatisticsAccumulator:
+    """
+    Running per-brand aggregates behind calculate_brand_statistics, fed one
+    frame at a time in increasing frame order. Memory is O(brands) plus the
+    exposure segments instead of O(detections), snapshot() gives the
+    statistics so far at any point and equals calculate_brand_statistics
+    over the same detections, and the state round-trips through
+    to_dict()/from_dict() for checkpoints. The base level of the video's
+    temporal pyramid is counted along the way.
+    """
+
+    # Per-brand state: [count, total score, max score, min score, first time, last time, frames, last frame,
+    # exposure segments as [start, end, detections], visibility sum]
+    COUNT, TOTAL, MAX, MIN, FIRST, LAST, FRAMES, LAST_FRAME, SEGMENTS, VISIBILITY = range(10)
+
+    def __init__(self, video_fps: float, gap_tolerance: float = EXPOSURE_GAP_TOLERANCE):
+        self.video_fps = video_fps
+        self.gap_tolerance = gap_tolerance
+        self._sample_duration = StatisticsCalculator.sample_duration(video_fps)
+        self._brands: Dict[str, list] = {}
+        self.timeline = TemporalPyramid()
+        self.total_detections = 0
+
+    def update(self, frame_number: int, detections: List[Dict]):
+        """Add one frame's detections"""
+        time_seconds = (frame_number / self.video_fps) if self.video_fps > 0 else 0.0
+        end_seconds = time_seconds + self._sample_duration
+        for detection in detections:
+            brand_name = detection.get('class_name', detection.get('brand_name', 'Unknown'))
+            score = detection.get('confidence', detection.get('score', 0.0))
+            stats = self._brands.get(brand_name)
+            if stats is None:
+                stats = self._brands[brand_name] = [0, 0.0, 0.0, 1.0, time_seconds, time_seconds, 0, None, [], 0.0]
+            stats[self.COUNT] += 1
+            stats[self.TOTAL] += score
+            stats[self.MAX] = max(stats[self.MAX], score)
+            stats[self.MIN] = min(stats[self.MIN], score)
+            stats[self.VISIBILITY] += detection.get('visibility', 1.0)
+            stats[self.FIRST] = min(stats[self.FIRST], time_seconds)
+            stats[self.LAST] = max(stats[self.LAST], time_seconds)
+            # Frames arrive in order, so a brand's distinct frames are its frame changes
+            if stats[self.LAST_FRAME] != frame_number:
+                stats[self.FRAMES] += 1
+                stats[self.LAST_FRAME] = frame_number
+            # ...and its exposure segment either extends the last one or starts a new one
+            segments = stats[self.SEGMENTS]
+            if segments and time_seconds - segments[-1][1] <= self.gap_tolerance:
+                segments[-1][1] = max(segments[-1][1], end_seconds)
+                segments[-1][2] += 1
+            else:
+                segments.append([time_seconds, end_seconds, 1])
+            self.timeline.add(brand_name, time_seconds)
+        self.total_detections += len(detections)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Brand statistics of everything added so far, as calculate_brand_statistics returns them"""
+        return {
+            brand_name: StatisticsCalculator.brand_result(*stats[:self.LAST_FRAME], stats[self.SEGMENTS],
+                                                          self.video_fps, stats[self.VISIBILITY])
+            for brand_name, stats in self._brands.items()
+        }
+
+    def exposure_segments(self) -> Dict[str, List[List]]:
+        """Each brand's exposure segments so far, as [start, end, detections] in seconds"""
+        return {brand_name: stats[self.SEGMENTS] for brand_name, stats in self._brands.items()}
+
+    def to_dict(self) -> Dict:
+        return {'video_fps': self.video_fps, 'gap_tolerance': self.gap_tolerance, 'brands': self._brands,
+                'timeline': self.timeline.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BrandStatisticsAccumulator":
+        accumulator = cls(data['video_fps'], data.get('gap_tolerance', EXPOSURE_GAP_TOLERANCE))
+        accumulator._brands = {brand_name: list(stats) for brand_name, stats in data['brands'].items()}
+        for stats in accumulator._brands.values():
+            # Checkpoints from before visibility counted every detection as fully visible
+            if len(stats) == cls.VISIBILITY:
+                stats.append(float(stats[cls.COUNT]))
+        if 'timeline' in data:
+            accumulator.timeline = TemporalPyramid.from_dict(data['timeline'])
+        accumulator.total_detections = sum(stats[cls.COUNT] for stats in accumulator._brands.values())
+        return accumulator
+
 # Global instance
 stats_calculator = StatisticsCalculator()
@@ -0,0 +1,153 @@
+import math
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.core.config import TIMELINE_BASE_SECONDS
+from backend.database.repository import repository
+
+logger = logging.getLogger(__name__)
+
+def top_level(bins: int) -> int:
+    """Index of the single-bin level of a pyramid over `bins` base bins"""
+    return int(math.ceil(math.log2(bins))) if bins > 1 else 0
+
+class TemporalPyramid:
+    """
+    Per-brand detection counts of one video at power-of-two time
+    resolutions: level 0 counts detections per base_seconds bin and level L
+    per base_seconds * 2**L bin. Only the base level is kept while frames
+    are added; the upper levels are pairwise sums of it.
+    """
+
+    def __init__(self, base_seconds: float = TIMELINE_BASE_SECONDS):
+        self.base_seconds = base_seconds
+        self._counts: Dict[str, List[int]] = {}
+
+    def add(self, brand_name: str, time_seconds: float, count: int = 1):
+        counts = self._counts.setdefault(brand_name, [])
+        index = int(time_seconds // self.base_seconds)
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += count
+
+    def brand_names(self) -> List[str]:
+        return list(self._counts)
+
+    def levels(self, brand_name: str, bins: int = 0) -> List[np.ndarray]:
+        """Counts of every level over at least `bins` base bins, from the base level up to a single bin"""
+        counts = self._counts.get(brand_name, [])
+        level = np.zeros(max(bins, len(counts)), dtype=np.int64)
+        level[:len(counts)] = counts
+        levels = [level]
+        while len(level) > 1:
+            if len(level) % 2:
+                level = np.append(level, 0)
+            level = level.reshape(-1, 2).sum(axis=1)
+            levels.append(level)
+        return levels
+
+    def rows(self, file_id: int, brand_ids: Dict[str, Optional[int]], duration_seconds: float) -> List[Dict]:
+        """
+        temporal_pyramids rows, one per brand and level. Every brand spans the
+        whole video so all of them share the same levels; leading and
+        trailing empty bins are not stored.
+        """
+        bins = int(math.ceil(duration_seconds / self.base_seconds))
+        bins = max([bins] + [len(counts) for counts in self._counts.values()])
+        rows = []
+        for brand_name in self._counts:
+            for level, counts in enumerate(self.levels(brand_name, bins)):
+                nonzero = np.flatnonzero(counts)
+                if len(nonzero) == 0:
+                    continue
+                rows.append({
+                    'file_id': file_id,
+                    'brand_id': brand_ids[brand_name],
+                    'level': level,
+                    'bin_seconds': self.base_seconds * 2 ** level,
+                    'first_bin': int(nonzero[0]),
+                    'counts': counts[nonzero[0]:nonzero[-1] + 1].tolist()
+                })
+        return rows
+
+    def to_dict(self) -> Dict:
+        return {'base_seconds': self.base_seconds, 'counts': self._counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TemporalPyramid":
+        pyramid = cls(data['base_seconds'])
+        pyramid._counts = {brand_name: list(counts) for brand_name, counts in data['counts'].items()}
+        return pyramid
+
+class TimelineService:
+    """
+    Range queries over the stored pyramids: a window is answered from the
+    coarsest level that still gives the requested number of bins, reading
+    only that level's rows.
+    """
+
+    def choose_level(self, start: float, end: float, bins: int, duration_seconds: float) -> int:
+        """Coarsest level whose bins are no wider than (end - start) / bins"""
+        target = (end - start) / bins
+        level = int(math.floor(math.log2(target / TIMELINE_BASE_SECONDS))) if target > TIMELINE_BASE_SECONDS else 0
+        return min(level, top_level(int(math.ceil(duration_seconds / TIMELINE_BASE_SECONDS))))
+
+    def window(self, level_rows: List[Dict], bin_seconds: float, start: float, end: float) -> Dict:
+        """Counts per brand of the bins overlapping [start, end)"""
+        first = int(start // bin_seconds)
+        last = max(first + 1, int(math.ceil(end / bin_seconds)))
+        brands = {}
+        total = np.zeros(last - first, dtype=np.int64)
+        for row in level_rows:
+            counts = np.zeros(last - first, dtype=np.int64)
+            # Overlap of the stored run [first_bin, first_bin + len(counts)) with the window
+            lo = max(first, row['first_bin'])
+            hi = min(last, row['first_bin'] + len(row['counts']))
+            if lo < hi:
+                counts[lo - first:hi - first] = row['counts'][lo - row['first_bin']:hi - row['first_bin']]
+            brand_name = row['brands']['name'] if row.get('brands') else 'Unknown'
+            brands[brand_name] = counts.tolist()
+            total += counts
+        return {
+            'bin_seconds': bin_seconds,
+            'bin_starts': [round(index * bin_seconds, 3) for index in range(first, last)],
+            'brands': brands,
+            'total': total.tolist()
+        }
+
+    async def live_rows(self, file_id: int, level: int, duration_seconds: float) -> List[Dict]:
+        """Rows of one level built from the stored detections, for files processed before pyramids existed"""
+        pyramid = TemporalPyramid()
+        for detection in await repository.get_detections(file_id):
+            brand_name = detection['brands']['name'] if detection.get('brands') else 'Unknown'
+            pyramid.add(brand_name, detection.get('t_start') or 0.0)
+        # Key the rows by brand name; they are served, not stored
+        names = {brand_name: brand_name for brand_name in pyramid.brand_names()}
+        return [dict(row, brand_id=None, brands={'name': row['brand_id']})
+                for row in pyramid.rows(file_id, names, duration_seconds) if row['level'] == level]
+
+    async def query(self, file_row: Dict, start: float, end: Optional[float], bins: int,
+                    brand: Optional[str] = None) -> Dict:
+        """
+        Detections per bin of [start, end) for every brand (or one), in about
+        `bins` bins. end is capped at the file's duration, so the window never
+        spans more bins than the video has.
+        """
+        duration_seconds = file_row.get('duration_seconds') or 0
+        end = duration_seconds if end is None else min(end, duration_seconds)
+        if start >= end:
+            raise ValueError(f"Empty window [{start}, {end}) of a {duration_seconds}s file")
+        level = self.choose_level(start, end, bins, duration_seconds)
+        rows = await repository.get_temporal_pyramid(file_row['id'], level)
+        if not rows:
+            rows = await self.live_rows(file_row['id'], level, duration_seconds)
+        if brand:
+            rows = [row for row in rows if row.get('brands') and row['brands']['name'].lower() == brand.lower()]
+        result = self.window(rows, TIMELINE_BASE_SECONDS * 2 ** level, start, end)
+        result.update({'file_id': file_row['id'], 'level': level, 'start': start, 'end': end})
+        return result
+
+# Global instance
+timeline_service = TimelineService()
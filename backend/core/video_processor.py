@@ -1,7 +1,7 @@
 import cv2
 import os
 import numpy as np
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict, Optional
 import logging
 from pathlib import Path
 
@@ -12,7 +12,7 @@ class VideoProcessor:
         pass
     
     def get_video_info(self, video_path: str) -> Dict:
-        """Get video information (duration, fps, frame count)"""
+        """Get video information (duration, fps, frame count, frame size)"""
         try:
             cap = cv2.VideoCapture(video_path)
             
@@ -21,6 +21,8 @@ class VideoProcessor:
             
             fps = cap.get(cv2.CAP_PROP_FPS)
             frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             duration = frame_count / fps if fps > 0 else 0
             
             cap.release()
@@ -28,16 +30,26 @@ class VideoProcessor:
             return {
                 'fps': fps,
                 'frame_count': frame_count,
-                'duration_seconds': duration
+                'duration_seconds': duration,
+                'width': width,
+                'height': height
             }
         except Exception as e:
             logger.error(f"Error getting video info: {e}")
             raise
     
-    def extract_frames(self, video_path: str, output_dir: str, target_fps: float = 1.0) -> List[str]:
+    def extract_frames(self, video_path: str, output_dir: str, target_fps: float = 1.0,
+                       start_index: int = 0, end_index: Optional[int] = None,
+                       should_stop: Optional[Callable[[], bool]] = None) -> List[str]:
         """
         Extract frames from video at specified FPS
         Returns list of frame file paths
+        
+        start_index/end_index restrict extraction to sampled frames
+        [start_index, end_index) (a segment); files keep their whole-video
+        index in the name. The capture seeks straight to the segment's first
+        frame, and frames between samples are only grabbed, not decoded.
+        should_stop is polled between frames to abandon the extraction early.
         """
         try:
             cap = cv2.VideoCapture(video_path)
@@ -49,24 +61,34 @@ class VideoProcessor:
             os.makedirs(output_dir, exist_ok=True)
             
             video_fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_interval = int(video_fps / target_fps) if target_fps > 0 else 1
+            frame_interval = self.frame_interval(video_fps, target_fps)
             
             frame_paths = []
             frame_number = 0
             saved_frame_count = 0
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
+            # Seek to the segment instead of grabbing every frame before it
+            if start_index > 0 and cap.set(cv2.CAP_PROP_POS_FRAMES, start_index * frame_interval):
+                frame_number = start_index * frame_interval
+                saved_frame_count = start_index
+            
+            while end_index is None or saved_frame_count < end_index:
+                if should_stop is not None and should_stop():
+                    break
+                if not cap.grab():
                     break
                 
                 # Extract frame at specified interval
                 if frame_number % frame_interval == 0:
-                    frame_filename = f"frame_{saved_frame_count:06d}.jpg"
-                    frame_path = os.path.join(output_dir, frame_filename)
-                    
-                    cv2.imwrite(frame_path, frame)
-                    frame_paths.append(frame_path)
+                    if saved_frame_count >= start_index:
+                        ret, frame = cap.retrieve()
+                        if not ret:
+                            break
+                        frame_filename = f"frame_{saved_frame_count:06d}.jpg"
+                        frame_path = os.path.join(output_dir, frame_filename)
+                        
+                        cv2.imwrite(frame_path, frame)
+                        frame_paths.append(frame_path)
                     saved_frame_count += 1
                 
                 frame_number += 1
@@ -79,6 +101,15 @@ class VideoProcessor:
             logger.error(f"Error extracting frames: {e}")
             raise
     
+    def frame_interval(self, video_fps: float, target_fps: float) -> int:
+        """Video frames between two sampled frames"""
+        return max(1, int(video_fps / target_fps)) if target_fps > 0 else 1
+    
+    def sampled_frame_count(self, video_info: Dict, target_fps: float) -> int:
+        """Frames extract_frames is expected to produce (the container's frame count may be approximate)"""
+        interval = self.frame_interval(video_info['fps'], target_fps)
+        return -(-video_info['frame_count'] // interval)
+    
     def get_frame_timestamp(self, frame_index: int, video_fps: float) -> Tuple[float, float]:
         """
         Get start and end timestamp for a frame
@@ -88,6 +119,13 @@ class VideoProcessor:
         t_end = t_start + frame_duration
         return t_start, t_end
     
+    def crop_sharpness(self, crop: np.ndarray) -> float:
+        """Variance of the Laplacian of a crop: higher is sharper, 0 for an empty crop"""
+        if crop is None or crop.size == 0:
+            return 0.0
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    
     def save_frame_crop(self, frame: np.ndarray, crop_dir: str, filename: str) -> str:
         """Save cropped frame to directory"""
         try:
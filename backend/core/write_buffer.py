@@ -0,0 +1,273 @@
+import asyncio
+import time
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from backend.core.config import WRITE_BUFFER_MAX_ROWS, WRITE_BUFFER_FLUSH_INTERVAL, WRITE_BUFFER_MAX_RETRIES
+from backend.core.metrics import metrics
+from backend.core.response_cache import response_cache
+from backend.database.base import Repository
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """
+    Per-job write-behind buffer for frame_captures, detections, predictions,
+    exposure_segments and temporal_pyramids.
+
+    Producers only append rows; a background task flushes them in bulk when
+    max_rows are pending or every flush_interval seconds. Frame captures are
+    written before the detections that reference them, and the capture id is
+    resolved at flush time from the frame number. drain() must be awaited
+    before the job is reported complete: it raises if any rows could not be
+    written after retries.
+
+    Frames are also reported with mark_processed(); once a flush has written
+    every row of frames up to N, committed_frame becomes N and on_commit(N)
+    is called, which is where a job checkpoints.
+
+    before_flush, if given, is awaited before each batch is written and may
+    raise to refuse the write (a segment worker whose lease has passed to
+    another worker); the rows stay pending.
+    """
+
+    def __init__(self, repository: Repository, job_id: str, max_rows: int = WRITE_BUFFER_MAX_ROWS,
+                 flush_interval: float = WRITE_BUFFER_FLUSH_INTERVAL, max_retries: int = WRITE_BUFFER_MAX_RETRIES,
+                 on_commit: Optional[Callable[[int], None]] = None, committed_frame: int = -1,
+                 before_flush: Optional[Callable[[], Awaitable[None]]] = None):
+        self.repository = repository
+        self.job_id = job_id
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.on_commit = on_commit
+        self.before_flush = before_flush
+
+        self._captures: List[dict] = []
+        self._detections: List[dict] = []
+        self._predictions: List[dict] = []
+        self._exposure_segments: List[dict] = []
+        self._temporal_pyramids: List[dict] = []
+        # frame_number -> frame_captures.id for captures already written
+        self.frame_capture_ids: Dict[int, int] = {}
+        # Last frame handed to the buffer, and last frame whose rows are all written
+        self._processed_frame = committed_frame
+        self.committed_frame = committed_frame
+
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.last_error: Optional[Exception] = None
+        self.rows_written = 0
+        self.batches_flushed = 0
+
+    @property
+    def pending_rows(self) -> int:
+        return (len(self._captures) + len(self._detections) + len(self._predictions) + len(self._exposure_segments)
+                + len(self._temporal_pyramids))
+
+    def start(self):
+        """Start the background flusher"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def add_frame(self, frame_capture: Optional[dict], detections: List[dict]):
+        """
+        Queue the rows produced by one frame. Detections are linked to the
+        frame's capture once it has been written.
+        """
+        if frame_capture is not None:
+            self._captures.append(frame_capture)
+            for detection in detections:
+                detection['_frame_number'] = frame_capture['frame_number']
+        self._detections.extend(detections)
+        self._maybe_wake()
+
+    def mark_processed(self, frame_number: int):
+        """Record that every row of frames up to frame_number has been added"""
+        self._processed_frame = frame_number
+
+    def _commit(self, frame_number: int):
+        if frame_number <= self.committed_frame:
+            return
+        self.committed_frame = frame_number
+        if self.on_commit is not None:
+            try:
+                self.on_commit(frame_number)
+            except Exception as e:
+                logger.error(f"Checkpoint of job {self.job_id} at frame {frame_number} failed: {e}")
+
+    def add_predictions(self, predictions: List[dict]):
+        self._predictions.extend(predictions)
+        self._maybe_wake()
+
+    def add_exposure_segments(self, segments: List[dict]):
+        self._exposure_segments.extend(segments)
+        self._maybe_wake()
+
+    def add_temporal_pyramids(self, pyramids: List[dict]):
+        self._temporal_pyramids.extend(pyramids)
+        self._maybe_wake()
+
+    def _maybe_wake(self):
+        if self.pending_rows >= self.max_rows:
+            self._wake.set()
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                # Rows were re-queued; the next flush or drain() retries them
+                logger.error(f"Write-behind flush failed for job {self.job_id}: {e}")
+
+    def _resolve_detection(self, detection: dict) -> dict:
+        row = {key: value for key, value in detection.items() if key != '_frame_number'}
+        frame_capture_id = self.frame_capture_ids.get(detection.get('_frame_number'))
+        if frame_capture_id is not None:
+            row['frame_capture_id'] = frame_capture_id
+        return row
+
+    async def _write_chunks(self, table: str, rows: List[dict]):
+        """
+        Write rows in max_rows chunks, retrying each chunk with backoff. The
+        inserts are upserts on the tables' natural keys, so re-sending a chunk
+        the database already committed (a timeout after the write) does not
+        duplicate its rows.
+        """
+        insert = {
+            'frame_captures': self.repository.insert_frame_captures,
+            'detections': self.repository.insert_detections,
+            'predictions': self.repository.insert_predictions,
+            'exposure_segments': self.repository.insert_exposure_segments,
+            'temporal_pyramids': self.repository.insert_temporal_pyramids
+        }[table]
+
+        written = 0
+        while written < len(rows):
+            chunk = rows[written:written + self.max_rows]
+            if table == 'detections':
+                chunk = [self._resolve_detection(row) for row in chunk]
+
+            attempt = 0
+            while True:
+                try:
+                    ids = await insert(chunk)
+                    break
+                except Exception:
+                    attempt += 1
+                    metrics.increment('write_buffer.flush_retries')
+                    if attempt > self.max_retries:
+                        raise WriteBufferError(table, rows[written:])
+                    await asyncio.sleep(min(0.5 * 2 ** attempt, 10))
+
+            if table == 'frame_captures':
+                for row, row_id in zip(chunk, ids):
+                    self.frame_capture_ids[row['frame_number']] = row_id
+            written += len(chunk)
+            self.rows_written += len(chunk)
+            metrics.increment('write_buffer.rows_written', len(chunk))
+            metrics.observe('write_buffer.batch_rows', len(chunk))
+
+    async def flush(self):
+        """Write everything pending right now"""
+        async with self._flush_lock:
+            processed_frame = self._processed_frame
+            if not self.pending_rows:
+                self._commit(processed_frame)
+                return
+            if self.before_flush is not None:
+                await self.before_flush()
+            captures, self._captures = self._captures, []
+            detections, self._detections = self._detections, []
+            predictions, self._predictions = self._predictions, []
+            exposure_segments, self._exposure_segments = self._exposure_segments, []
+            temporal_pyramids, self._temporal_pyramids = self._temporal_pyramids, []
+
+            started = time.perf_counter()
+            # Cached responses of these files are stale once any row lands
+            file_ids = {row.get('file_id') for row in captures + detections + exposure_segments + temporal_pyramids}
+            file_ids.update(row.get('video_id') for row in predictions)
+            # Captures first so detections can reference their ids
+            stages = [('frame_captures', captures), ('detections', detections), ('predictions', predictions),
+                      ('exposure_segments', exposure_segments), ('temporal_pyramids', temporal_pyramids)]
+            for index, (table, rows) in enumerate(stages):
+                try:
+                    await self._write_chunks(table, rows)
+                except WriteBufferError as e:
+                    await self._invalidate(file_ids)
+                    # Put back the unwritten rows (and later stages) ahead of newer ones
+                    remaining = {t: r for t, r in stages[index + 1:]}
+                    remaining[table] = e.rows
+                    self._captures = remaining.get('frame_captures', []) + self._captures
+                    self._detections = remaining.get('detections', []) + self._detections
+                    self._predictions = remaining.get('predictions', []) + self._predictions
+                    self._exposure_segments = remaining.get('exposure_segments', []) + self._exposure_segments
+                    self._temporal_pyramids = remaining.get('temporal_pyramids', []) + self._temporal_pyramids
+                    self.last_error = e
+                    metrics.increment('write_buffer.flush_failures')
+                    raise
+
+            await self._invalidate(file_ids)
+            self._commit(processed_frame)
+            self.batches_flushed += 1
+            metrics.observe('write_buffer.flush_latency_seconds', time.perf_counter() - started)
+
+    @staticmethod
+    async def _invalidate(file_ids):
+        # Bumps the file versions in the shared job store: off the event loop
+        for file_id in file_ids:
+            if file_id is not None:
+                await asyncio.to_thread(response_cache.invalidate_file, file_id)
+
+    async def drain(self) -> Dict:
+        """Stop the flusher, write every pending row and confirm nothing is left"""
+        self._closed = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self.pending_rows:
+            await self.flush()
+        if self.pending_rows:
+            raise Exception(f"Write-behind buffer for job {self.job_id} still has {self.pending_rows} rows")
+        logger.info(f"💾 Write-behind buffer drained for job {self.job_id}: "
+                    f"{self.rows_written} rows in {self.batches_flushed} batches")
+        return {'rows_written': self.rows_written, 'batches': self.batches_flushed}
+
+    def abort(self):
+        """Stop the flusher at once (the job is being torn down); pending rows are lost"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def discard(self) -> int:
+        """Stop the flusher once any in-flight flush is done and drop the rows still pending"""
+        self._closed = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        async with self._flush_lock:
+            dropped = self.pending_rows
+            self._captures, self._detections, self._predictions = [], [], []
+            self._exposure_segments, self._temporal_pyramids = [], []
+        logger.info(f"🗑️ Write-behind buffer for job {self.job_id} discarded {dropped} pending rows")
+        return dropped
+
+class WriteBufferError(Exception):
+    """A batch could not be written after all retries"""
+
+    def __init__(self, table: str, rows: List[dict]):
+        super().__init__(f"Failed to write {len(rows)} rows to {table}")
+        self.table = table
+        self.rows = rows
@@ -0,0 +1,204 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+# Natural key of each bulk-written table. Bulk inserts are upserts on these
+# columns, so re-sending a batch whose first attempt was committed (a timeout
+# after the server wrote it) leaves one row per key instead of duplicates.
+UPSERT_KEYS = {
+    'frame_captures': ('file_id', 'frame_number'),
+    'detections': ('file_id', 'frame', 'detection_index'),
+    'predictions': ('video_id', 'brand_id'),
+    'exposure_segments': ('file_id', 'brand_id', 't_start'),
+    'temporal_pyramids': ('file_id', 'brand_id', 'level')
+}
+
+class Repository(ABC):
+    """
+    Data access interface shared by every storage backend.
+    Covers the files, detections, predictions, brands and frame_captures
+    tables plus blob storage. Rows are returned with the same shape the
+    Supabase client produces (embedded relations as nested dicts).
+    """
+
+    # ----- Blob storage -----
+
+    @abstractmethod
+    async def upload_file_to_storage(self, file_path: str, bucket: str, destination_path: str,
+                                     upsert: bool = False) -> str:
+        """Upload a local file and return its public URL; upsert replaces an existing object"""
+
+    # ----- Writes -----
+
+    @abstractmethod
+    async def insert_file_record(self, file_data: dict) -> int:
+        """Insert file record into files table"""
+
+    @abstractmethod
+    async def insert_detection(self, detection_data: dict) -> int:
+        """Insert detection record"""
+
+    @abstractmethod
+    async def insert_prediction(self, prediction_data: dict) -> int:
+        """Insert prediction record"""
+
+    @abstractmethod
+    async def get_or_create_brand(self, brand_name: str) -> int:
+        """Get brand ID or create new brand"""
+
+    @abstractmethod
+    async def insert_frame_capture(self, frame_capture_data: dict) -> Optional[int]:
+        """Insert frame capture record, returning None on failure"""
+
+    @abstractmethod
+    async def insert_detections(self, rows: List[dict]) -> List[int]:
+        """Bulk upsert detections on their UPSERT_KEYS, returning ids in input order"""
+
+    @abstractmethod
+    async def insert_frame_captures(self, rows: List[dict]) -> List[int]:
+        """Bulk upsert frame captures on their UPSERT_KEYS, returning ids in input order"""
+
+    @abstractmethod
+    async def insert_predictions(self, rows: List[dict]) -> List[int]:
+        """Bulk upsert predictions on their UPSERT_KEYS, returning ids in input order"""
+
+    @abstractmethod
+    async def insert_exposure_segments(self, rows: List[dict]) -> List[int]:
+        """Bulk upsert exposure segments on their UPSERT_KEYS, returning ids in input order"""
+
+    @abstractmethod
+    async def insert_temporal_pyramids(self, rows: List[dict]) -> List[int]:
+        """Bulk upsert temporal pyramid levels on their UPSERT_KEYS, returning ids in input order"""
+
+    @abstractmethod
+    async def delete_file(self, file_id: int) -> None:
+        """
+        Delete a files row with its frame captures, detections, predictions,
+        exposure segments, temporal pyramids and summary, taking its totals
+        out of the brand rollups
+        """
+
+    @abstractmethod
+    async def delete_rows_after_frame(self, file_id: int, frame_number: int) -> None:
+        """
+        Delete a file's frame captures and detections after frame_number, and its
+        predictions, exposure segments, temporal pyramids, summary and brand
+        rollup totals (written last, never part of a resume checkpoint)
+        """
+
+    @abstractmethod
+    async def delete_frame_range(self, file_id: int, start_frame: int, end_frame: Optional[int]) -> None:
+        """Delete a file's frame captures and detections in [start_frame, end_frame) (end None = no limit)"""
+
+    # ----- Reads -----
+
+    @abstractmethod
+    async def get_file(self, file_id: int) -> Optional[Dict]:
+        """Get a single files row or None"""
+
+    @abstractmethod
+    async def list_files(self) -> List[Dict]:
+        """Get all files, newest first"""
+
+    @abstractmethod
+    async def get_detections(self, file_id: Optional[int] = None) -> List[Dict]:
+        """
+        Get detections with embedded brands(name) and
+        frame_captures(public_url, path, frame_number).
+        Without file_id every detection is returned, newest first.
+        """
+
+    @abstractmethod
+    async def get_detection_frames(self, file_id: int) -> List[Dict]:
+        """Get a file's detections as flat frame (0 if unknown), brand_name and score rows"""
+
+    @abstractmethod
+    async def list_detections(self, limit: int, cursor: Optional[Tuple[str, int]] = None,
+                              columns: Optional[List[str]] = None, with_brand: bool = True,
+                              with_frame_capture: bool = True, brand: Optional[str] = None,
+                              file_id: Optional[int] = None, since: Optional[str] = None,
+                              until: Optional[str] = None, min_score: Optional[float] = None) -> List[Dict]:
+        """
+        One keyset page of detections ordered by (created_at, id) descending.
+        cursor is the (created_at, id) of the last row of the previous page;
+        columns restricts the detections columns selected (None means all),
+        and the brand / frame capture embeds are only joined when requested.
+        """
+
+    @abstractmethod
+    async def list_frame_captures(self, limit: int, cursor: Optional[Tuple[str, int]] = None,
+                                  columns: Optional[List[str]] = None, file_id: Optional[int] = None,
+                                  since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """One keyset page of frame captures ordered by (created_at, id) descending"""
+
+    @abstractmethod
+    async def get_predictions(self, file_id: int) -> List[Dict]:
+        """Get predictions for a file with embedded brands(name)"""
+
+    @abstractmethod
+    async def get_exposure_segments(self, file_id: int) -> List[Dict]:
+        """Get a file's exposure segments with embedded brands(name), by brand and start time"""
+
+    @abstractmethod
+    async def get_temporal_pyramid(self, file_id: int, level: int) -> List[Dict]:
+        """Get one level of a file's temporal pyramids, a row per brand with embedded brands(name)"""
+
+    @abstractmethod
+    async def get_frame_captures(self, file_id: Optional[int] = None) -> List[Dict]:
+        """
+        Get frame captures. With file_id they are ordered by frame_number,
+        otherwise every capture is returned, newest first.
+        """
+
+    @abstractmethod
+    async def get_file_statistics(self, file_id: int, intervals: int) -> Dict:
+        """
+        Aggregate a file's detections and predictions in the database.
+        Returns total_detections, unique_brands, average_confidence,
+        total_detection_time, brand_distribution (list of brand_name,
+        detections, total_time, avg_confidence) and temporal_histogram
+        (list of bucket, detections over `intervals` equal slices of the
+        file duration, by t_start).
+        """
+
+    @abstractmethod
+    async def count_detections(self, file_id: int) -> int:
+        """Number of detections stored for a file"""
+
+    @abstractmethod
+    async def count_frame_captures(self, file_id: int) -> int:
+        """Number of frame captures stored for a file"""
+
+    @abstractmethod
+    async def get_file_brand_names(self, file_id: int) -> List[str]:
+        """Distinct brand names detected in a file"""
+
+    @abstractmethod
+    async def list_file_ids(self, without_summary: bool = False) -> List[int]:
+        """Ids of every file, or only those without a file_summaries row"""
+
+    # ----- File summaries -----
+
+    @abstractmethod
+    async def upsert_file_summary(self, summary: dict) -> None:
+        """Insert or replace the file_summaries row of summary['file_id']"""
+
+    @abstractmethod
+    async def get_file_summary(self, file_id: int) -> Optional[Dict]:
+        """Get the file_summaries row of a file or None"""
+
+    # ----- Brand rollups -----
+
+    @abstractmethod
+    async def apply_brand_rollups(self, file_id: int) -> None:
+        """
+        Add a processed file's per-brand detections, score sum and on-screen
+        seconds to the daily and file type brand rollups (no-op if already added)
+        """
+
+    @abstractmethod
+    async def get_brand_rollups(self, group_by: str, since: Optional[str] = None, until: Optional[str] = None,
+                                brand: Optional[str] = None) -> List[Dict]:
+        """
+        Rows of brand_daily_rollups (group_by "day", days in [since, until])
+        or brand_file_type_rollups (group_by "file_type"), with embedded brands(name)
+        """
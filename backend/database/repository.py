@@ -0,0 +1,20 @@
+import logging
+
+from backend.core.config import DATABASE_BACKEND
+from backend.database.base import Repository
+
+logger = logging.getLogger(__name__)
+
+def create_repository(backend: str = DATABASE_BACKEND) -> Repository:
+    """Build the repository selected by DATABASE_BACKEND ("supabase" or "local")"""
+    if backend == "local":
+        from backend.database.sqlite_client import SQLiteClient
+        logger.info("Using embedded SQLite + local filesystem storage backend")
+        return SQLiteClient()
+    if backend == "supabase":
+        from backend.database.supabase_client import SupabaseClient
+        return SupabaseClient()
+    raise ValueError(f"Unknown DATABASE_BACKEND: {backend}")
+
+# Global instance
+repository = create_repository()
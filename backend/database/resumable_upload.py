@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import time
+import logging
+from typing import Optional
+from urllib.parse import urljoin
+
+import httpx
+
+from backend.core.config import (
+    SUPABASE_URL, SUPABASE_SERVICE_ROLE,
+    RESUMABLE_CHUNK_SIZE, RESUMABLE_MAX_RETRIES, RESUMABLE_STATE_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = "1.0.0"
+
+class ResumableUploader:
+    """
+    TUS client for Supabase Storage resumable uploads.
+
+    The file is streamed in fixed-size chunks, so memory stays bounded by
+    the chunk size. The upload URL is persisted next to the spool so a failed
+    or interrupted upload continues from the last acknowledged offset
+    instead of restarting from zero.
+    """
+
+    def __init__(self, supabase_url: str = SUPABASE_URL, api_key: str = SUPABASE_SERVICE_ROLE,
+                 chunk_size: int = RESUMABLE_CHUNK_SIZE, max_retries: int = RESUMABLE_MAX_RETRIES,
+                 state_dir: str = RESUMABLE_STATE_DIR):
+        self.endpoint = f"{(supabase_url or '').rstrip('/')}/storage/v1/upload/resumable"
+        self.api_key = api_key
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.state_dir = state_dir
+
+    def _headers(self, **extra) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "apikey": self.api_key or "",
+            "Tus-Resumable": TUS_VERSION
+        }
+        headers.update(extra)
+        return headers
+
+    def _state_path(self, bucket: str, destination_path: str) -> str:
+        key = hashlib.sha1(f"{bucket}/{destination_path}".encode()).hexdigest()
+        return os.path.join(self.state_dir, f"{key}.json")
+
+    def _load_state(self, state_path: str, file_size: int) -> Optional[str]:
+        """Return the saved upload URL if it belongs to the same file"""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get("file_size") == file_size:
+                return state.get("upload_url")
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save_state(self, state_path: str, upload_url: str, file_size: int):
+        os.makedirs(self.state_dir, exist_ok=True)
+        with open(state_path, "w") as f:
+            json.dump({"upload_url": upload_url, "file_size": file_size}, f)
+
+    def _create_upload(self, http: httpx.Client, bucket: str, destination_path: str, file_size: int,
+                       upsert: bool = False) -> str:
+        content_type = mimetypes.guess_type(destination_path)[0] or "application/octet-stream"
+        metadata = {
+            "bucketName": bucket,
+            "objectName": destination_path,
+            "contentType": content_type,
+            "cacheControl": "3600"
+        }
+        encoded = ",".join(
+            f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in metadata.items()
+        )
+        response = http.post(self.endpoint, headers=self._headers(**{
+            "Upload-Length": str(file_size),
+            "Upload-Metadata": encoded,
+            "x-upsert": "true" if upsert else "false"
+        }))
+        if response.status_code != 201:
+            raise Exception(f"Could not create resumable upload: {response.status_code} {response.text}")
+        return urljoin(self.endpoint, response.headers["Location"])
+
+    def _server_offset(self, http: httpx.Client, upload_url: str) -> Optional[int]:
+        """Current offset acknowledged by the server, or None if the upload expired"""
+        response = http.head(upload_url, headers=self._headers())
+        if response.status_code in (404, 410):
+            return None
+        response.raise_for_status()
+        return int(response.headers["Upload-Offset"])
+
+    def upload(self, file_path: str, bucket: str, destination_path: str, upsert: bool = False):
+        """Upload file_path to bucket/destination_path, resuming a previous attempt if possible"""
+        file_size = os.path.getsize(file_path)
+        state_path = self._state_path(bucket, destination_path)
+
+        with httpx.Client(timeout=httpx.Timeout(60.0, connect=10.0)) as http:
+            upload_url = self._load_state(state_path, file_size)
+            offset = self._server_offset(http, upload_url) if upload_url else None
+            if offset is None:
+                upload_url = self._create_upload(http, bucket, destination_path, file_size, upsert)
+                self._save_state(state_path, upload_url, file_size)
+                offset = 0
+            else:
+                logger.info(f"Resuming upload of {destination_path} at {offset}/{file_size} bytes")
+
+            retries = 0
+            with open(file_path, "rb") as f:
+                while offset < file_size:
+                    f.seek(offset)
+                    chunk = f.read(self.chunk_size)
+                    try:
+                        response = http.patch(upload_url, content=chunk, headers=self._headers(**{
+                            "Upload-Offset": str(offset),
+                            "Content-Type": "application/offset+octet-stream"
+                        }))
+                        if response.status_code != 204:
+                            raise Exception(f"Chunk rejected: {response.status_code} {response.text}")
+                        offset = int(response.headers["Upload-Offset"])
+                        retries = 0
+                    except Exception as e:
+                        retries += 1
+                        if retries > self.max_retries:
+                            logger.error(f"Resumable upload of {destination_path} failed at offset {offset}: {e}")
+                            raise
+                        logger.warning(f"Chunk upload failed ({e}), retry {retries}/{self.max_retries}")
+                        time.sleep(min(2 ** retries, 30))
+                        # Re-sync with whatever the server actually stored
+                        server_offset = self._server_offset(http, upload_url)
+                        if server_offset is None:
+                            raise Exception(f"Resumable upload expired for {destination_path}")
+                        offset = server_offset
+
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+        logger.info(f"Resumable upload completed: {destination_path} ({file_size} bytes)")
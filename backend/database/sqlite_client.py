@@ -0,0 +1,855 @@
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.config import LOCAL_DATABASE_PATH, LOCAL_STORAGE_DIR, LOCAL_STORAGE_PUBLIC_URL
+from backend.database.base import Repository, UPSERT_KEYS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bucket TEXT,
+    path TEXT,
+    filename TEXT,
+    file_type TEXT,
+    duration_seconds REAL,
+    fps REAL,
+    width INTEGER,
+    height INTEGER,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS brands (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS frame_captures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    frame_number INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    path TEXT NOT NULL,
+    public_url TEXT NOT NULL,
+    t_start REAL,
+    t_end REAL,
+    detections_count INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id INTEGER REFERENCES brands(id),
+    score REAL,
+    bbox TEXT,
+    t_start REAL,
+    t_end REAL,
+    frame INTEGER,
+    model TEXT,
+    frame_capture_id INTEGER REFERENCES frame_captures(id) ON DELETE SET NULL,
+    area_fraction REAL,
+    center_distance REAL,
+    edge_clipped INTEGER,
+    sharpness REAL,
+    visibility REAL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id INTEGER REFERENCES brands(id),
+    total_seconds REAL,
+    percentage REAL,
+    total_detections INTEGER,
+    avg_score REAL,
+    max_score REAL,
+    min_score REAL,
+    duration_seconds REAL,
+    first_detection_time REAL,
+    last_detection_time REAL,
+    exposure_segments INTEGER,
+    longest_exposure_seconds REAL,
+    exposure_score REAL,
+    avg_visibility REAL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS exposure_segments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id INTEGER REFERENCES brands(id),
+    t_start REAL NOT NULL,
+    t_end REAL NOT NULL,
+    duration_seconds REAL NOT NULL,
+    detections_count INTEGER NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS temporal_pyramids (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id INTEGER REFERENCES brands(id),
+    level INTEGER NOT NULL,
+    bin_seconds REAL NOT NULL,
+    first_bin INTEGER NOT NULL,
+    counts TEXT NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS brand_file_rollups (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id INTEGER NOT NULL REFERENCES brands(id),
+    day TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    total_detections INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    exposure_seconds REAL NOT NULL,
+    PRIMARY KEY (file_id, brand_id)
+);
+
+CREATE TABLE IF NOT EXISTS brand_daily_rollups (
+    brand_id INTEGER NOT NULL REFERENCES brands(id),
+    day TEXT NOT NULL,
+    files_count INTEGER NOT NULL,
+    total_detections INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    exposure_seconds REAL NOT NULL,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    PRIMARY KEY (brand_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS brand_file_type_rollups (
+    brand_id INTEGER NOT NULL REFERENCES brands(id),
+    file_type TEXT NOT NULL,
+    files_count INTEGER NOT NULL,
+    total_detections INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    exposure_seconds REAL NOT NULL,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    PRIMARY KEY (brand_id, file_type)
+);
+
+CREATE TABLE IF NOT EXISTS file_summaries (
+    file_id INTEGER PRIMARY KEY REFERENCES files(id) ON DELETE CASCADE,
+    file_info TEXT,
+    detections_count INTEGER DEFAULT 0,
+    frame_captures_count INTEGER DEFAULT 0,
+    brands_detected TEXT,
+    detection_coverage REAL DEFAULT 0,
+    brand_totals TEXT,
+    video_statistics TEXT,
+    temporal_distribution TEXT,
+    predictions TEXT,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_detections_file_id ON detections(file_id);
+CREATE INDEX IF NOT EXISTS idx_detections_frame_capture_id ON detections(frame_capture_id);
+CREATE INDEX IF NOT EXISTS idx_frame_captures_file_id ON frame_captures(file_id);
+CREATE INDEX IF NOT EXISTS idx_predictions_video_id ON predictions(video_id);
+CREATE INDEX IF NOT EXISTS idx_exposure_segments_file_brand ON exposure_segments(file_id, brand_id, t_start);
+CREATE INDEX IF NOT EXISTS idx_temporal_pyramids_file_level ON temporal_pyramids(file_id, level);
+CREATE INDEX IF NOT EXISTS idx_brand_daily_rollups_day ON brand_daily_rollups(day);
+CREATE INDEX IF NOT EXISTS idx_detections_created_at_id ON detections(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_detections_file_created_at_id ON detections(file_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_detections_brand_created_at_id ON detections(brand_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_frame_captures_created_at_id ON frame_captures(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_frame_captures_file_created_at_id ON frame_captures(file_id, created_at DESC, id DESC);
+"""
+
+# Columns added after the first release: (table, column, type), applied to existing databases
+ADDED_COLUMNS = [
+    ('predictions', 'exposure_segments', 'INTEGER'),
+    ('predictions', 'longest_exposure_seconds', 'REAL'),
+    ('detections', 'area_fraction', 'REAL'),
+    ('detections', 'center_distance', 'REAL'),
+    ('detections', 'edge_clipped', 'INTEGER'),
+    ('detections', 'sharpness', 'REAL'),
+    ('detections', 'visibility', 'REAL'),
+    ('predictions', 'exposure_score', 'REAL'),
+    ('predictions', 'avg_visibility', 'REAL'),
+    ('detections', 'detection_index', 'INTEGER'),
+]
+
+# Brand rollup tables by group_by, with the column they are keyed by next to brand_id
+ROLLUP_TABLES = {'day': 'brand_daily_rollups', 'file_type': 'brand_file_type_rollups'}
+
+SUMMARY_JSON_COLUMNS = ('file_info', 'brands_detected', 'brand_totals', 'video_statistics',
+                        'temporal_distribution', 'predictions')
+
+class SQLiteClient(Repository):
+    """
+    Embedded backend: SQLite for the tables and the local filesystem for
+    buckets. Needs no network, so ingest runs at local-disk speed.
+    """
+
+    def __init__(self, db_path: str = LOCAL_DATABASE_PATH, storage_dir: str = LOCAL_STORAGE_DIR,
+                 public_url: str = LOCAL_STORAGE_PUBLIC_URL):
+        self.db_path = db_path
+        self.storage_dir = storage_dir
+        self.public_url = public_url.rstrip('/')
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Per-thread connection; SQLite connections must not be shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._ensure_schema(conn)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _ensure_upsert_keys(conn: sqlite3.Connection):
+        """
+        Unique index on each table's UPSERT_KEYS. Duplicates left by retried
+        batches before the keys existed are dropped first, keeping the oldest
+        row; rows with a NULL key column (detections from before
+        detection_index) never conflict and are kept.
+        """
+        for table, keys in UPSERT_KEYS.items():
+            index = f"uq_{table}_upsert_key"
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)).fetchone():
+                continue
+            columns = ', '.join(keys)
+            keyed = ' AND '.join(f"{key} IS NOT NULL" for key in keys)
+            if table == 'frame_captures':
+                # Detections of a duplicate capture point to the kept one
+                conn.execute(
+                    "UPDATE detections SET frame_capture_id = (SELECT MIN(b.id) FROM frame_captures a "
+                    "JOIN frame_captures b ON b.file_id = a.file_id AND b.frame_number = a.frame_number "
+                    "WHERE a.id = detections.frame_capture_id) WHERE frame_capture_id IS NOT NULL"
+                )
+            conn.execute(f"DELETE FROM {table} WHERE {keyed} AND id NOT IN "
+                         f"(SELECT MIN(id) FROM {table} WHERE {keyed} GROUP BY {columns})")
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table}({columns})")
+
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                for table, column, column_type in ADDED_COLUMNS:
+                    existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+                    if column not in existing:
+                        try:
+                            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                        except sqlite3.OperationalError:
+                            # Another worker process added it first
+                            pass
+                self._ensure_upsert_keys(conn)
+                self._schema_ready = True
+
+    def _insert(self, table: str, data: dict) -> int:
+        data = {k: (json.dumps(v) if isinstance(v, (list, dict)) else v) for k, v in data.items()}
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join('?' for _ in data)
+        cursor = self.conn.execute(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", list(data.values())
+        )
+        return cursor.lastrowid
+
+    def _upsert(self, table: str, data: dict) -> int:
+        """Insert a row, or update the row with the same UPSERT_KEYS, and return its id"""
+        data = {k: (json.dumps(v) if isinstance(v, (list, dict)) else v) for k, v in data.items()}
+        keys = UPSERT_KEYS[table]
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join('?' for _ in data)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in data if column not in keys) \
+            or f"{keys[0]} = excluded.{keys[0]}"
+        cursor = self.conn.execute(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates} RETURNING id",
+            list(data.values())
+        )
+        return cursor.fetchone()[0]
+
+    def _bulk_insert(self, table: str, rows: List[dict]) -> List[int]:
+        """Upsert rows in one transaction and return their ids in order"""
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            ids = [self._upsert(table, row) for row in rows]
+            conn.execute("COMMIT")
+            return ids
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _fetchall(self, sql: str, params=()) -> List[sqlite3.Row]:
+        return self.conn.execute(sql, params).fetchall()
+
+    async def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        """Run a read in a worker thread (each thread has its own connection)"""
+        return await asyncio.to_thread(self._fetchall, sql, params)
+
+    async def _query_one(self, sql: str, params=()) -> Optional[sqlite3.Row]:
+        rows = await self._query(sql, params)
+        return rows[0] if rows else None
+
+    def _detection_row(self, row: sqlite3.Row) -> Dict:
+        """Shape a joined detection row like the Supabase embedded select"""
+        detection = dict(row)
+        if 'bbox' in detection:
+            detection['bbox'] = json.loads(detection['bbox']) if detection['bbox'] else None
+        if detection.get('edge_clipped') is not None:
+            detection['edge_clipped'] = bool(detection['edge_clipped'])
+        if 'brand_name' in detection:
+            brand_name = detection.pop('brand_name')
+            detection['brands'] = {'name': brand_name} if brand_name is not None else None
+        if 'capture_public_url' in detection:
+            capture_url = detection.pop('capture_public_url')
+            capture_path = detection.pop('capture_path')
+            capture_frame = detection.pop('capture_frame_number')
+            detection['frame_captures'] = {
+                'public_url': capture_url,
+                'path': capture_path,
+                'frame_number': capture_frame
+            } if capture_url is not None else None
+        return detection
+
+    @staticmethod
+    def _keyset_sql(alias: str, cursor: Optional[Tuple[str, int]], where: List[str], params: List):
+        if cursor is not None:
+            created_at, row_id = cursor
+            where.append(f"({alias}.created_at < ? OR ({alias}.created_at = ? AND {alias}.id < ?))")
+            params.extend([created_at, created_at, int(row_id)])
+
+    async def upload_file_to_storage(self, file_path: str, bucket: str, destination_path: str,
+                                     upsert: bool = False) -> str:
+        """Copy file into the local bucket directory"""
+        try:
+            target = os.path.join(self.storage_dir, bucket, destination_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                if not upsert:
+                    raise Exception(f"Upload failed: {bucket}/{destination_path} already exists")
+                os.remove(target)
+            # Hard link when possible (same filesystem), otherwise copy
+            try:
+                os.link(file_path, target)
+            except OSError:
+                await asyncio.to_thread(shutil.copyfile, file_path, target)
+            logger.info(f"File stored locally: {target}")
+            return f"{self.public_url}/{bucket}/{destination_path}"
+        except Exception as e:
+            logger.error(f"Error uploading file: {e}")
+            raise
+
+    async def insert_file_record(self, file_data: dict) -> int:
+        """Insert file record into files table"""
+        try:
+            return await asyncio.to_thread(self._insert, 'files', file_data)
+        except Exception as e:
+            logger.error(f"Error inserting file record: {e}")
+            raise
+
+    async def insert_detection(self, detection_data: dict) -> int:
+        """Insert detection record"""
+        try:
+            return await asyncio.to_thread(self._insert, 'detections', detection_data)
+        except Exception as e:
+            logger.error(f"Error inserting detection: {e}")
+            raise
+
+    async def insert_prediction(self, prediction_data: dict) -> int:
+        """Insert prediction record"""
+        try:
+            return await asyncio.to_thread(self._insert, 'predictions', prediction_data)
+        except Exception as e:
+            logger.error(f"❌ Error inserting prediction: {e}")
+            logger.error(f"❌ Prediction data that failed: {prediction_data}")
+            raise
+
+    async def get_or_create_brand(self, brand_name: str) -> int:
+        """Get brand ID or create new brand"""
+        try:
+            return await asyncio.to_thread(self._get_or_create_brand, brand_name)
+        except Exception as e:
+            logger.error(f"Error getting/creating brand: {e}")
+            raise
+
+    def _get_or_create_brand(self, brand_name: str) -> int:
+        self.conn.execute("INSERT OR IGNORE INTO brands (name) VALUES (?)", (brand_name,))
+        row = self.conn.execute("SELECT id FROM brands WHERE name = ?", (brand_name,)).fetchone()
+        return row['id']
+
+    async def insert_frame_capture(self, frame_capture_data: dict) -> Optional[int]:
+        """Insert frame capture record"""
+        try:
+            return await asyncio.to_thread(self._insert, 'frame_captures', frame_capture_data)
+        except Exception as e:
+            logger.error(f"Frame capture insertion failed: {e}")
+            logger.error(f"Frame capture data that failed: {frame_capture_data}")
+            return None
+
+    async def insert_detections(self, rows: List[dict]) -> List[int]:
+        """Bulk insert detections in one transaction"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'detections', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} detections: {e}")
+            raise
+
+    async def insert_frame_captures(self, rows: List[dict]) -> List[int]:
+        """Bulk insert frame captures in one transaction"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'frame_captures', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} frame captures: {e}")
+            raise
+
+    async def insert_predictions(self, rows: List[dict]) -> List[int]:
+        """Bulk insert predictions in one transaction"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'predictions', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} predictions: {e}")
+            raise
+
+    async def insert_exposure_segments(self, rows: List[dict]) -> List[int]:
+        """Bulk insert exposure segments in one transaction"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'exposure_segments', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} exposure segments: {e}")
+            raise
+
+    async def insert_temporal_pyramids(self, rows: List[dict]) -> List[int]:
+        """Bulk insert temporal pyramid levels in one transaction"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'temporal_pyramids', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} temporal pyramid levels: {e}")
+            raise
+
+    async def delete_file(self, file_id: int) -> None:
+        """Delete a file; its dependent rows go with it (ON DELETE CASCADE)"""
+        try:
+            await asyncio.to_thread(self._delete_file, file_id)
+        except Exception as e:
+            logger.error(f"Error deleting file {file_id}: {e}")
+            raise
+
+    def _delete_file(self, file_id: int):
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._remove_brand_rollups(conn, file_id)
+            conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def delete_rows_after_frame(self, file_id: int, frame_number: int) -> None:
+        """Delete rows written past a checkpoint, in one transaction"""
+        try:
+            await asyncio.to_thread(self._delete_rows_after_frame, file_id, frame_number)
+        except Exception as e:
+            logger.error(f"Error deleting rows of file {file_id} after frame {frame_number}: {e}")
+            raise
+
+    def _delete_rows_after_frame(self, file_id: int, frame_number: int):
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._remove_brand_rollups(conn, file_id)
+            conn.execute("DELETE FROM detections WHERE file_id = ? AND frame > ?", (file_id, frame_number))
+            conn.execute("DELETE FROM frame_captures WHERE file_id = ? AND frame_number > ?", (file_id, frame_number))
+            conn.execute("DELETE FROM predictions WHERE video_id = ?", (file_id,))
+            conn.execute("DELETE FROM exposure_segments WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM temporal_pyramids WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM file_summaries WHERE file_id = ?", (file_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def delete_frame_range(self, file_id: int, start_frame: int, end_frame: Optional[int]) -> None:
+        """Delete the rows of a range of frames (a retried segment), in one transaction"""
+        try:
+            await asyncio.to_thread(self._delete_frame_range, file_id, start_frame, end_frame)
+        except Exception as e:
+            logger.error(f"Error deleting rows of file {file_id} in frames [{start_frame}, {end_frame}): {e}")
+            raise
+
+    def _delete_frame_range(self, file_id: int, start_frame: int, end_frame: Optional[int]):
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            for table, column in (('detections', 'frame'), ('frame_captures', 'frame_number')):
+                sql = f"DELETE FROM {table} WHERE file_id = ? AND {column} >= ?"
+                params = [file_id, start_frame]
+                if end_frame is not None:
+                    sql += f" AND {column} < ?"
+                    params.append(end_frame)
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def get_file(self, file_id: int) -> Optional[Dict]:
+        """Get file record by id"""
+        row = await self._query_one("SELECT * FROM files WHERE id = ?", (file_id,))
+        return dict(row) if row else None
+
+    async def list_files(self) -> List[Dict]:
+        """Get all files, newest first"""
+        rows = await self._query("SELECT * FROM files ORDER BY created_at DESC, id DESC")
+        return [dict(row) for row in rows]
+
+    async def get_detections(self, file_id: Optional[int] = None) -> List[Dict]:
+        """Get detections with brand name and frame capture information"""
+        sql = """
+            SELECT d.*, b.name AS brand_name,
+                   fc.public_url AS capture_public_url, fc.path AS capture_path,
+                   fc.frame_number AS capture_frame_number
+            FROM detections d
+            LEFT JOIN brands b ON b.id = d.brand_id
+            LEFT JOIN frame_captures fc ON fc.id = d.frame_capture_id
+        """
+        if file_id is not None:
+            rows = await self._query(sql + " WHERE d.file_id = ? ORDER BY d.id", (file_id,))
+        else:
+            rows = await self._query(sql + " ORDER BY d.created_at DESC, d.id DESC")
+        return [self._detection_row(row) for row in rows]
+
+    async def get_detection_frames(self, file_id: int) -> List[Dict]:
+        """Get a file's detections with only frame, brand name and score"""
+        rows = await self._query("""
+            SELECT COALESCE(d.frame, 0) AS frame, COALESCE(b.name, 'Unknown') AS brand_name, d.score
+            FROM detections d LEFT JOIN brands b ON b.id = d.brand_id
+            WHERE d.file_id = ? ORDER BY d.frame, d.id
+        """, (file_id,))
+        return [dict(row) for row in rows]
+
+    async def list_detections(self, limit: int, cursor: Optional[Tuple[str, int]] = None,
+                              columns: Optional[List[str]] = None, with_brand: bool = True,
+                              with_frame_capture: bool = True, brand: Optional[str] = None,
+                              file_id: Optional[int] = None, since: Optional[str] = None,
+                              until: Optional[str] = None, min_score: Optional[float] = None) -> List[Dict]:
+        """Get one page of detections"""
+        select = [f"d.{column}" for column in columns] if columns else ["d.*"]
+        joins = []
+        if with_brand or brand is not None:
+            select.append("b.name AS brand_name")
+            joins.append("LEFT JOIN brands b ON b.id = d.brand_id")
+        if with_frame_capture:
+            select.append("fc.public_url AS capture_public_url, fc.path AS capture_path, "
+                          "fc.frame_number AS capture_frame_number")
+            joins.append("LEFT JOIN frame_captures fc ON fc.id = d.frame_capture_id")
+
+        where, params = [], []
+        if brand is not None:
+            where.append("b.name = ?")
+            params.append(brand)
+        if file_id is not None:
+            where.append("d.file_id = ?")
+            params.append(file_id)
+        if since is not None:
+            where.append("d.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("d.created_at < ?")
+            params.append(until)
+        if min_score is not None:
+            where.append("d.score >= ?")
+            params.append(min_score)
+        self._keyset_sql('d', cursor, where, params)
+
+        sql = f"SELECT {', '.join(select)} FROM detections d {' '.join(joins)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY d.created_at DESC, d.id DESC LIMIT ?"
+        rows = await self._query(sql, params + [limit])
+        return [self._detection_row(row) for row in rows]
+
+    async def list_frame_captures(self, limit: int, cursor: Optional[Tuple[str, int]] = None,
+                                  columns: Optional[List[str]] = None, file_id: Optional[int] = None,
+                                  since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """Get one page of frame captures"""
+        where, params = [], []
+        if file_id is not None:
+            where.append("fc.file_id = ?")
+            params.append(file_id)
+        if since is not None:
+            where.append("fc.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("fc.created_at < ?")
+            params.append(until)
+        self._keyset_sql('fc', cursor, where, params)
+
+        select = ', '.join(f"fc.{column}" for column in columns) if columns else "fc.*"
+        sql = f"SELECT {select} FROM frame_captures fc"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY fc.created_at DESC, fc.id DESC LIMIT ?"
+        rows = await self._query(sql, params + [limit])
+        return [dict(row) for row in rows]
+
+    async def get_predictions(self, file_id: int) -> List[Dict]:
+        """Get predictions for a file with brand name"""
+        rows = await self._query("""
+            SELECT p.*, b.name AS brand_name
+            FROM predictions p LEFT JOIN brands b ON b.id = p.brand_id
+            WHERE p.video_id = ? ORDER BY p.id
+        """, (file_id,))
+        predictions = []
+        for row in rows:
+            prediction = dict(row)
+            brand_name = prediction.pop('brand_name')
+            prediction['brands'] = {'name': brand_name} if brand_name is not None else None
+            predictions.append(prediction)
+        return predictions
+
+    async def get_exposure_segments(self, file_id: int) -> List[Dict]:
+        """Get a file's exposure segments with brand name"""
+        rows = await self._query("""
+            SELECT s.*, b.name AS brand_name
+            FROM exposure_segments s LEFT JOIN brands b ON b.id = s.brand_id
+            WHERE s.file_id = ? ORDER BY s.brand_id, s.t_start
+        """, (file_id,))
+        segments = []
+        for row in rows:
+            segment = dict(row)
+            brand_name = segment.pop('brand_name')
+            segment['brands'] = {'name': brand_name} if brand_name is not None else None
+            segments.append(segment)
+        return segments
+
+    async def get_temporal_pyramid(self, file_id: int, level: int) -> List[Dict]:
+        """Get one level of a file's temporal pyramids with brand name"""
+        rows = await self._query("""
+            SELECT p.*, b.name AS brand_name
+            FROM temporal_pyramids p LEFT JOIN brands b ON b.id = p.brand_id
+            WHERE p.file_id = ? AND p.level = ?
+        """, (file_id, level))
+        pyramids = []
+        for row in rows:
+            pyramid = dict(row)
+            brand_name = pyramid.pop('brand_name')
+            pyramid['brands'] = {'name': brand_name} if brand_name is not None else None
+            pyramid['counts'] = json.loads(pyramid['counts'])
+            pyramids.append(pyramid)
+        return pyramids
+
+    async def get_frame_captures(self, file_id: Optional[int] = None) -> List[Dict]:
+        """Get frame captures for a file, or all of them"""
+        if file_id is not None:
+            rows = await self._query(
+                "SELECT * FROM frame_captures WHERE file_id = ? ORDER BY frame_number", (file_id,)
+            )
+        else:
+            rows = await self._query("SELECT * FROM frame_captures ORDER BY created_at DESC, id DESC")
+        return [dict(row) for row in rows]
+
+    async def get_file_statistics(self, file_id: int, intervals: int) -> Dict:
+        """Aggregate statistics with SQL, mirroring the Postgres function"""
+        return await asyncio.to_thread(self._file_statistics, file_id, intervals)
+
+    def _file_statistics(self, file_id: int, intervals: int) -> Dict:
+        conn = self.conn
+        row = conn.execute("SELECT COALESCE(duration_seconds, 0) FROM files WHERE id = ?", (file_id,)).fetchone()
+        duration = row[0] if row else 0
+        interval_size = duration / intervals if duration > 0 else 1
+
+        totals = conn.execute("""
+            SELECT COUNT(*), COUNT(DISTINCT brand_id), COALESCE(AVG(score), 0)
+            FROM detections WHERE file_id = ?
+        """, (file_id,)).fetchone()
+
+        brands = conn.execute("""
+            SELECT COALESCE(b.name, 'Unknown') AS brand_name,
+                   SUM(COALESCE(p.total_detections, 0)) AS detections,
+                   SUM(COALESCE(p.duration_seconds, 0)) AS total_time,
+                   AVG(COALESCE(p.avg_score, 0)) AS avg_confidence
+            FROM predictions p LEFT JOIN brands b ON b.id = p.brand_id
+            WHERE p.video_id = ?
+            GROUP BY COALESCE(b.name, 'Unknown')
+        """, (file_id,)).fetchall()
+
+        histogram = conn.execute("""
+            SELECT CAST(COALESCE(t_start, 0) / ? AS INTEGER) AS bucket, COUNT(*) AS detections
+            FROM detections
+            WHERE file_id = ? AND COALESCE(t_start, 0) >= 0
+            GROUP BY bucket HAVING bucket < ?
+        """, (interval_size, file_id, intervals)).fetchall()
+
+        brand_distribution = [dict(brand) for brand in brands]
+        return {
+            'total_detections': totals[0],
+            'unique_brands': totals[1],
+            'average_confidence': totals[2],
+            'total_detection_time': sum(brand['total_time'] for brand in brand_distribution),
+            'brand_distribution': brand_distribution,
+            'temporal_histogram': [dict(bucket) for bucket in histogram]
+        }
+
+    async def count_detections(self, file_id: int) -> int:
+        """Get detection count for a file"""
+        row = await self._query_one("SELECT COUNT(*) FROM detections WHERE file_id = ?", (file_id,))
+        return row[0]
+
+    async def count_frame_captures(self, file_id: int) -> int:
+        """Get frame captures count for a file"""
+        row = await self._query_one("SELECT COUNT(*) FROM frame_captures WHERE file_id = ?", (file_id,))
+        return row[0]
+
+    async def get_file_brand_names(self, file_id: int) -> List[str]:
+        """Get brands detected in a file"""
+        rows = await self._query("""
+            SELECT DISTINCT b.name FROM detections d JOIN brands b ON b.id = d.brand_id
+            WHERE d.file_id = ?
+        """, (file_id,))
+        return [row[0] for row in rows]
+
+    async def list_file_ids(self, without_summary: bool = False) -> List[int]:
+        """Get file ids, optionally only those missing a summary"""
+        sql = "SELECT f.id FROM files f"
+        if without_summary:
+            sql += " LEFT JOIN file_summaries s ON s.file_id = f.id WHERE s.file_id IS NULL"
+        rows = await self._query(sql + " ORDER BY f.id")
+        return [row[0] for row in rows]
+
+    async def upsert_file_summary(self, summary: dict) -> None:
+        """Insert or replace a file summary row"""
+        try:
+            await asyncio.to_thread(self._upsert_file_summary, summary)
+        except Exception as e:
+            logger.error(f"Error storing file summary: {e}")
+            raise
+
+    def _upsert_file_summary(self, summary: dict):
+        data = {k: (json.dumps(v) if isinstance(v, (list, dict)) else v) for k, v in summary.items()}
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join('?' for _ in data)
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO file_summaries ({columns}) VALUES ({placeholders})", list(data.values())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def get_file_summary(self, file_id: int) -> Optional[Dict]:
+        """Get the summary row of a file"""
+        row = await self._query_one("SELECT * FROM file_summaries WHERE file_id = ?", (file_id,))
+        if not row:
+            return None
+        summary = dict(row)
+        for key in SUMMARY_JSON_COLUMNS:
+            summary[key] = json.loads(summary[key]) if summary[key] else None
+        return summary
+
+    async def apply_brand_rollups(self, file_id: int) -> None:
+        """Add a file's per-brand totals to the brand rollups, in one transaction"""
+        try:
+            await asyncio.to_thread(self._apply_brand_rollups, file_id)
+        except Exception as e:
+            logger.error(f"Error applying brand rollups of file {file_id}: {e}")
+            raise
+
+    def _apply_brand_rollups(self, file_id: int):
+        conn = self.conn
+        # IMMEDIATE takes the write lock first, so two applies of one file cannot both pass the check
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM brand_file_rollups WHERE file_id = ?", (file_id,)).fetchone():
+                conn.execute("COMMIT")
+                return
+            conn.execute("""
+                INSERT INTO brand_file_rollups
+                    (file_id, brand_id, day, file_type, total_detections, score_sum, exposure_seconds)
+                SELECT d.file_id, d.brand_id, substr(f.created_at, 1, 10), COALESCE(f.file_type, 'unknown'),
+                       COUNT(*), SUM(COALESCE(d.score, 0)),
+                       COALESCE((SELECT SUM(COALESCE(p.total_seconds, 0)) FROM predictions p
+                                 WHERE p.video_id = d.file_id AND p.brand_id = d.brand_id), 0)
+                FROM detections d JOIN files f ON f.id = d.file_id
+                WHERE d.file_id = ? AND d.brand_id IS NOT NULL
+                GROUP BY d.brand_id
+            """, (file_id,))
+            for table_key, table in ROLLUP_TABLES.items():
+                conn.execute(f"""
+                    INSERT INTO {table} (brand_id, {table_key}, files_count, total_detections, score_sum, exposure_seconds)
+                    SELECT brand_id, {table_key}, 1, total_detections, score_sum, exposure_seconds
+                    FROM brand_file_rollups WHERE file_id = ?
+                    ON CONFLICT (brand_id, {table_key}) DO UPDATE SET
+                        files_count = files_count + 1,
+                        total_detections = total_detections + excluded.total_detections,
+                        score_sum = score_sum + excluded.score_sum,
+                        exposure_seconds = exposure_seconds + excluded.exposure_seconds,
+                        updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+                """, (file_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _remove_brand_rollups(self, conn: sqlite3.Connection, file_id: int):
+        """Take a file's totals out of the brand rollups, inside the caller's transaction"""
+        for table_key, table in ROLLUP_TABLES.items():
+            conn.execute(f"""
+                UPDATE {table} AS r SET
+                    files_count = r.files_count - 1,
+                    total_detections = r.total_detections - c.total_detections,
+                    score_sum = r.score_sum - c.score_sum,
+                    exposure_seconds = r.exposure_seconds - c.exposure_seconds,
+                    updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+                FROM brand_file_rollups c
+                WHERE c.file_id = ? AND r.brand_id = c.brand_id AND r.{table_key} = c.{table_key}
+            """, (file_id,))
+            conn.execute(f"DELETE FROM {table} WHERE files_count <= 0")
+        conn.execute("DELETE FROM brand_file_rollups WHERE file_id = ?", (file_id,))
+
+    async def get_brand_rollups(self, group_by: str, since: Optional[str] = None, until: Optional[str] = None,
+                                brand: Optional[str] = None) -> List[Dict]:
+        """Get brand rollup rows with brand name"""
+        where, params = [], []
+        if group_by == 'day':
+            if since is not None:
+                where.append("r.day >= ?")
+                params.append(since)
+            if until is not None:
+                where.append("r.day <= ?")
+                params.append(until)
+        if brand is not None:
+            where.append("b.name = ?")
+            params.append(brand)
+        sql = f"""
+            SELECT r.*, b.name AS brand_name
+            FROM {ROLLUP_TABLES[group_by]} r JOIN brands b ON b.id = r.brand_id
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = await self._query(sql + f" ORDER BY r.brand_id, r.{group_by}", params)
+        rollups = []
+        for row in rows:
+            rollup = dict(row)
+            rollup['brands'] = {'name': rollup.pop('brand_name')}
+            rollups.append(rollup)
+        return rollups
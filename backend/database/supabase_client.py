@@ -1,82 +1,130 @@
+import asyncio
+import os
 from supabase import create_client, Client
-from backend.core.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE
+from typing import Callable, Dict, List, Optional, Tuple
+from backend.core.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE, SUPABASE_PAGE_SIZE, RESUMABLE_UPLOAD_THRESHOLD
+from backend.database.base import Repository, UPSERT_KEYS
+from backend.database.resumable_upload import ResumableUploader
 import logging
 
 logger = logging.getLogger(__name__)
 
-class SupabaseClient:
+DETECTION_SELECT = '''
+    *,
+    brands(name),
+    frame_captures(public_url, path, frame_number)
+'''
+
+class SupabaseClient(Repository):
     def __init__(self):
-        self.client: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE)
-    
-    async def upload_file_to_storage(self, file_path: str, bucket: str, destination_path: str) -> str:
-        """Upload file to Supabase storage"""
-        try:
-            with open(file_path, 'rb') as f:
-                response = self.client.storage.from_(bucket).upload(destination_path, f)
-            
-            # Supabase storage upload returns different response format
-            # Check if upload was successful and get public URL
-            if response:
-                # Get public URL
-                public_url = self.client.storage.from_(bucket).get_public_url(destination_path)
-                logger.info(f"File uploaded successfully: {destination_path}")
-                return public_url
+        self._client: Optional[Client] = None
+        self.resumable_uploader = ResumableUploader()
+
+    @property
+    def client(self) -> Client:
+        """Supabase client, created on first use instead of at import time"""
+        if self._client is None:
+            self._client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE)
+        return self._client
+
+    async def _execute(self, query):
+        """
+        Run a PostgREST request in a worker thread. The Supabase client is
+        synchronous; executing it inline would block the event loop, and
+        threads let independent queries run concurrently.
+        """
+        return await asyncio.to_thread(query.execute)
+
+    async def _fetch_all(self, build_query: Callable, page_size: int = SUPABASE_PAGE_SIZE) -> List[Dict]:
+        """
+        Every row of a query, read in pages with .range(). PostgREST caps each
+        response at its max-rows setting and silently drops the rest, so one
+        request would truncate large files. build_query returns a fresh,
+        totally ordered query for each page (query builders are not reusable).
+        """
+        rows = []
+        while True:
+            page = (await self._execute(build_query().range(len(rows), len(rows) + page_size - 1))).data
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+    async def upload_file_to_storage(self, file_path: str, bucket: str, destination_path: str,
+                                     upsert: bool = False) -> str:
+        """Upload file to Supabase storage, using resumable chunks above the size threshold"""
+        try:
+            # Run the blocking upload in a worker thread so callers can overlap it with other work
+            if os.path.getsize(file_path) > RESUMABLE_UPLOAD_THRESHOLD:
+                await asyncio.to_thread(self.resumable_uploader.upload, file_path, bucket, destination_path, upsert)
             else:
-                raise Exception(f"Upload failed: {response}")
+                await asyncio.to_thread(self._upload_single_request, file_path, bucket, destination_path, upsert)
+
+            public_url = self.client.storage.from_(bucket).get_public_url(destination_path)
+            logger.info(f"File uploaded successfully: {destination_path}")
+            return public_url
         except Exception as e:
             logger.error(f"Error uploading file: {e}")
             raise
-    
+
+    def _upload_single_request(self, file_path: str, bucket: str, destination_path: str, upsert: bool = False):
+        file_options = {"upsert": "true"} if upsert else None
+        with open(file_path, 'rb') as f:
+            response = self.client.storage.from_(bucket).upload(destination_path, f, file_options=file_options)
+
+        # Supabase storage upload returns different response format
+        if not response:
+            raise Exception(f"Upload failed: {response}")
+
     async def insert_file_record(self, file_data: dict) -> int:
         """Insert file record into files table"""
         try:
-            response = self.client.table('files').insert(file_data).execute()
+            response = await self._execute(self.client.table('files').insert(file_data))
             return response.data[0]['id']
         except Exception as e:
             logger.error(f"Error inserting file record: {e}")
             raise
-    
+
     async def insert_detection(self, detection_data: dict) -> int:
         """Insert detection record"""
         try:
-            response = self.client.table('detections').insert(detection_data).execute()
+            response = await self._execute(self.client.table('detections').insert(detection_data))
             return response.data[0]['id']
         except Exception as e:
             logger.error(f"Error inserting detection: {e}")
             raise
-    
+
     async def insert_prediction(self, prediction_data: dict) -> int:
         """Insert prediction record"""
         try:
             logger.info(f"🗄️ Inserting prediction data: {prediction_data}")
-            response = self.client.table('predictions').insert(prediction_data).execute()
+            response = await self._execute(self.client.table('predictions').insert(prediction_data))
             logger.info(f"✅ Prediction inserted successfully with ID: {response.data[0]['id']}")
             return response.data[0]['id']
         except Exception as e:
             logger.error(f"❌ Error inserting prediction: {e}")
             logger.error(f"❌ Prediction data that failed: {prediction_data}")
             raise
-    
+
     async def get_or_create_brand(self, brand_name: str) -> int:
         """Get brand ID or create new brand"""
         try:
             # Try to get existing brand
-            response = self.client.table('brands').select('id').eq('name', brand_name).execute()
-            
+            response = await self._execute(self.client.table('brands').select('id').eq('name', brand_name))
+
             if response.data:
                 return response.data[0]['id']
             else:
                 # Create new brand
-                response = self.client.table('brands').insert({'name': brand_name}).execute()
+                response = await self._execute(self.client.table('brands').insert({'name': brand_name}))
                 return response.data[0]['id']
         except Exception as e:
             logger.error(f"Error getting/creating brand: {e}")
             raise
-    
+
     async def insert_frame_capture(self, frame_capture_data: dict) -> int:
         """Insert frame capture record"""
         try:
-            response = self.client.table('frame_captures').insert(frame_capture_data).execute()
+            response = await self._execute(self.client.table('frame_captures').insert(frame_capture_data))
             return response.data[0]['id']
         except Exception as e:
             logger.error(f"Frame capture insertion failed: {e}")
@@ -84,5 +132,286 @@ class SupabaseClient:
             # Return None instead of 0 to indicate failure
             return None
 
-# Global instance
-supabase_client = SupabaseClient()
+    def _bulk_insert(self, table: str, rows: List[dict]) -> List[int]:
+        if not rows:
+            return []
+        # Upsert on the table's natural key: a re-sent batch updates its rows instead of duplicating them
+        response = self.client.table(table).upsert(rows, on_conflict=','.join(UPSERT_KEYS[table])).execute()
+        return [row['id'] for row in response.data]
+
+    async def insert_detections(self, rows: List[dict]) -> List[int]:
+        """Bulk insert detections in a single request"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'detections', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} detections: {e}")
+            raise
+
+    async def insert_frame_captures(self, rows: List[dict]) -> List[int]:
+        """Bulk insert frame captures in a single request"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'frame_captures', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} frame captures: {e}")
+            raise
+
+    async def insert_predictions(self, rows: List[dict]) -> List[int]:
+        """Bulk insert predictions in a single request"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'predictions', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} predictions: {e}")
+            raise
+
+    async def insert_exposure_segments(self, rows: List[dict]) -> List[int]:
+        """Bulk insert exposure segments in a single request"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'exposure_segments', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} exposure segments: {e}")
+            raise
+
+    async def insert_temporal_pyramids(self, rows: List[dict]) -> List[int]:
+        """Bulk insert temporal pyramid levels in a single request"""
+        try:
+            return await asyncio.to_thread(self._bulk_insert, 'temporal_pyramids', rows)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(rows)} temporal pyramid levels: {e}")
+            raise
+
+    async def delete_file(self, file_id: int) -> None:
+        """Delete a file and its dependent rows, children first"""
+        try:
+            await self._execute(self.client.rpc('remove_brand_rollups', {'p_file_id': file_id}))
+            await self._execute(self.client.table('detections').delete().eq('file_id', file_id))
+            await self._execute(self.client.table('frame_captures').delete().eq('file_id', file_id))
+            await self._execute(self.client.table('predictions').delete().eq('video_id', file_id))
+            await self._execute(self.client.table('exposure_segments').delete().eq('file_id', file_id))
+            await self._execute(self.client.table('temporal_pyramids').delete().eq('file_id', file_id))
+            await self._execute(self.client.table('file_summaries').delete().eq('file_id', file_id))
+            await self._execute(self.client.table('files').delete().eq('id', file_id))
+        except Exception as e:
+            logger.error(f"Error deleting file {file_id}: {e}")
+            raise
+
+    async def delete_rows_after_frame(self, file_id: int, frame_number: int) -> None:
+        """Delete rows written past a checkpoint"""
+        try:
+            await self._execute(self.client.rpc('remove_brand_rollups', {'p_file_id': file_id}))
+            await self._execute(self.client.table('detections').delete()
+                                .eq('file_id', file_id).gt('frame', frame_number))
+            await self._execute(self.client.table('frame_captures').delete()
+                                .eq('file_id', file_id).gt('frame_number', frame_number))
+            await self._execute(self.client.table('predictions').delete().eq('video_id', file_id))
+            await self._execute(self.client.table('exposure_segments').delete().eq('file_id', file_id))
+            await self._execute(self.client.table('temporal_pyramids').delete().eq('file_id', file_id))
+            await self._execute(self.client.table('file_summaries').delete().eq('file_id', file_id))
+        except Exception as e:
+            logger.error(f"Error deleting rows of file {file_id} after frame {frame_number}: {e}")
+            raise
+
+    async def delete_frame_range(self, file_id: int, start_frame: int, end_frame: Optional[int]) -> None:
+        """Delete the rows of a range of frames (a retried segment)"""
+        try:
+            for table, column in (('detections', 'frame'), ('frame_captures', 'frame_number')):
+                query = self.client.table(table).delete().eq('file_id', file_id).gte(column, start_frame)
+                if end_frame is not None:
+                    query = query.lt(column, end_frame)
+                await self._execute(query)
+        except Exception as e:
+            logger.error(f"Error deleting rows of file {file_id} in frames [{start_frame}, {end_frame}): {e}")
+            raise
+
+    async def get_file(self, file_id: int) -> Optional[Dict]:
+        """Get file record by id"""
+        response = await self._execute(self.client.table('files').select('*').eq('id', file_id))
+        return response.data[0] if response.data else None
+
+    async def list_files(self) -> List[Dict]:
+        """Get all files, newest first"""
+        response = await self._execute(self.client.table('files')
+                                       .select('*')
+                                       .order('created_at', desc=True))
+        return response.data
+
+    async def get_detections(self, file_id: Optional[int] = None) -> List[Dict]:
+        """Get detections with brand name and frame capture information"""
+        def build_query():
+            query = self.client.table('detections').select(DETECTION_SELECT)
+            if file_id is not None:
+                return query.eq('file_id', file_id).order('id')
+            return query.order('created_at', desc=True).order('id', desc=True)
+        return await self._fetch_all(build_query)
+
+    async def get_detection_frames(self, file_id: int) -> List[Dict]:
+        """Get a file's detections with only frame, brand name and score"""
+        rows = await self._fetch_all(lambda: self.client.table('detections')
+                                     .select('frame, score, brands(name)')
+                                     .eq('file_id', file_id)
+                                     .order('frame')
+                                     .order('id'))
+        return [{
+            'frame': row['frame'] or 0,
+            'brand_name': row['brands']['name'] if row['brands'] else 'Unknown',
+            'score': row['score']
+        } for row in rows]
+
+    def _keyset(self, query, cursor: Optional[Tuple[str, int]], limit: int):
+        """Apply (created_at, id) descending keyset pagination"""
+        if cursor is not None:
+            created_at, row_id = cursor
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{int(row_id)})'
+            )
+        return query.order('created_at', desc=True).order('id', desc=True).limit(limit)
+
+    async def list_detections(self, limit: int, cursor: Optional[Tuple[str, int]] = None,
+                              columns: Optional[List[str]] = None, with_brand: bool = True,
+                              with_frame_capture: bool = True, brand: Optional[str] = None,
+                              file_id: Optional[int] = None, since: Optional[str] = None,
+                              until: Optional[str] = None, min_score: Optional[float] = None) -> List[Dict]:
+        """Get one page of detections"""
+        select = list(columns) if columns else ['*']
+        if brand is not None:
+            # Inner join so the brand filter removes non-matching detections
+            select.append('brands!inner(name)')
+        elif with_brand:
+            select.append('brands(name)')
+        if with_frame_capture:
+            select.append('frame_captures(public_url, path, frame_number)')
+
+        query = self.client.table('detections').select(','.join(select))
+        if brand is not None:
+            query = query.eq('brands.name', brand)
+        if file_id is not None:
+            query = query.eq('file_id', file_id)
+        if since is not None:
+            query = query.gte('created_at', since)
+        if until is not None:
+            query = query.lt('created_at', until)
+        if min_score is not None:
+            query = query.gte('score', min_score)
+        return (await self._execute(self._keyset(query, cursor, limit))).data
+
+    async def list_frame_captures(self, limit: int, cursor: Optional[Tuple[str, int]] = None,
+                                  columns: Optional[List[str]] = None, file_id: Optional[int] = None,
+                                  since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """Get one page of frame captures"""
+        query = self.client.table('frame_captures').select(','.join(columns) if columns else '*')
+        if file_id is not None:
+            query = query.eq('file_id', file_id)
+        if since is not None:
+            query = query.gte('created_at', since)
+        if until is not None:
+            query = query.lt('created_at', until)
+        return (await self._execute(self._keyset(query, cursor, limit))).data
+
+    async def get_predictions(self, file_id: int) -> List[Dict]:
+        """Get predictions for a file with brand name"""
+        return await self._fetch_all(lambda: self.client.table('predictions')
+                                     .select('*, brands(name)')
+                                     .eq('video_id', file_id)
+                                     .order('id'))
+
+    async def get_exposure_segments(self, file_id: int) -> List[Dict]:
+        """Get a file's exposure segments with brand name"""
+        return await self._fetch_all(lambda: self.client.table('exposure_segments')
+                                     .select('*, brands(name)')
+                                     .eq('file_id', file_id)
+                                     .order('brand_id')
+                                     .order('t_start')
+                                     .order('id'))
+
+    async def get_temporal_pyramid(self, file_id: int, level: int) -> List[Dict]:
+        """Get one level of a file's temporal pyramids with brand name"""
+        return await self._fetch_all(lambda: self.client.table('temporal_pyramids')
+                                     .select('*, brands(name)')
+                                     .eq('file_id', file_id)
+                                     .eq('level', level)
+                                     .order('id'))
+
+    async def get_frame_captures(self, file_id: Optional[int] = None) -> List[Dict]:
+        """Get frame captures for a file, or all of them"""
+        def build_query():
+            query = self.client.table('frame_captures').select('*')
+            if file_id is not None:
+                return query.eq('file_id', file_id).order('frame_number').order('id')
+            return query.order('created_at', desc=True).order('id', desc=True)
+        return await self._fetch_all(build_query)
+
+    async def get_file_statistics(self, file_id: int, intervals: int) -> Dict:
+        """Aggregate statistics with the get_file_statistics Postgres function"""
+        response = await self._execute(self.client.rpc('get_file_statistics', {
+            'p_file_id': file_id,
+            'p_intervals': intervals
+        }))
+        return response.data
+
+    async def count_detections(self, file_id: int) -> int:
+        """Get detection count for a file"""
+        response = await self._execute(self.client.table('detections').select('id', count='exact', head=True)
+                                       .eq('file_id', file_id))
+        return response.count or 0
+
+    async def count_frame_captures(self, file_id: int) -> int:
+        """Get frame captures count for a file"""
+        response = await self._execute(self.client.table('frame_captures').select('id', count='exact', head=True)
+                                       .eq('file_id', file_id))
+        return response.count or 0
+
+    async def get_file_brand_names(self, file_id: int) -> List[str]:
+        """Get brands detected in a file"""
+        rows = await self._fetch_all(lambda: self.client.table('detections')
+                                     .select('brands(name)')
+                                     .eq('file_id', file_id)
+                                     .order('id'))
+        return list(set([d['brands']['name'] for d in rows if d['brands']]))
+
+    async def list_file_ids(self, without_summary: bool = False) -> List[int]:
+        """Get file ids, optionally only those missing a summary"""
+        files = await self._fetch_all(lambda: self.client.table('files').select('id').order('id'))
+        file_ids = [row['id'] for row in files]
+        if not without_summary:
+            return file_ids
+        summaries = await self._fetch_all(lambda: self.client.table('file_summaries').select('file_id').order('file_id'))
+        summarized = {row['file_id'] for row in summaries}
+        return [file_id for file_id in file_ids if file_id not in summarized]
+
+    async def upsert_file_summary(self, summary: dict) -> None:
+        """Insert or replace a file summary row"""
+        try:
+            await self._execute(self.client.table('file_summaries').upsert(summary, on_conflict='file_id'))
+        except Exception as e:
+            logger.error(f"Error storing file summary: {e}")
+            raise
+
+    async def get_file_summary(self, file_id: int) -> Optional[Dict]:
+        """Get the summary row of a file"""
+        response = await self._execute(self.client.table('file_summaries').select('*').eq('file_id', file_id))
+        return response.data[0] if response.data else None
+
+    async def apply_brand_rollups(self, file_id: int) -> None:
+        """Add a file's per-brand totals to the brand rollups with the apply_brand_rollups Postgres function"""
+        try:
+            await self._execute(self.client.rpc('apply_brand_rollups', {'p_file_id': file_id}))
+        except Exception as e:
+            logger.error(f"Error applying brand rollups of file {file_id}: {e}")
+            raise
+
+    async def get_brand_rollups(self, group_by: str, since: Optional[str] = None, until: Optional[str] = None,
+                                brand: Optional[str] = None) -> List[Dict]:
+        """Get brand rollup rows with brand name"""
+        table = {'day': 'brand_daily_rollups', 'file_type': 'brand_file_type_rollups'}[group_by]
+
+        def build_query():
+            query = self.client.table(table).select('*, brands!inner(name)')
+            if group_by == 'day':
+                if since is not None:
+                    query = query.gte('day', since)
+                if until is not None:
+                    query = query.lte('day', until)
+            if brand is not None:
+                query = query.eq('brands.name', brand)
+            # (brand_id, day or file_type) is the primary key, so pages do not overlap
+            return query.order('brand_id').order(group_by)
+        return await self._fetch_all(build_query)
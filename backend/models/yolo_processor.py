@@ -3,6 +3,7 @@ import cv2
 import numpy as np
 import torch
 import os
+import threading
 from typing import List, Dict, Tuple
 import logging
 from backend.core.config import MODEL_PATH, CONFIDENCE_THRESHOLD
@@ -28,6 +29,9 @@ class YOLOProcessor:
             except Exception as e2:
                 logger.error(f"Failed to load any YOLO model: {e2}")
                 self.model = None
+        # Jobs run detection in worker threads, and a YOLO predictor is not
+        # thread-safe: one inference at a time (torch already uses every core)
+        self._lock = threading.Lock()
     
     def detect_objects(self, image: np.ndarray) -> List[Dict]:
         """
@@ -39,7 +43,8 @@ class YOLOProcessor:
                 logger.warning("YOLO model not loaded, returning empty detections")
                 return []
                 
-            results = self.model(image, conf=CONFIDENCE_THRESHOLD)
+            with self._lock:
+                results = self.model(image, conf=CONFIDENCE_THRESHOLD)
             detections = []
             
             for result in results:
@@ -0,0 +1,55 @@
+-- Keyset pagination indexes for GET /detections and GET /frame-captures
+-- Execute this script in Supabase SQL Editor
+--
+-- Pages are ordered by (created_at DESC, id DESC) and continue from the last
+-- row of the previous page, so every page is an index range scan instead of
+-- an OFFSET over the whole table.
+
+-- =======================================================================
+-- detections
+-- =======================================================================
+
+CREATE INDEX IF NOT EXISTS idx_detections_created_at_id
+    ON detections (created_at DESC, id DESC);
+
+-- file_id filter
+CREATE INDEX IF NOT EXISTS idx_detections_file_created_at_id
+    ON detections (file_id, created_at DESC, id DESC);
+
+-- brand filter (brands.name is resolved to brand_id through the join)
+CREATE INDEX IF NOT EXISTS idx_detections_brand_created_at_id
+    ON detections (brand_id, created_at DESC, id DESC);
+
+-- min_score filter
+CREATE INDEX IF NOT EXISTS idx_detections_score
+    ON detections (score);
+
+-- Brand lookup by name for the brand filter
+CREATE UNIQUE INDEX IF NOT EXISTS idx_brands_name ON brands (name);
+
+-- =======================================================================
+-- frame_captures
+-- =======================================================================
+
+CREATE INDEX IF NOT EXISTS idx_frame_captures_created_at_id
+    ON frame_captures (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_frame_captures_file_created_at_id
+    ON frame_captures (file_id, created_at DESC, id DESC);
+
+-- =======================================================================
+-- VERIFICATION
+-- =======================================================================
+
+SELECT indexname, tablename, indexdef
+FROM pg_indexes
+WHERE tablename IN ('detections', 'frame_captures', 'brands')
+AND indexname IN (
+    'idx_detections_created_at_id',
+    'idx_detections_file_created_at_id',
+    'idx_detections_brand_created_at_id',
+    'idx_detections_score',
+    'idx_brands_name',
+    'idx_frame_captures_created_at_id',
+    'idx_frame_captures_file_created_at_id'
+);
@@ -0,0 +1,36 @@
+-- Natural keys of the bulk-written tables, so retried write batches are idempotent
+-- Execute this script in Supabase SQL Editor
+--
+-- The write-behind buffer upserts frame_captures, detections, predictions,
+-- exposure_segments and temporal_pyramids on these keys (on_conflict), so a
+-- batch re-sent after an ambiguous failure (a timeout after the server had
+-- already committed it) updates its rows instead of duplicating them.
+-- Detections are keyed by their position in the frame (detection_index);
+-- rows written before this migration keep NULL and never conflict.
+-- Duplicates left by earlier retries are removed first, keeping the oldest row.
+
+ALTER TABLE detections ADD COLUMN IF NOT EXISTS detection_index INTEGER;
+
+-- Detections of a duplicate capture point to the kept one
+UPDATE detections d SET frame_capture_id = k.keep_id
+FROM frame_captures a,
+     (SELECT file_id, frame_number, MIN(id) AS keep_id FROM frame_captures GROUP BY file_id, frame_number) k
+WHERE d.frame_capture_id = a.id AND a.file_id = k.file_id AND a.frame_number = k.frame_number AND a.id <> k.keep_id;
+
+DELETE FROM frame_captures a USING frame_captures b
+WHERE a.file_id = b.file_id AND a.frame_number = b.frame_number AND a.id > b.id;
+
+DELETE FROM predictions a USING predictions b
+WHERE a.video_id = b.video_id AND a.brand_id = b.brand_id AND a.id > b.id;
+
+DELETE FROM exposure_segments a USING exposure_segments b
+WHERE a.file_id = b.file_id AND a.brand_id = b.brand_id AND a.t_start = b.t_start AND a.id > b.id;
+
+DELETE FROM temporal_pyramids a USING temporal_pyramids b
+WHERE a.file_id = b.file_id AND a.brand_id = b.brand_id AND a.level = b.level AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_frame_captures_upsert_key ON frame_captures(file_id, frame_number);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_detections_upsert_key ON detections(file_id, frame, detection_index);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_predictions_upsert_key ON predictions(video_id, brand_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_exposure_segments_upsert_key ON exposure_segments(file_id, brand_id, t_start);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_temporal_pyramids_upsert_key ON temporal_pyramids(file_id, brand_id, level);
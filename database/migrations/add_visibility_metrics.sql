@@ -0,0 +1,18 @@
+-- Visibility metrics of each detection and visibility-weighted brand exposure
+-- Execute this script in Supabase SQL Editor
+--
+-- Computed at ingest from each detection's bbox and frame size (and, with
+-- VISIBILITY_SHARPNESS=true, its crop's Laplacian variance): area_fraction of
+-- the frame, center_distance (0 at the center, 1 in a corner), edge_clipped
+-- and the combined visibility in [0, 1]. Predictions gain exposure_score,
+-- the brand's on-screen seconds weighted by visibility, and avg_visibility.
+-- Rows written before this migration keep NULL.
+
+ALTER TABLE detections ADD COLUMN IF NOT EXISTS area_fraction DOUBLE PRECISION;
+ALTER TABLE detections ADD COLUMN IF NOT EXISTS center_distance DOUBLE PRECISION;
+ALTER TABLE detections ADD COLUMN IF NOT EXISTS edge_clipped BOOLEAN;
+ALTER TABLE detections ADD COLUMN IF NOT EXISTS sharpness DOUBLE PRECISION;
+ALTER TABLE detections ADD COLUMN IF NOT EXISTS visibility DOUBLE PRECISION;
+
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS exposure_score DOUBLE PRECISION;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS avg_visibility DOUBLE PRECISION;
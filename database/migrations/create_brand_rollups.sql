@@ -0,0 +1,123 @@
+-- Brand rollups: cross-video totals per brand per day and per brand per file type
+-- Execute this script in Supabase SQL Editor
+--
+-- When a job finishes, apply_brand_rollups adds each brand's detections,
+-- score sum and on-screen seconds in that file to the rollups;
+-- remove_brand_rollups takes them out again before a file's results are
+-- deleted. brand_file_rollups keeps each file's contribution, so both
+-- functions are idempotent, and /analytics/brands reads only the rollup
+-- rows. Existing files: python -m backend.core.brand_rollups
+-- Called through PostgREST: rpc('apply_brand_rollups', {p_file_id}), rpc('remove_brand_rollups', {p_file_id}).
+
+CREATE TABLE IF NOT EXISTS brand_file_rollups (
+    file_id BIGINT NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id BIGINT NOT NULL REFERENCES brands(id),
+    day DATE NOT NULL,
+    file_type TEXT NOT NULL,
+    total_detections BIGINT NOT NULL,
+    score_sum DOUBLE PRECISION NOT NULL,
+    exposure_seconds DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (file_id, brand_id)
+);
+
+CREATE TABLE IF NOT EXISTS brand_daily_rollups (
+    brand_id BIGINT NOT NULL REFERENCES brands(id),
+    day DATE NOT NULL,
+    files_count INTEGER NOT NULL,
+    total_detections BIGINT NOT NULL,
+    score_sum DOUBLE PRECISION NOT NULL,
+    exposure_seconds DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (brand_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS brand_file_type_rollups (
+    brand_id BIGINT NOT NULL REFERENCES brands(id),
+    file_type TEXT NOT NULL,
+    files_count INTEGER NOT NULL,
+    total_detections BIGINT NOT NULL,
+    score_sum DOUBLE PRECISION NOT NULL,
+    exposure_seconds DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (brand_id, file_type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_brand_daily_rollups_day ON brand_daily_rollups(day);
+
+CREATE OR REPLACE FUNCTION apply_brand_rollups(p_file_id BIGINT)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- One writer per file; a file already rolled up is left alone
+    PERFORM pg_advisory_xact_lock(p_file_id);
+    IF EXISTS (SELECT 1 FROM brand_file_rollups WHERE file_id = p_file_id) THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO brand_file_rollups (file_id, brand_id, day, file_type, total_detections, score_sum, exposure_seconds)
+    SELECT d.file_id,
+           d.brand_id,
+           (f.created_at AT TIME ZONE 'UTC')::date,
+           COALESCE(f.file_type, 'unknown'),
+           COUNT(*),
+           SUM(COALESCE(d.score, 0)),
+           COALESCE((SELECT SUM(COALESCE(p.total_seconds, 0)) FROM predictions p
+                     WHERE p.video_id = d.file_id AND p.brand_id = d.brand_id), 0)
+    FROM detections d
+    JOIN files f ON f.id = d.file_id
+    WHERE d.file_id = p_file_id AND d.brand_id IS NOT NULL
+    GROUP BY d.file_id, d.brand_id, f.created_at, f.file_type;
+
+    INSERT INTO brand_daily_rollups AS r (brand_id, day, files_count, total_detections, score_sum, exposure_seconds)
+    SELECT brand_id, day, 1, total_detections, score_sum, exposure_seconds
+    FROM brand_file_rollups WHERE file_id = p_file_id
+    ON CONFLICT (brand_id, day) DO UPDATE SET
+        files_count = r.files_count + 1,
+        total_detections = r.total_detections + EXCLUDED.total_detections,
+        score_sum = r.score_sum + EXCLUDED.score_sum,
+        exposure_seconds = r.exposure_seconds + EXCLUDED.exposure_seconds,
+        updated_at = NOW();
+
+    INSERT INTO brand_file_type_rollups AS r (brand_id, file_type, files_count, total_detections, score_sum, exposure_seconds)
+    SELECT brand_id, file_type, 1, total_detections, score_sum, exposure_seconds
+    FROM brand_file_rollups WHERE file_id = p_file_id
+    ON CONFLICT (brand_id, file_type) DO UPDATE SET
+        files_count = r.files_count + 1,
+        total_detections = r.total_detections + EXCLUDED.total_detections,
+        score_sum = r.score_sum + EXCLUDED.score_sum,
+        exposure_seconds = r.exposure_seconds + EXCLUDED.exposure_seconds,
+        updated_at = NOW();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION remove_brand_rollups(p_file_id BIGINT)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(p_file_id);
+
+    UPDATE brand_daily_rollups r SET
+        files_count = r.files_count - 1,
+        total_detections = r.total_detections - c.total_detections,
+        score_sum = r.score_sum - c.score_sum,
+        exposure_seconds = r.exposure_seconds - c.exposure_seconds,
+        updated_at = NOW()
+    FROM brand_file_rollups c
+    WHERE c.file_id = p_file_id AND r.brand_id = c.brand_id AND r.day = c.day;
+
+    UPDATE brand_file_type_rollups r SET
+        files_count = r.files_count - 1,
+        total_detections = r.total_detections - c.total_detections,
+        score_sum = r.score_sum - c.score_sum,
+        exposure_seconds = r.exposure_seconds - c.exposure_seconds,
+        updated_at = NOW()
+    FROM brand_file_rollups c
+    WHERE c.file_id = p_file_id AND r.brand_id = c.brand_id AND r.file_type = c.file_type;
+
+    DELETE FROM brand_daily_rollups WHERE files_count <= 0;
+    DELETE FROM brand_file_type_rollups WHERE files_count <= 0;
+    DELETE FROM brand_file_rollups WHERE file_id = p_file_id;
+END;
+$$;
@@ -0,0 +1,24 @@
+-- Exposure segments: contiguous on-screen intervals of each brand
+-- Execute this script in Supabase SQL Editor
+--
+-- Written when processing finishes, one row per interval in which a brand
+-- stays visible (detections up to EXPOSURE_GAP_TOLERANCE seconds apart are
+-- merged), so timelines render from a single indexed read. Predictions gain
+-- the segment count and the longest segment; their total_seconds now holds
+-- on-screen seconds instead of the first-to-last detection span.
+
+CREATE TABLE IF NOT EXISTS exposure_segments (
+    id BIGSERIAL PRIMARY KEY,
+    file_id BIGINT NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id BIGINT REFERENCES brands(id),
+    t_start DOUBLE PRECISION NOT NULL,
+    t_end DOUBLE PRECISION NOT NULL,
+    duration_seconds DOUBLE PRECISION NOT NULL,
+    detections_count INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_exposure_segments_file_brand ON exposure_segments(file_id, brand_id, t_start);
+
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS exposure_segments INTEGER;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS longest_exposure_seconds DOUBLE PRECISION;
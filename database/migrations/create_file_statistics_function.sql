@@ -0,0 +1,70 @@
+-- Server-side aggregation for GET /files/{file_id}/statistics
+-- Execute this script in Supabase SQL Editor
+--
+-- Returns counts, averages, per-brand distribution and the temporal
+-- histogram of a file as a single JSONB document, so the API no longer
+-- downloads every detection and prediction row to aggregate in Python.
+-- Called through PostgREST: rpc('get_file_statistics', {p_file_id, p_intervals}).
+
+CREATE OR REPLACE FUNCTION get_file_statistics(p_file_id INTEGER, p_intervals INTEGER DEFAULT 10)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH file AS (
+        SELECT COALESCE(duration_seconds, 0)::float8 AS duration
+        FROM files
+        WHERE id = p_file_id
+    ),
+    totals AS (
+        SELECT COUNT(*) AS total_detections,
+               COUNT(DISTINCT brand_id) AS unique_brands,
+               COALESCE(AVG(score), 0)::float8 AS average_confidence
+        FROM detections
+        WHERE file_id = p_file_id
+    ),
+    brand_distribution AS (
+        SELECT COALESCE(b.name, 'Unknown') AS brand_name,
+               SUM(COALESCE(p.total_detections, 0)) AS detections,
+               SUM(COALESCE(p.duration_seconds, 0))::float8 AS total_time,
+               AVG(COALESCE(p.avg_score, 0))::float8 AS avg_confidence
+        FROM predictions p
+        LEFT JOIN brands b ON b.id = p.brand_id
+        WHERE p.video_id = p_file_id
+        GROUP BY COALESCE(b.name, 'Unknown')
+    ),
+    histogram AS (
+        -- Equal slices of the video duration by detection start time
+        SELECT FLOOR(
+                   COALESCE(d.t_start, 0)::float8 /
+                   CASE WHEN f.duration > 0 THEN f.duration / p_intervals ELSE 1 END
+               )::INTEGER AS bucket,
+               COUNT(*) AS detections
+        FROM detections d
+        CROSS JOIN file f
+        WHERE d.file_id = p_file_id
+          AND COALESCE(d.t_start, 0) >= 0
+        GROUP BY 1
+    )
+    SELECT jsonb_build_object(
+        'total_detections', totals.total_detections,
+        'unique_brands', totals.unique_brands,
+        'average_confidence', totals.average_confidence,
+        'total_detection_time', (SELECT COALESCE(SUM(total_time), 0) FROM brand_distribution),
+        'brand_distribution', COALESCE((SELECT jsonb_agg(to_jsonb(bd)) FROM brand_distribution bd), '[]'::jsonb),
+        'temporal_histogram', COALESCE(
+            (SELECT jsonb_agg(jsonb_build_object('bucket', h.bucket, 'detections', h.detections) ORDER BY h.bucket)
+             FROM histogram h
+             WHERE h.bucket < p_intervals),
+            '[]'::jsonb
+        )
+    )
+    FROM totals;
+$$;
+
+-- Indexes used by the function
+CREATE INDEX IF NOT EXISTS idx_detections_file_t_start ON detections (file_id, t_start);
+CREATE INDEX IF NOT EXISTS idx_predictions_video_id ON predictions (video_id);
+
+-- Verify
+SELECT get_file_statistics((SELECT id FROM files ORDER BY id DESC LIMIT 1));
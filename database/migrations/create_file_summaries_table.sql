@@ -0,0 +1,35 @@
+-- Precomputed per-file summaries
+-- Execute this script in Supabase SQL Editor
+--
+-- One row per processed file, written when processing finishes, so
+-- /file-info, /predictions/{file_id} and /files/{file_id}/statistics are
+-- answered from a single primary-key lookup. Existing files are filled with:
+--     python -m backend.core.file_summary
+
+CREATE TABLE IF NOT EXISTS file_summaries (
+    file_id BIGINT PRIMARY KEY REFERENCES files(id) ON DELETE CASCADE,
+    file_info JSONB,
+    detections_count INTEGER NOT NULL DEFAULT 0,
+    frame_captures_count INTEGER NOT NULL DEFAULT 0,
+    brands_detected JSONB NOT NULL DEFAULT '[]'::jsonb,
+    detection_coverage DOUBLE PRECISION NOT NULL DEFAULT 0,
+    brand_totals JSONB NOT NULL DEFAULT '{}'::jsonb,
+    video_statistics JSONB,
+    temporal_distribution JSONB,
+    predictions JSONB NOT NULL DEFAULT '[]'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Keep updated_at current on upsert
+CREATE OR REPLACE FUNCTION touch_file_summaries_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_file_summaries_updated_at ON file_summaries;
+CREATE TRIGGER trg_file_summaries_updated_at
+    BEFORE UPDATE ON file_summaries
+    FOR EACH ROW EXECUTE FUNCTION touch_file_summaries_updated_at();
@@ -0,0 +1,21 @@
+-- Temporal pyramids: detections per brand at power-of-two time resolutions
+-- Execute this script in Supabase SQL Editor
+--
+-- Written when processing finishes. Level 0 counts a brand's detections per
+-- TIMELINE_BASE_SECONDS bin and level L per TIMELINE_BASE_SECONDS * 2^L bin,
+-- one row per file, brand and level. counts holds the bins from first_bin up
+-- to the last non-empty one, so /files/{file_id}/timeline reads a single
+-- level to answer any zoom window.
+
+CREATE TABLE IF NOT EXISTS temporal_pyramids (
+    id BIGSERIAL PRIMARY KEY,
+    file_id BIGINT NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    brand_id BIGINT REFERENCES brands(id),
+    level INTEGER NOT NULL,
+    bin_seconds DOUBLE PRECISION NOT NULL,
+    first_bin INTEGER NOT NULL,
+    counts JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_temporal_pyramids_file_level ON temporal_pyramids(file_id, level);
@@ -97,14 +97,14 @@ const HeatmapOverlay: React.FC<HeatmapOverlayProps> = ({
           const params = new URLSearchParams();
           params.append('grid_size', gridSize.toString());
           if (selectedBrand) {
-            params.append('brand_filter', selectedBrand);
+            params.append('brand', selectedBrand);
           }
           params.append('background', backgroundType);
           params.append('smooth', smoothFactor.toString());
-          response = await fetch(`${API_BASE_URL}/heatmap/${fileId}?${params}`);
+          response = await fetch(`${API_BASE_URL}/files/${fileId}/heatmap?${params}`);
           break;
         case 'brands':
-          response = await fetch(`${API_BASE_URL}/heatmap/${fileId}/brands`);
+          response = await fetch(`${API_BASE_URL}/files/${fileId}/heatmap/brands`);
           break;
         default:
           throw new Error('Неизвестный режим тепловой карты');
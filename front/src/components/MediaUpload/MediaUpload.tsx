@@ -18,14 +18,14 @@ const MediaUpload: React.FC<MediaUploadProps> = ({ onMediaUpload }) => {
     const validImageTypes = ['image/jpeg', 'image/jpg', 'image/png', 'image/bmp'];
     const validTypes = [...validVideoTypes, ...validImageTypes];
     
-    const maxSize = 100 * 1024 * 1024; // 100MB
+    const maxSize = 10 * 1024 * 1024 * 1024; // 10GB (backend MAX_FILE_SIZE)
 
     if (!validTypes.includes(file.type)) {
       return 'Please select a valid video or image file (MP4, AVI, MOV, MKV, WebM, JPG, PNG, BMP)';
     }
 
     if (file.size > maxSize) {
-      return 'File size must be less than 100MB';
+      return 'File size must be less than 10GB';
     }
 
     return null;
@@ -194,7 +194,7 @@ const MediaUpload: React.FC<MediaUploadProps> = ({ onMediaUpload }) => {
             
             <div className="upload-info">
               <p className="formats-text">Supported formats: MP4, AVI, MOV, MKV, WebM, JPG, PNG, BMP</p>
-              <p className="size-limit">Maximum size: 100MB per file</p>
+              <p className="size-limit">Maximum size: 10GB per file</p>
               <p className="drag-drop-hint">Drag and drop multiple files here</p>
             </div>
           </div>
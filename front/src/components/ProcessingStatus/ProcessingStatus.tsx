@@ -4,6 +4,8 @@ import { apiService, ProcessingResult } from '../../services/api';
 import { ProcessingStatusType, ProcessingStatusData } from '../../types';
 import ResultsDisplay from '../ResultsDisplay/ResultsDisplay';
 
+const canStreamEvents = typeof EventSource !== 'undefined';
+
 interface ProcessingStatusProps {
   sessionId: string;
   onComplete: (result: ProcessingResult) => void;
@@ -14,9 +16,39 @@ const ProcessingStatus: React.FC<ProcessingStatusProps> = ({ sessionId, onComple
   const [status, setStatus] = useState<ProcessingStatusData | null>(null);
   const [isPolling, setIsPolling] = useState(true);
   const [hasCompleted, setHasCompleted] = useState(false);
+  // Progress is pushed over SSE; polling is only the fallback
+  const [useEvents, setUseEvents] = useState(canStreamEvents);
+
+  useEffect(() => {
+    if (!sessionId || !useEvents || hasCompleted) return;
+
+    const source = apiService.subscribeToProcessingEvents(sessionId, {
+      onStage: (event) => setStatus((prev) => ({
+        ...prev, status: 'processing', stage: event.stage, progress: event.progress
+      })),
+      onProgress: (event) => setStatus((prev) => ({
+        ...prev, status: 'processing', progress: event.progress
+      })),
+      // Fetch the full result once through the status endpoint
+      onCompleted: () => setUseEvents(false),
+      onFailed: (error) => {
+        setHasCompleted(true);
+        setIsPolling(false);
+        onError(error);
+      },
+      onConnectionError: () => {
+        console.warn('⚠️ Progress stream unavailable, falling back to polling');
+        setUseEvents(false);
+      }
+    });
+
+    return () => {
+      source.close();
+    };
+  }, [sessionId, useEvents, hasCompleted, onError]);
 
   useEffect(() => {
-    if (!sessionId || !isPolling || hasCompleted) return;
+    if (!sessionId || !isPolling || hasCompleted || useEvents) return;
 
     const pollStatus = async () => {
       try {
@@ -61,7 +93,7 @@ const ProcessingStatus: React.FC<ProcessingStatusProps> = ({ sessionId, onComple
     return () => {
       clearInterval(interval);
     };
-  }, [sessionId, isPolling, hasCompleted, onComplete, onError]);
+  }, [sessionId, isPolling, hasCompleted, useEvents, onComplete, onError]);
 
   // Reset state when sessionId changes
   useEffect(() => {
@@ -69,6 +101,7 @@ const ProcessingStatus: React.FC<ProcessingStatusProps> = ({ sessionId, onComple
     setStatus(null);
     setIsPolling(true);
     setHasCompleted(false);
+    setUseEvents(canStreamEvents);
   }, [sessionId]);
 
   // Stop polling when component unmounts
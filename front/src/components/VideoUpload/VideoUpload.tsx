@@ -14,14 +14,14 @@ const VideoUpload: React.FC<VideoUploadProps> = ({ onVideoUpload }) => {
 
   const validateFile = (file: File): string | null => {
     const validTypes = ['video/mp4', 'video/avi', 'video/mov', 'video/mkv', 'video/webm'];
-    const maxSize = 100 * 1024 * 1024; // 100MB
+    const maxSize = 10 * 1024 * 1024 * 1024; // 10GB (backend MAX_FILE_SIZE)
 
     if (!validTypes.includes(file.type)) {
       return 'Please select a valid video file (MP4, AVI, MOV, MKV, WebM)';
     }
 
     if (file.size > maxSize) {
-      return 'File size must be less than 100MB';
+      return 'File size must be less than 10GB';
     }
 
     return null;
@@ -183,7 +183,7 @@ const VideoUpload: React.FC<VideoUploadProps> = ({ onVideoUpload }) => {
             
             <div className="upload-info">
               <p className="formats-text">Supported formats: MP4, AVI, MOV, MKV, WebM</p>
-              <p className="size-limit">Maximum size: 100MB per file</p>
+              <p className="size-limit">Maximum size: 10GB per file</p>
               <p className="drag-drop-hint">Drag and drop multiple files here</p>
             </div>
           </div>
@@ -19,6 +19,35 @@ export interface ProcessingStatus {
   stage?: string;
 }
 
+export interface ProcessingStageEvent {
+  stage: string;
+  progress: number;
+}
+
+export interface ProcessingProgressEvent {
+  progress: number;
+  frames_processed: number;
+  total_frames: number;
+  frames_per_second: number;
+  eta_seconds: number | null;
+}
+
+export interface DetectionBatchEvent {
+  frame_number: number;
+  t_start: number;
+  frame_capture_url: string;
+  detections: { brand_name: string; score: number; bbox: number[] }[];
+}
+
+export interface ProcessingEventHandlers {
+  onStage?: (event: ProcessingStageEvent) => void;
+  onProgress?: (event: ProcessingProgressEvent) => void;
+  onDetections?: (event: DetectionBatchEvent) => void;
+  onCompleted?: (event: { file_id: number; detections_count: number; brands_detected: string[] }) => void;
+  onFailed?: (error: string) => void;
+  onConnectionError?: () => void;
+}
+
 export interface ProcessingResult {
   file_id: number;
   session_id: string;
@@ -67,6 +96,12 @@ export interface DetectionRecord {
   frame_capture_url?: string;
   frame_capture_path?: string;
   frame_number?: number;
+  // Visibility metrics stored at ingest (null for older detections)
+  area_fraction?: number | null;
+  center_distance?: number | null;
+  edge_clipped?: boolean | null;
+  sharpness?: number | null;
+  visibility?: number | null;
 }
 
 export interface PredictionRecord {
@@ -81,12 +116,21 @@ export interface PredictionRecord {
   total_seconds?: number; // Optional field for backward compatibility
   first_detection_time: number;
   last_detection_time: number;
+  exposure_score?: number | null;
+  avg_visibility?: number | null;
   created_at: string;
   brands: {
     name: string;
   };
 }
 
+export interface BrandRollup {
+  files_count: number;
+  total_detections: number;
+  exposure_seconds: number;
+  avg_score: number;
+}
+
 class ApiService {
   private baseUrl: string;
 
@@ -170,10 +214,11 @@ class ApiService {
   }
 
   // Start processing for uploaded file
-  async startProcessing(sessionId: string): Promise<{ message: string; session_id: string; filename: string }> {
+  // priority: -5..5, higher runs ahead of longer jobs
+  async startProcessing(sessionId: string, priority: number = 0): Promise<{ message: string; session_id: string; filename: string; queue_position?: number }> {
     console.log(`🚀 API: Starting processing for session ${sessionId}`);
     try {
-      const response = await fetch(`${this.baseUrl}/start-processing/${sessionId}`, {
+      const response = await fetch(`${this.baseUrl}/start-processing/${sessionId}?priority=${priority}`, {
         method: 'POST',
       });
 
@@ -228,6 +273,48 @@ class ApiService {
     }
   }
 
+  // Subscribe to the server-sent progress events of a session
+  subscribeToProcessingEvents(sessionId: string, handlers: ProcessingEventHandlers): EventSource {
+    const source = new EventSource(`${this.baseUrl}/processing-events/${sessionId}`);
+    const parse = (event: Event) => JSON.parse((event as MessageEvent).data);
+
+    source.addEventListener('stage', (event) => handlers.onStage?.(parse(event)));
+    source.addEventListener('progress', (event) => handlers.onProgress?.(parse(event)));
+    source.addEventListener('detections', (event) => handlers.onDetections?.(parse(event)));
+    source.addEventListener('completed', (event) => {
+      source.close();
+      handlers.onCompleted?.(parse(event));
+    });
+    source.addEventListener('cancelled', () => {
+      source.close();
+      handlers.onFailed?.('Processing cancelled');
+    });
+    source.addEventListener('error', (event) => {
+      source.close();
+      // A processing error carries data; a connection error does not
+      if ((event as MessageEvent).data) {
+        handlers.onFailed?.(parse(event).error);
+      } else {
+        handlers.onConnectionError?.();
+      }
+    });
+    return source;
+  }
+
+  // Cancel a queued or running job (running videos stop at the next frame)
+  async cancelJob(sessionId: string): Promise<{ message: string; session_id: string; status: 'cancelled' | 'cancelling' }> {
+    const response = await fetch(`${this.baseUrl}/jobs/${sessionId}`, {
+      method: 'DELETE',
+    });
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Failed to cancel processing');
+    }
+
+    return response.json();
+  }
+
   // Get all processed files
   async getFiles(): Promise<{ files: FileInfo[] }> {
     const response = await fetch(`${this.baseUrl}/files`);
@@ -298,8 +385,9 @@ class ApiService {
     temporal_distribution: {
       [timeInterval: string]: number;
     };
-    detections: DetectionRecord[];
-    predictions: PredictionRecord[];
+    // Only present when requested with ?include_raw=true
+    detections?: DetectionRecord[];
+    predictions?: PredictionRecord[];
   }> {
     const response = await fetch(`${this.baseUrl}/files/${fileId}/statistics`);
     
@@ -309,6 +397,96 @@ class ApiService {
     return response.json();
   }
 
+  async getTimeline(fileId: number, options: {
+    start?: number;
+    end?: number;
+    bins?: number;
+    brand?: string;
+  } = {}): Promise<{
+    file_id: number;
+    level: number;
+    start: number;
+    end: number;
+    bin_seconds: number;
+    bin_starts: number[];
+    brands: {
+      [brandName: string]: number[];
+    };
+    total: number[];
+  }> {
+    const params = new URLSearchParams();
+    Object.entries(options).forEach(([key, value]) => {
+      if (value !== undefined) {
+        params.append(key, String(value));
+      }
+    });
+    const response = await fetch(`${this.baseUrl}/files/${fileId}/timeline?${params}`);
+    
+    if (!response.ok) {
+      throw new Error('Failed to get timeline');
+    }
+    return response.json();
+  }
+
+  async getBrandAnalytics(options: {
+    group_by?: 'day' | 'file_type';
+    since?: string;
+    until?: string;
+    brand?: string;
+  } = {}): Promise<{
+    group_by: 'day' | 'file_type';
+    since: string | null;
+    until: string | null;
+    brands: {
+      [brandName: string]: BrandRollup & {
+        breakdown: { [dayOrFileType: string]: BrandRollup };
+      };
+    };
+    totals: BrandRollup;
+  }> {
+    const params = new URLSearchParams();
+    Object.entries(options).forEach(([key, value]) => {
+      if (value !== undefined) {
+        params.append(key, String(value));
+      }
+    });
+    const response = await fetch(`${this.baseUrl}/analytics/brands?${params}`);
+    
+    if (!response.ok) {
+      throw new Error('Failed to get brand analytics');
+    }
+    return response.json();
+  }
+
+  async getCooccurrence(fileId: number): Promise<{
+    file_id: number;
+    brands: string[];
+    matrix: number[][];
+    pairs: {
+      brands: [string, string];
+      frames: number;
+      seconds: number;
+      jaccard: number;
+    }[];
+    share_of_voice: {
+      [brandName: string]: {
+        detections: number;
+        frames: number;
+        seconds: number;
+        share_of_voice: number;
+        detection_share: number;
+      };
+    };
+    frames_analyzed: number;
+  }> {
+    const response = await fetch(`${this.baseUrl}/files/${fileId}/cooccurrence`);
+    
+    if (!response.ok) {
+      throw new Error('Failed to get brand co-occurrence');
+    }
+    return response.json();
+  }
+
   // Health check
   async healthCheck(): Promise<{ status: string; model_loaded: boolean }> {
     const response = await fetch(`${this.baseUrl}/health`);
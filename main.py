@@ -1,6 +1,8 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+import asyncio
 import os
 import tempfile
 import shutil
@@ -10,16 +12,24 @@ from typing import List, Optional
 import uuid
 
 # Local imports
-from backend.database.supabase_client import supabase_client
+from backend.database.repository import repository
 from backend.models.yolo_processor import yolo_processor
 from backend.core.processing_service import processing_service
 from backend.core.video_processor import video_processor
 from backend.core.stats_calculator import stats_calculator
+from backend.core.metrics import metrics
+from backend.core.response_cache import response_cache
+from backend.core.file_summary import file_summary_service
+from backend.core.progress_events import progress_broker
+from backend.core.job_scheduler import job_scheduler, JobQueueFull, JobCancelled
+from backend.core.job_store import job_store, ACTIVE_STATUSES
+from backend.core.session_spool import session_spool, WORKER_ID
 from backend.api.endpoints import router as api_router
 from backend.core.config import (
     UPLOAD_DIR, FRAMES_DIR, CROPS_DIR, 
     SUPPORTED_VIDEO_FORMATS, SUPPORTED_IMAGE_FORMATS,
-    MAX_FILE_SIZE, TARGET_FPS, SUPABASE_IMAGES_BUCKET, SUPABASE_VIDEOS_BUCKET
+    MAX_FILE_SIZE, TARGET_FPS, SUPABASE_IMAGES_BUCKET, SUPABASE_VIDEOS_BUCKET,
+    DATABASE_BACKEND, LOCAL_STORAGE_DIR, PROCESSING_MODE
 )
 
 # Configure logging
@@ -46,9 +56,44 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(FRAMES_DIR, exist_ok=True)
 os.makedirs(CROPS_DIR, exist_ok=True)
 
-# Global cache for processing results and progress
-processing_results = {}
-processing_progress = {}
+# Serve local buckets when running on the embedded storage backend
+if DATABASE_BACKEND == "local":
+    os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount("/storage", StaticFiles(directory=LOCAL_STORAGE_DIR), name="storage")
+
+# Queue position writes run in order, one batch at a time, off the event loop
+queue_positions_lock = asyncio.Lock()
+queue_position_writes = set()
+
+async def write_queue_positions(positions: dict):
+    async with queue_positions_lock:
+        try:
+            await asyncio.to_thread(job_store.set_queue_positions, positions)
+        except Exception as e:
+            logger.error(f"Could not record queue positions: {e}")
+
+def record_queue_positions(positions: dict):
+    """Mirror local queue positions into the shared job store for other workers"""
+    task = asyncio.get_running_loop().create_task(write_queue_positions(dict(positions)))
+    queue_position_writes.add(task)
+    task.add_done_callback(queue_position_writes.discard)
+
+@app.on_event("startup")
+async def start_job_scheduler():
+    job_scheduler.on_queue_change = record_queue_positions
+    job_scheduler.start()
+    await resume_orphaned_jobs()
+
+@app.on_event("shutdown")
+async def stop_job_scheduler():
+    await job_scheduler.stop()
+
+def queue_full_response(error: JobQueueFull) -> JSONResponse:
+    return JSONResponse(
+        content={"detail": str(error), "retry_after": error.retry_after},
+        status_code=429,
+        headers={"Retry-After": str(error.retry_after)}
+    )
 
 @app.get("/")
 async def root():
@@ -58,13 +103,90 @@ async def root():
 async def health_check():
     return {"status": "healthy", "model_loaded": yolo_processor.model is not None}
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process metrics (write-behind flush latency, batch sizes, ...)"""
+    return dict(metrics.snapshot(), response_cache=response_cache.stats(), job_scheduler=job_scheduler.stats())
+
+def set_progress(session_id: str, progress: int, stage: str):
+    """Record a stage transition for polling clients and SSE subscribers"""
+    job_store.set_progress(session_id, progress, stage)
+    progress_broker.publish(session_id, "stage", {"stage": stage, "progress": progress})
+
+def finished_result(job: Optional[dict]) -> Optional[dict]:
+    """Result pointer of a finished session ({"error": ...} if it failed), None while pending"""
+    if not job:
+        return None
+    if job["status"] == "error":
+        return {"error": job["error"]}
+    if job["status"] == "cancelled":
+        return {"error": "Processing cancelled", "cancelled": True}
+    if job["status"] == "completed":
+        return job["result"] or {}
+    return None
+
+def queue_state(session_id: str, job: Optional[dict]) -> dict:
+    """Queue state of a pending session, whichever worker process holds it"""
+    state = job_scheduler.job_state(session_id)
+    if state is not None:
+        return state
+    if job and job["status"] in ("queued", "running"):
+        return {"state": job["status"], "queue_position": job["queue_position"]}
+    return {}
+
+def release_session_files(session_id: str):
+    """Remove a finished session's frames, crops and spooled upload"""
+    processing_service.cleanup_session(session_id)
+    session_spool.remove(session_id)
+
+def record_cancelled(session_id: str):
+    job = job_store.get(session_id)
+    if job and job["status"] == "cancelled":
+        return
+    job_store.cancelled(session_id)
+    release_session_files(session_id)
+    logger.info(f"🛑 Session {session_id} cancelled")
+    publish_result(session_id, {"error": "Processing cancelled", "cancelled": True})
+
+def publish_result(session_id: str, result: dict):
+    """Send the terminal completed/error/cancelled event of a session"""
+    if result.get("cancelled"):
+        progress_broker.publish(session_id, "cancelled", {"session_id": session_id})
+    elif "error" in result:
+        progress_broker.publish(session_id, "error", {"error": result["error"]})
+    else:
+        progress_broker.publish(session_id, "completed", {
+            "file_id": result.get("file_id"),
+            "detections_count": result.get("detections_count", 0),
+            "brands_detected": result.get("brands_detected", []),
+            "video_url": result.get("video_url"),
+            "image_url": result.get("image_url")
+        })
+
+def process_video_job(file_path: str, original_filename: str, session_id: str, checkpoint: Optional[dict] = None):
+    """Run a video job in this process or, in distributed mode, on the segment workers"""
+    should_cancel = lambda: job_store.cancel_requested(session_id)
+    if PROCESSING_MODE == "distributed":
+        # Progress lives in the segment queue, which the coordinator picks up again on resume
+        return processing_service.process_video_distributed(
+            file_path, original_filename, session_id, should_cancel=should_cancel
+        )
+    return processing_service.process_video(
+        file_path, original_filename, session_id, should_cancel=should_cancel, checkpoint=checkpoint,
+        on_checkpoint=lambda checkpoint: job_store.save_checkpoint(session_id, checkpoint)
+    )
+
 async def process_media_file(file_path: str, original_filename: str, file_type: str, session_id: str):
     """Background task to process uploaded media file"""
     try:
         logger.info(f"🚀 Starting processing of {original_filename} with session {session_id}")
+        # Cancelled while queued on this worker from another worker process
+        if job_store.cancel_requested(session_id):
+            raise JobCancelled(session_id)
+        job_store.update(session_id, status="running", worker_id=WORKER_ID)
         
         # Initialize progress
-        processing_progress[session_id] = {"progress": 0, "stage": "Starting processing"}
+        set_progress(session_id, 0, "Starting processing")
         
         # Determine if it's video or image
         file_extension = Path(original_filename).suffix.lower()
@@ -73,46 +195,61 @@ async def process_media_file(file_path: str, original_filename: str, file_type:
         logger.info(f"📁 File type: {'video' if is_video else 'image'}, extension: {file_extension}")
         
         # Update progress
-        processing_progress[session_id] = {"progress": 10, "stage": "Analyzing file"}
+        set_progress(session_id, 10, "Analyzing file")
         
         if is_video:
             # Process video
             logger.info(f"🎬 Processing video: {original_filename}")
-            processing_progress[session_id] = {"progress": 20, "stage": "Extracting frames"}
+            set_progress(session_id, 20, "Extracting frames")
             
-            result = await processing_service.process_video(file_path, original_filename, session_id)
+            job = job_store.get(session_id)
+            result = await process_video_job(file_path, original_filename, session_id,
+                                             checkpoint=job["checkpoint"] if job else None)
         else:
             # Process image
             logger.info(f"🖼️ Processing image: {original_filename}")
-            processing_progress[session_id] = {"progress": 20, "stage": "Processing image"}
-            result = await processing_service.process_image(file_path, original_filename, session_id)
-        
-        # Update progress to completion
-        processing_progress[session_id] = {"progress": 100, "stage": "Completed"}
+            set_progress(session_id, 20, "Processing image")
+            result = await processing_service.process_image(
+                file_path, original_filename, session_id,
+                should_cancel=lambda: job_store.cancel_requested(session_id)
+            )
         
         logger.info(f"✅ Processing completed for {original_filename} - File ID: {result.get('file_id')}")
         logger.info(f"📊 Result summary: {result.get('detections_count', 0)} detections, {len(result.get('brands_detected', []))} brands")
         
-        # Store result in memory cache (for session lookup)
-        processing_results[session_id] = result
-        logger.info(f"💾 Result stored in cache for session {session_id}")
+        # Store the result pointer for session lookup
+        job_store.complete(session_id, result)
+        progress_broker.publish(session_id, "stage", {"stage": "Completed", "progress": 100})
+        logger.info(f"💾 Result stored for session {session_id}")
+        publish_result(session_id, result)
         
         return result
         
+    except JobCancelled:
+        record_cancelled(session_id)
+        raise
     except Exception as e:
         logger.error(f"❌ Error processing file {original_filename}: {e}")
         logger.error(f"🔍 Full error details: {type(e).__name__}: {str(e)}")
-        # Store error in cache
-        processing_results[session_id] = {"error": str(e)}
-        logger.info(f"💾 Error stored in cache for session {session_id}")
+        # Store error for session lookup
+        job_store.fail(session_id, str(e))
+        logger.info(f"💾 Error stored for session {session_id}")
+        publish_result(session_id, {"error": str(e)})
         raise
 
+async def run_upload_job(session_id: str, run):
+    """Run the job of a synchronous upload, marking it running as process_media_file does"""
+    if job_store.cancel_requested(session_id):
+        raise JobCancelled(session_id)
+    job_store.update(session_id, status="running", worker_id=WORKER_ID)
+    return await run()
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     """Upload and process image or video file synchronously"""
     try:
         # Validate file size
-        if file.size > MAX_FILE_SIZE:
+        if file.size is not None and file.size > MAX_FILE_SIZE:
             raise HTTPException(status_code=413, detail="File too large")
         
         # Validate file type
@@ -123,17 +260,11 @@ async def upload_file(file: UploadFile = File(...)):
                 detail=f"Unsupported file format. Supported formats: {SUPPORTED_VIDEO_FORMATS + SUPPORTED_IMAGE_FORMATS}"
             )
         
-        # Save uploaded file temporarily
+        # Save uploaded file to the spool shared by all worker processes
         session_id = str(uuid.uuid4())
-        temp_dir = os.path.join(UPLOAD_DIR, session_id)
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        temp_file_path = os.path.join(temp_dir, file.filename)
-        
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        temp_file_path = session_spool.save(session_id, file.filename, file.file)
         
-        # Process file SYNCHRONOUSLY (no background task)
+        # Process file SYNCHRONOUSLY (no background task), but still within the job slots
         logger.info(f"Starting synchronous processing of {file.filename}")
         
         # Determine if it's video or image
@@ -141,15 +272,42 @@ async def upload_file(file: UploadFile = File(...)):
         
         if is_video:
             # Process video
-            result = await processing_service.process_video(temp_file_path, file.filename, session_id)
+            run = lambda: process_video_job(temp_file_path, file.filename, session_id)
         else:
             # Process image
-            result = await processing_service.process_image(temp_file_path, file.filename, session_id)
+            run = lambda: processing_service.process_image(
+                temp_file_path, file.filename, session_id,
+                should_cancel=lambda: job_store.cancel_requested(session_id)
+            )
+        
+        file_type = "video" if is_video else "image"
+        cost = await asyncio.to_thread(processing_service.estimate_cost, temp_file_path, file_type)
+        # The row exists before submit, so the queue positions recorded on submit land on it
+        job_store.create(session_id, file.filename, temp_file_path, file_type, stage="Processing")
+        job_store.update(session_id, status="queued", worker_id=WORKER_ID)
+        # Claimed like any scheduled session, so no other worker resumes it as orphaned
+        claim = session_spool.claim(session_id)
+        try:
+            job = job_scheduler.submit(session_id, lambda: run_upload_job(session_id, run), cost=cost, kind=file_type)
+        except JobQueueFull as e:
+            claim.release()
+            session_spool.remove(session_id)
+            job_store.delete(session_id)
+            return queue_full_response(e)
+        job.result.add_done_callback(lambda _: claim.release())
+        try:
+            result = await job.result
+        except JobCancelled:
+            record_cancelled(session_id)
+            raise HTTPException(status_code=409, detail="Processing cancelled")
+        except Exception as e:
+            job_store.fail(session_id, str(e))
+            raise
         
         logger.info(f"Processing completed for {file.filename} - File ID: {result.get('file_id')}")
         
-        # Store result in memory cache (for backward compatibility)
-        processing_results[session_id] = result
+        # Store result pointer (for /processing-status lookups)
+        job_store.complete(session_id, result)
         
         # Return complete result with file_id immediately
         return JSONResponse(content={
@@ -174,6 +332,8 @@ async def upload_file(file: UploadFile = File(...)):
             }
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading and processing file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -182,15 +342,25 @@ async def upload_file(file: UploadFile = File(...)):
 async def get_processing_status(session_id: str):
     """Get processing status and results by session ID"""
     try:
-        if session_id not in processing_results:
+        job = job_store.get(session_id)
+        result = finished_result(job)
+        if result is None:
             return JSONResponse(content={
                 "status": "processing",
                 "message": "File is still being processed or session not found",
                 "session_id": session_id,
-                "file_id": None
+                "file_id": None,
+                "progress": job["progress"] if job else 0,
+                "stage": job["stage"] if job else None,
+                **queue_state(session_id, job)
             })
         
-        result = processing_results[session_id]
+        if result.get("cancelled"):
+            return JSONResponse(content={
+                "status": "cancelled",
+                "session_id": session_id,
+                "file_id": None
+            })
         
         if "error" in result:
             return JSONResponse(content={
@@ -220,7 +390,7 @@ async def upload_file_async(background_tasks: BackgroundTasks, file: UploadFile
     """Upload and process image or video file asynchronously (original behavior)"""
     try:
         # Validate file size
-        if file.size > MAX_FILE_SIZE:
+        if file.size is not None and file.size > MAX_FILE_SIZE:
             raise HTTPException(status_code=413, detail="File too large")
         
         # Validate file type
@@ -231,23 +401,16 @@ async def upload_file_async(background_tasks: BackgroundTasks, file: UploadFile
                 detail=f"Unsupported file format. Supported formats: {SUPPORTED_VIDEO_FORMATS + SUPPORTED_IMAGE_FORMATS}"
             )
         
-        # Save uploaded file temporarily
+        # Save uploaded file to the spool shared by all worker processes
         session_id = str(uuid.uuid4())
-        temp_dir = os.path.join(UPLOAD_DIR, session_id)
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        temp_file_path = os.path.join(temp_dir, file.filename)
-        
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        temp_file_path = session_spool.save(session_id, file.filename, file.file)
         
         # Initialize processing status - file uploaded but not processed yet
-        processing_progress[session_id] = {"progress": 0, "stage": "File uploaded, ready for processing"}
+        file_type = "video" if file_extension in SUPPORTED_VIDEO_FORMATS else "image"
+        job_store.create(session_id, file.filename, temp_file_path, file_type)
         
         logger.info(f"📁 File uploaded successfully for session: {session_id}")
         logger.info(f"📁 File saved to: {temp_file_path}")
-        logger.info(f"📋 Total sessions in processing_progress: {len(processing_progress)}")
-        logger.info(f"📋 All session IDs: {list(processing_progress.keys())}")
         logger.info(f"⏳ Waiting for user to select logos before processing")
         
         return JSONResponse(content={
@@ -261,15 +424,84 @@ async def upload_file_async(background_tasks: BackgroundTasks, file: UploadFile
         logger.error(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def schedule_session(session_id: str, job: dict, claim, priority: int = 0):
+    """
+    Queue the processing job of a claimed session and return its filename,
+    estimated cost and queue position. The claim is held until the job
+    finishes; it is released if the upload is missing (HTTP 404) or the
+    queue is full (JobQueueFull).
+    """
+    # Find the uploaded file for this session in the shared spool
+    file_path = job["file_path"] if job["file_path"] and os.path.exists(job["file_path"]) \
+        else session_spool.find_file(session_id)
+    
+    if not file_path:
+        claim.release()
+        logger.error(f"❌ No uploaded file found for session: {session_id}")
+        raise HTTPException(status_code=404, detail="Uploaded file not found")
+    
+    original_filename = os.path.basename(file_path)
+    
+    # Determine file type
+    file_extension = Path(original_filename).suffix.lower()
+    file_type = "video" if file_extension in SUPPORTED_VIDEO_FORMATS else "image"
+    
+    logger.info(f"📁 Found file: {original_filename} (type: {file_type})")
+    
+    # Queue processing; the scheduler runs it when a job slot is free
+    cost = await asyncio.to_thread(processing_service.estimate_cost, file_path, file_type)
+    try:
+        scheduled = job_scheduler.submit(
+            session_id,
+            lambda: process_media_file(file_path, original_filename, file_type, session_id),
+            cost=cost, priority=priority, kind=file_type
+        )
+    except JobQueueFull:
+        claim.release()
+        raise
+    # Hold the claim until the job finishes, fails or is cancelled while pending
+    scheduled.result.add_done_callback(lambda _: claim.release())
+    
+    # Update status
+    job_store.update(session_id, status="queued", worker_id=WORKER_ID)
+    queue_position = job_scheduler.queue_position(session_id)
+    set_progress(session_id, 5, f"Queued (position {queue_position})" if queue_position else "Processing started")
+    return original_filename, cost, queue_position
+
+async def resume_orphaned_jobs():
+    """
+    Requeue sessions left queued or running by a worker process that died;
+    videos continue from their last checkpoint. Sessions whose worker is
+    still alive hold their claim and are skipped.
+    """
+    for job in job_store.list_by_status(*ACTIVE_STATUSES):
+        session_id = job["session_id"]
+        claim = session_spool.claim(session_id)
+        if claim is None:
+            continue
+        resume_point = f" after frame {job['checkpoint']['frame']}" if job["checkpoint"] else ""
+        logger.info(f"♻️ Resuming session {session_id}{resume_point} ({job['status']} on {job['worker_id']})")
+        try:
+            await schedule_session(session_id, job, claim)
+        except HTTPException as e:
+            job_store.fail(session_id, e.detail)
+        except JobQueueFull:
+            logger.warning("⏳ Processing queue full, remaining sessions resume on a later start")
+            break
+
 @app.post("/start-processing/{session_id}")
-async def start_processing(session_id: str, background_tasks: BackgroundTasks):
-    """Start processing for uploaded file after logo selection"""
+async def start_processing(session_id: str, priority: int = Query(0, ge=-5, le=5)):
+    """
+    Start processing for uploaded file after logo selection. Shorter jobs
+    run first; a higher priority moves the job ahead of longer ones.
+    """
     try:
         logger.info(f"🚀 Starting processing for session: {session_id}")
-        logger.info(f"📋 Available sessions in processing_progress: {list(processing_progress.keys())}")
+        
+        job = job_store.get(session_id)
         
         # Check if session already has a result (already processed)
-        if session_id in processing_results:
+        if finished_result(job) is not None:
             logger.info(f"✅ Session {session_id} already processed, returning existing result")
             return JSONResponse(content={
                 "message": "Processing already completed",
@@ -277,84 +509,177 @@ async def start_processing(session_id: str, background_tasks: BackgroundTasks):
                 "filename": "already_processed"
             })
         
-        # Check if session exists in progress tracking
-        if session_id not in processing_progress:
-            logger.error(f"❌ Session {session_id} not found in processing_progress")
+        # Check if session exists in the job store
+        if job is None:
+            logger.error(f"❌ Session {session_id} not found in job store")
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # Find the uploaded file for this session
-        session_dir = os.path.join(UPLOAD_DIR, session_id)
-        logger.info(f"📁 Looking for session directory: {session_dir}")
-        logger.info(f"📁 Directory exists: {os.path.exists(session_dir)}")
-        
-        if not os.path.exists(session_dir):
-            logger.error(f"❌ Session directory not found: {session_dir}")
-            raise HTTPException(status_code=404, detail="Uploaded file not found")
-        
-        # Get the first file in the session directory
-        files = os.listdir(session_dir)
-        logger.info(f"📁 Files in session directory: {files}")
-        
-        if not files:
-            logger.error(f"❌ No files found in session directory: {session_dir}")
-            raise HTTPException(status_code=404, detail="No files found for session")
-        
-        file_path = os.path.join(session_dir, files[0])
-        original_filename = files[0]
-        
-        # Determine file type
-        file_extension = Path(original_filename).suffix.lower()
-        file_type = "video" if file_extension in SUPPORTED_VIDEO_FORMATS else "image"
-        
-        logger.info(f"📁 Found file: {original_filename} (type: {file_type})")
+        # Claim the session so no other worker process schedules it too
+        claim = session_spool.claim(session_id)
+        if claim is None:
+            return JSONResponse(content={
+                "message": "Processing already scheduled",
+                "session_id": session_id,
+                **queue_state(session_id, job)
+            })
         
-        # Start processing in background
-        background_tasks.add_task(
-            process_media_file, 
-            file_path, 
-            original_filename, 
-            file_type,
-            session_id
-        )
+        if job["status"] in ACTIVE_STATUSES:
+            # Its worker died (the claim was free): schedule it again here
+            logger.warning(f"⚠️ Session {session_id} was {job['status']} on {job['worker_id']}, rescheduling")
         
-        # Update status
-        processing_progress[session_id] = {"progress": 5, "stage": "Processing started"}
+        try:
+            original_filename, cost, queue_position = await schedule_session(session_id, job, claim, priority)
+        except JobQueueFull as e:
+            logger.warning(f"⏳ Rejecting session {session_id}: {e}")
+            return queue_full_response(e)
         
-        logger.info(f"✅ Processing started for session: {session_id}")
+        logger.info(f"✅ Processing scheduled for session: {session_id} "
+                    f"(cost {cost:.0f} frames, priority {priority}, queue position {queue_position})")
         
         return JSONResponse(content={
             "message": "Processing started successfully",
             "session_id": session_id,
-            "filename": original_filename
+            "filename": original_filename,
+            "queue_position": queue_position
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error starting processing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def poll_job_events(session_id: str, interval: float = 1.0):
+    """
+    SSE stream for a session this worker process is not running: the job
+    store is polled and stage/progress changes are sent as they appear.
+    """
+    last_state = None
+    idle = 0.0
+    while True:
+        job = job_store.get(session_id)
+        if job is None:
+            yield progress_broker.format_event("error", {"error": "Session not found"})
+            return
+        state = (job["stage"], job["progress"])
+        if state != last_state:
+            last_state = state
+            idle = 0.0
+            yield progress_broker.format_event("stage", {"stage": job["stage"], "progress": job["progress"]})
+        elif idle >= progress_broker.heartbeat:
+            idle = 0.0
+            yield ": keep-alive\n\n"
+        result = finished_result(job)
+        if result is not None:
+            if result.get("cancelled"):
+                yield progress_broker.format_event("cancelled", {"session_id": session_id})
+            elif "error" in result:
+                yield progress_broker.format_event("error", result)
+            else:
+                yield progress_broker.format_event("completed", {
+                    key: result.get(key)
+                    for key in ("file_id", "detections_count", "brands_detected", "video_url", "image_url")
+                })
+            return
+        await asyncio.sleep(interval)
+        idle += interval
+
+@app.get("/processing-events/{session_id}")
+async def stream_processing_events(session_id: str):
+    """
+    Server-Sent Events stream of a session: stage, progress (frames
+    processed, throughput, ETA), detections per frame, and a final
+    completed or error event after which the stream closes.
+    """
+    job = job_store.get(session_id)
+    if job is None and not progress_broker.has_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    # Sessions this worker process is not running (not yet started, started by
+    # another worker, or finished long ago) are followed through the job store
+    if job_scheduler.is_scheduled(session_id) or progress_broker.has_session(session_id):
+        events = progress_broker.stream(session_id)
+    else:
+        events = poll_job_events(session_id)
+    
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/jobs/{session_id}")
+async def cancel_job(session_id: str):
+    """
+    Cancel a session. A queued job is dropped at once; a running video stops
+    at the next frame (an image before its upload or row writes), on
+    whichever worker process runs it, and its rows, frames, crops and upload
+    are removed.
+    """
+    try:
+        job = job_store.get(session_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if job["status"] == "cancelled":
+            return {"message": "Processing already cancelled", "session_id": session_id, "status": "cancelled"}
+        if job["status"] in ("completed", "error"):
+            raise HTTPException(status_code=409, detail=f"Processing already finished ({job['status']})")
+        
+        job_store.request_cancel(session_id)
+        
+        # Still queued here: the scheduler drops it and the claim is released
+        if job_scheduler.cancel_pending(session_id):
+            record_cancelled(session_id)
+            return {"message": "Processing cancelled", "session_id": session_id, "status": "cancelled"}
+        
+        # Queued or running on this or another live worker: it stops cooperatively
+        if job_scheduler.is_scheduled(session_id) or session_spool.is_claimed(session_id):
+            set_progress(session_id, job["progress"], "Cancelling")
+            return JSONResponse(content={
+                "message": "Cancellation requested",
+                "session_id": session_id,
+                "status": "cancelling"
+            }, status_code=202)
+        
+        # Never started, or its worker died
+        record_cancelled(session_id)
+        return {"message": "Processing cancelled", "session_id": session_id, "status": "cancelled"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/upload-result/{session_id}")
 async def get_upload_result(session_id: str):
     """Get simplified upload result for web interface"""
     try:
-        logger.info(f"🔍 Checking status for session: {session_id}")
-        logger.info(f"📋 Available sessions in cache: {list(processing_results.keys())}")
+        logger.debug(f"🔍 Checking status for session: {session_id}")
+        
+        job = job_store.get(session_id)
+        result = finished_result(job)
         
-        if session_id not in processing_results:
-            logger.info(f"⏳ Session {session_id} not found in cache - still processing")
-            progress_info = processing_progress.get(session_id, {"progress": 0, "stage": "Starting processing"})
+        if result is None:
+            progress_info = job or {"progress": 0, "stage": "Starting processing"}
             return JSONResponse(content={
                 "status": "processing",
-
-
                 "message": "File is still being processed",
                 "session_id": session_id,
                 "file_id": None,
-                "ready": False
-
+                "ready": False,
+                "stage": progress_info["stage"],
+                **queue_state(session_id, job)
             })
         
-        result = processing_results[session_id]
-        logger.info(f"📄 Found result for session {session_id}: {type(result)}")
+        if result.get("cancelled"):
+            return JSONResponse(content={
+                "status": "cancelled",
+                "message": result["error"],
+                "session_id": session_id,
+                "file_id": None,
+                "ready": True
+            })
         
         if "error" in result:
             logger.error(f"❌ Error found in result for session {session_id}: {result['error']}")
@@ -366,9 +691,6 @@ async def get_upload_result(session_id: str):
                 "ready": True
             }, status_code=500)
         
-
-        logger.info(f"✅ Returning completed result for session {session_id}")
-
         return JSONResponse(content={
             "status": "completed",
             "message": "File processed successfully",
@@ -392,29 +714,25 @@ async def get_upload_result(session_id: str):
 async def get_file_info(file_id: int):
     """Get file information and detection summary by file_id"""
     try:
-        # Get file information
-        file_response = supabase_client.client.table('files').select('*').eq('id', file_id).execute()
-        
-        if not file_response.data:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        file_info = file_response.data[0]
-        
-        # Get detection count
-        detection_response = supabase_client.client.table('detections').select('id').eq('file_id', file_id).execute()
-        detections_count = len(detection_response.data)
-        
-        # Get brands detected
-        brands_response = supabase_client.client.table('detections') \
-            .select('brands(name)') \
-            .eq('file_id', file_id) \
-            .execute()
-        
-        brands = list(set([d['brands']['name'] for d in brands_response.data if d['brands']]))
-        
-        # Get frame captures count
-        frames_response = supabase_client.client.table('frame_captures').select('id').eq('file_id', file_id).execute()
-        frames_count = len(frames_response.data)
+        # Processed files are answered from their precomputed summary row
+        summary = await file_summary_service.get(file_id)
+        
+        if summary:
+            file_info = summary['file_info']
+            detections_count = summary['detections_count']
+            brands = summary['brands_detected']
+            frames_count = summary['frame_captures_count']
+        else:
+            # File row, detection count, brands and frame captures count are independent
+            file_info, detections_count, brands, frames_count = await asyncio.gather(
+                repository.get_file(file_id),
+                repository.count_detections(file_id),
+                repository.get_file_brand_names(file_id),
+                repository.count_frame_captures(file_id)
+            )
+            
+            if not file_info:
+                raise HTTPException(status_code=404, detail="File not found")
         
         return JSONResponse(content={
             "file_id": file_id,
@@ -443,8 +761,11 @@ async def get_file_info(file_id: int):
 async def clear_processing_status(session_id: str):
     """Clear processing result from cache"""
     try:
-        if session_id in processing_results:
-            del processing_results[session_id]
+        if job_store.delete(session_id):
+            progress_broker.forget(session_id)
+            # Spooled files of a session nobody is processing are no longer needed
+            if not session_spool.is_claimed(session_id):
+                session_spool.remove(session_id)
             return {"message": "Processing result cleared", "session_id": session_id}
         else:
             return {"message": "Session not found", "session_id": session_id}
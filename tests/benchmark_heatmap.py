@@ -0,0 +1,98 @@
+"""
+Benchmark del renderizado de mapas de calor (HeatmapGenerator._create_heatmap_image)
+Compara la versión vectorizada con la implementación anterior en bucles de Python
+y comprueba que las imágenes son visualmente equivalentes.
+
+Uso: python tests/benchmark_heatmap.py [ancho] [alto] [grid_size]
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.heatmap_generator import HeatmapGenerator
+
+def loop_heatmap_image(generator, intensity_matrix, grid_size, smooth_factor=1.0):
+    """
+    Implementación anterior (píxel a píxel) sobre fondo transparente, como referencia
+    """
+    height, width = intensity_matrix.shape
+    heatmap_image = np.zeros((height * grid_size, width * grid_size, 4), dtype=np.uint8)
+    scale_factor = 4
+    smooth_matrix = np.zeros((height * scale_factor, width * scale_factor))
+    for y in range(height):
+        for x in range(width):
+            intensity = intensity_matrix[y, x]
+            if intensity > 0:
+                for sy in range(y * scale_factor, (y + 1) * scale_factor):
+                    for sx in range(x * scale_factor, (x + 1) * scale_factor):
+                        distance = np.sqrt((sy - (y * scale_factor + 2))**2 + (sx - (x * scale_factor + 2))**2)
+                        if distance <= 2:
+                            smooth_matrix[sy, sx] = intensity * (1.0 - (distance / 2) * 0.3)
+    blur_size = max(3, int(5 * smooth_factor))
+    if blur_size % 2 == 0:
+        blur_size += 1
+    smooth_matrix = cv2.GaussianBlur(smooth_matrix, (blur_size, blur_size), 1.0 * smooth_factor)
+    max_distance = grid_size // 2
+    for y in range(height):
+        for x in range(width):
+            avg_intensity = np.mean(smooth_matrix[y * scale_factor:(y + 1) * scale_factor,
+                                                  x * scale_factor:(x + 1) * scale_factor])
+            if avg_intensity > 0.01:
+                color = generator._get_heatmap_color(avg_intensity)
+                center_y = y * grid_size + grid_size // 2
+                center_x = x * grid_size + grid_size // 2
+                for sy in range(y * grid_size, (y + 1) * grid_size):
+                    for sx in range(x * grid_size, (x + 1) * grid_size):
+                        distance = np.sqrt((sy - center_y)**2 + (sx - center_x)**2)
+                        if distance <= max_distance:
+                            alpha = int((180 + avg_intensity * 75) * (1.0 - (distance / max_distance) * 0.4))
+                            if alpha > 0:
+                                heatmap_image[sy, sx, :3] = color
+                                heatmap_image[sy, sx, 3] = alpha
+    return heatmap_image
+
+def timed(function, repeat):
+    """
+    Mejor tiempo (en segundos) de `repeat` ejecuciones
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    video_width = int(sys.argv[1]) if len(sys.argv) > 1 else 1920
+    video_height = int(sys.argv[2]) if len(sys.argv) > 2 else 1080
+    grid_size = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    # Matriz de intensidad con detecciones en ~40% de las celdas
+    rng = np.random.default_rng(42)
+    shape = (video_height // grid_size, video_width // grid_size)
+    intensity_matrix = (rng.random(shape) * (rng.random(shape) < 0.4)).astype(np.float32)
+    intensity_matrix /= intensity_matrix.max()
+
+    generator = HeatmapGenerator()
+    print(f"🔥 Heatmap {video_width}x{video_height}, grid_size={grid_size} ({shape[1]}x{shape[0]} celdas)")
+
+    loop_time, loop_image = timed(lambda: loop_heatmap_image(generator, intensity_matrix, grid_size), 1)
+    vector_time, vector_image = timed(lambda: generator._create_heatmap_image(intensity_matrix, grid_size), 5)
+
+    difference = np.abs(loop_image.astype(int) - vector_image.astype(int))
+    coverage = np.count_nonzero((loop_image[..., 3] > 0) != (vector_image[..., 3] > 0))
+    print(f"   🐢 Bucles:      {loop_time * 1000:10.1f} ms")
+    print(f"   🚀 Vectorizado: {vector_time * 1000:10.1f} ms")
+    print(f"   ⚡ Aceleración: {loop_time / vector_time:10.1f}x")
+    print(f"   🎨 Diferencia máxima: color {difference[..., :3].max()}, alfa {difference[..., 3].max()}, "
+          f"píxeles con distinta cobertura {coverage}")
+
+if __name__ == "__main__":
+    main()
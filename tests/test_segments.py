@@ -0,0 +1,122 @@
+"""
+Pruebas del procesamiento distribuido por segmentos
+Un video analizado por varios SegmentWorker debe dar las mismas estadísticas
+y filas que una sola pasada de process_video.
+
+El modelo YOLO se sustituye por un detector determinista que lee el índice
+del frame de sus píxeles, así que no hacen falta pesos ni GPU.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import types
+
+import cv2
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base de datos local y colas en un directorio temporal (antes de importar la configuración)
+WORK_DIR = tempfile.mkdtemp(prefix="segments_test_")
+os.environ.update({
+    'DATABASE_BACKEND': 'local',
+    'LOCAL_DATABASE_PATH': os.path.join(WORK_DIR, 'logo_vision.db'),
+    'LOCAL_STORAGE_DIR': os.path.join(WORK_DIR, 'storage'),
+    'JOB_STORE_PATH': os.path.join(WORK_DIR, 'jobs.db'),
+    'SEGMENT_QUEUE_PATH': os.path.join(WORK_DIR, 'segments.db'),
+    'SEGMENT_FRAMES': '3',
+    'SEGMENT_POLL_INTERVAL': '0.05',
+    'WRITE_BUFFER_FLUSH_INTERVAL': '0.05',
+    'WRITE_BUFFER_MAX_ROWS': '3'
+})
+
+VIDEO_FPS = 5
+VIDEO_FRAMES = 40
+
+class FrameIndexDetector:
+    """Detecta 'nike' o 'adidas' según el índice del frame (i * 6) codificado en sus píxeles"""
+
+    def detect_objects(self, image):
+        index = int(round(float(image.mean()) / 6))
+        if index % 3 == 0:
+            return []
+        return [{
+            'bbox': [2.0 + index % 7, 2.0, 20.0, 18.0],
+            'confidence': 0.5 + index / 200,
+            'class_id': index % 2,
+            'class_name': 'nike' if index % 2 else 'adidas'
+        }]
+
+    def crop_detection(self, image, bbox, padding=10):
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        return image[y1:y2, x1:x2]
+
+sys.modules['backend.models.yolo_processor'] = types.SimpleNamespace(yolo_processor=FrameIndexDetector())
+
+from backend.core.processing_service import processing_service
+from backend.core.segment_worker import SegmentWorker
+from backend.core.video_processor import video_processor
+from backend.database.repository import repository
+
+def make_video(path):
+    """Video cuyo frame i tiene todos sus píxeles a i * 6"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), VIDEO_FPS, (32, 32))
+    for index in range(VIDEO_FRAMES):
+        writer.write(np.full((32, 32, 3), index * 6, np.uint8))
+    writer.release()
+    return path
+
+def frame_indices(frame_paths):
+    return [int(round(float(cv2.imread(path).mean()) / 6)) for path in frame_paths]
+
+def test_extract_frames_segment_matches_full_extraction(tmp_path):
+    video_path = make_video(str(tmp_path / "video.mp4"))
+    full = frame_indices(video_processor.extract_frames(video_path, str(tmp_path / "full"), 1))
+
+    segments = []
+    for start, end in [(0, 3), (3, 6), (6, None)]:
+        segments += frame_indices(video_processor.extract_frames(
+            video_path, str(tmp_path / f"segment_{start}"), 1, start, end
+        ))
+
+    assert full == list(range(0, VIDEO_FRAMES, VIDEO_FPS))
+    assert segments == full
+
+async def stored_rows(file_id):
+    detections = await repository.get_detections(file_id)
+    predictions = await repository.get_predictions(file_id)
+    return (
+        sorted((d['frame'], d['detection_index'], d['brands']['name'], d['score']) for d in detections),
+        sorted((p['brands']['name'], p['total_detections'], p['total_seconds']) for p in predictions)
+    )
+
+def test_segmented_run_matches_single_node(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    single_video = make_video(str(tmp_path / "single.mp4"))
+    segmented_video = make_video(str(tmp_path / "segmented.mp4"))
+
+    async def run():
+        single = await processing_service.process_video(single_video, "video.mp4", "single-node")
+
+        workers = [SegmentWorker(worker_id=f"worker-{i}", poll_interval=0.05) for i in range(2)]
+        tasks = [asyncio.create_task(worker.run()) for worker in workers]
+        try:
+            segmented = await processing_service.process_video_distributed(
+                segmented_video, "video.mp4", "segmented"
+            )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return single, segmented, await stored_rows(single['file_id']), await stored_rows(segmented['file_id'])
+
+    single, segmented, single_rows, segmented_rows = asyncio.run(run())
+
+    assert single['detections_count'] > 0
+    assert segmented['statistics'] == single['statistics']
+    assert segmented['detections_count'] == single['detections_count']
+    assert segmented_rows == single_rows
@@ -0,0 +1,30 @@
+"""
+Segment worker for distributed video processing (PROCESSING_MODE=distributed).
+Run any number of these next to the API, on this or other hosts sharing
+SPOOL_DIR, SEGMENT_QUEUE_PATH and the database:
+
+    python worker.py
+"""
+import argparse
+import asyncio
+import logging
+
+from dotenv import load_dotenv
+
+# Configuration is read on import, so load the environment first
+load_dotenv()
+
+from backend.core.segment_worker import segment_worker
+
+logging.basicConfig(level=logging.INFO)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process video segments from the shared segment queue")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    print(f"🛠️ Starting segment worker {segment_worker.worker_id}...")
+    try:
+        asyncio.run(segment_worker.run(once=args.once))
+    except KeyboardInterrupt:
+        print("👋 Segment worker stopped")